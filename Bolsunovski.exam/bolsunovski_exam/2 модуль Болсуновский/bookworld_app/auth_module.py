@@ -3,22 +3,36 @@ from tkinter import messagebox
 from database import DatabaseManager
 
 class AuthWindow:
-    def __init__(self, on_success_callback):
+    """Экран входа, создаваемый один раз и показываемый при каждом выходе из сеанса"""
+    
+    def __init__(self, window, db: DatabaseManager, on_success_callback):
         self.on_success_callback = on_success_callback
-        self.db = DatabaseManager()
+        self.db = db
+        
+        self.window = window
+        self.frame = tk.Frame(self.window)
         
-        self.window = tk.Tk()
+        self._create_interface()
+    
+    def show(self):
+        """Отображение экрана входа в корневом окне"""
         self.window.title("Литературный Клуб - Вход в систему")
         self.window.geometry("400x300")
         self.window.resizable(False, False)
-        
-        self._create_interface()
+        self.login_entry.delete(0, tk.END)
+        self.password_entry.delete(0, tk.END)
+        self.frame.pack(fill="both", expand=True)
+        self.login_entry.focus_set()
+    
+    def hide(self):
+        """Скрытие экрана входа без удаления его виджетов"""
+        self.frame.pack_forget()
     
     def _create_interface(self):
         """Создание элементов интерфейса для авторизации"""
         # Заголовок
         title_label = tk.Label(
-            self.window, 
+            self.frame, 
             text="Литературный Клуб", 
             font=("Arial", 20, "bold"),
             fg="#2E86AB"
@@ -26,18 +40,18 @@ class AuthWindow:
         title_label.pack(pady=20)
         
         # Поле для ввода логина
-        tk.Label(self.window, text="Имя пользователя:").pack(anchor="w", padx=50)
-        self.login_entry = tk.Entry(self.window, width=30)
+        tk.Label(self.frame, text="Имя пользователя:").pack(anchor="w", padx=50)
+        self.login_entry = tk.Entry(self.frame, width=30)
         self.login_entry.pack(pady=5, padx=50)
         
         # Поле для ввода пароля
-        tk.Label(self.window, text="Пароль:").pack(anchor="w", padx=50)
-        self.password_entry = tk.Entry(self.window, width=30, show="*")
+        tk.Label(self.frame, text="Пароль:").pack(anchor="w", padx=50)
+        self.password_entry = tk.Entry(self.frame, width=30, show="*")
         self.password_entry.pack(pady=5, padx=50)
         
         # Кнопка авторизации
         login_button = tk.Button(
-            self.window,
+            self.frame,
             text="Войти в систему",
             command=self._perform_login,
             bg="#2E86AB",
@@ -48,7 +62,7 @@ class AuthWindow:
         
         # Кнопка для гостевого доступа
         guest_button = tk.Button(
-            self.window,
+            self.frame,
             text="Продолжить как гость",
             command=self._guest_access,
             bg="#A23B72",
@@ -59,7 +73,7 @@ class AuthWindow:
         
         # Справочная информация
         hint_label = tk.Label(
-            self.window,
+            self.frame,
             text="Для тестового входа используйте:\nЛогин: a.belov@example.com Пароль: Fh9jQw",
             font=("Arial", 8),
             fg="gray"
@@ -72,25 +86,19 @@ class AuthWindow:
         password = self.password_entry.get().strip()
         
         if not username or not password:
-            messagebox.showerror("Ошибка ввода", "Необходимо указать имя пользователя и пароль")
+            messagebox.showerror("Ошибка ввода", "Необходимо указать имя пользователя и пароль", parent=self.window)
             return
         
         user_info = self.db.authenticate_user(username, password)
         if user_info:
-            self.window.destroy()
             self.on_success_callback(user_info)
         else:
-            messagebox.showerror("Ошибка авторизации", "Введены неверные учетные данные")
+            messagebox.showerror("Ошибка авторизации", "Введены неверные учетные данные", parent=self.window)
     
     def _guest_access(self):
         """Авторизация в режиме гостя"""
-        self.window.destroy()
         self.on_success_callback({
             'user_id': None,
             'role': 'Гость',
             'full_name': 'Гость'
         })
-    
-    def start(self):
-        """Запуск основного цикла окна авторизации"""
-        self.window.mainloop()
\ No newline at end of file
@@ -0,0 +1,774 @@
+import argparse
+import asyncio
+import base64
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Optional
+from urllib.parse import quote, urlsplit
+
+from catalog_facets import CatalogFilters, sort_key
+from catalog_snapshot import build_snapshot, load_snapshot, snapshot_path
+from cover_service import thumbnail_path
+from data_generator import GENRES, PUBLISHERS, SOURCE_DB, TITLE_NOUNS, generate_database, make_surnames
+from database import DatabaseManager
+from fuzzy_search import TRANSLIT, fold_text, fold_words
+from models import CARD_COLUMNS, book_row_factory, projection
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+QUERIES = ("булгаков", "мастер", "классика", "белая гвардия", "тихий дон", "эксмо", "толстой лев")
+REPEATS = 5
+
+# Набор для проверки полноты нечеткого поиска по поставляемой базе:
+# запрос с опечаткой или в транслитерации и артикул книги, которая должна
+# оказаться среди первых RECALL_TOP результатов
+RECALL_QUERIES = (
+    ("Булгков", "B112F4"), ("bulgakov", "B112F4"), ("master i margarita", "B112F4"),
+    ("Дастаевский", "H782T5"), ("dostoevsky", "H782T5"), ("prestuplenie i nakazanie", "H782T5"),
+    ("Ремарг", "G783F5"), ("tri tovarishcha", "G783F5"), ("Экзюпири", "J384T6"),
+    ("malenkiy prints", "J384T6"), ("sherlok holms", "D572U8"), ("Конан Дойль", "D572U8"),
+    ("garri potter", "F572H7"), ("Роулин", "F572H7"), ("agata kristi", "D329H3"),
+    ("Убийство в восточном експрессе", "D329H3"), ("tolstoy", "B320R5"), ("voyna i mir", "B320R5"),
+    ("paulo koelo", "G432E4"), ("Алхимиk", "G432E4"), ("oskar uayld", "S213E3"),
+    ("dorian grey", "S213E3"), ("Селинджер", "E482R4"), ("nad propastyu vo rzhi", "E482R4"),
+    ("igra endera", "S634B5"), ("avtostopom po galaktike", "K345R4"), ("Дуглас Адамc", "K345R4"),
+    ("cvety dlya eldzhernona", "O754F4"), ("Оруел", "F635R4"), ("Фёдор Достаевский", "H782T5"),
+)
+RECALL_TOP = 10
+
+# Сокращенный цикл входа и выхода для автоматической проверки (--check)
+CHECK_SOAK_CYCLES = 60
+CHECK_SOAK_WARMUP = 20
+# Проверка нечеткого поиска на синтетическом каталоге: размер, наименьшая
+# допустимая полнота и предельное время p99 одного запроса
+CHECK_RECALL_BOOKS = 100_000
+CHECK_MIN_RECALL = 0.95
+CHECK_FUZZY_P99_MS = 100
+
+
+def percentiles(samples):
+    """Перцентили p50/p95/p99 и максимум в миллисекундах"""
+    ordered = sorted(samples)
+    
+    def pick(fraction):
+        return round(ordered[min(int(len(ordered) * fraction), len(ordered) - 1)], 3)
+    
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": round(ordered[-1], 3)}
+
+
+def measure_search(search, queries=QUERIES, repeats: int = REPEATS):
+    """Распределение времени выполнения поисковых запросов"""
+    samples = []
+    for _ in range(repeats):
+        for query in queries:
+            started = time.perf_counter()
+            search(query)
+            samples.append((time.perf_counter() - started) * 1000)
+    return percentiles(samples)
+
+
+def measure_dashboard(db: DatabaseManager, repeats: int = REPEATS):
+    """Время запросов панели заказов: сводка продаж и первые страницы списка"""
+    pickup_points = [point['point_id'] for point in db.get_pickup_points()[:5]]
+    queries = {
+        "summary": lambda: db.get_sales_summary(),
+        "orders": lambda: db.get_orders(limit=50),
+        "orders_by_status": lambda: db.get_orders(status="Доставлен", limit=50),
+        "orders_by_point": lambda: [db.get_orders(pickup_point_id=point, limit=50) for point in pickup_points],
+        "orders_by_client": lambda: db.get_orders(client_name="Булгаков Михаил", limit=50),
+    }
+    result = {}
+    for name, run in queries.items():
+        samples = []
+        for _ in range(repeats * 4):
+            started = time.perf_counter()
+            run()
+            samples.append((time.perf_counter() - started) * 1000)
+        result[name] = percentiles(samples)
+    return result
+
+
+def measure_facets(db: DatabaseManager, repeats: int = REPEATS):
+    """Время подсчета фасетов и выборки двух страниц с фильтрами и сортировкой"""
+    cases = {
+        "all": (None, CatalogFilters(), "title"),
+        "genre": (None, CatalogFilters(genres=GENRES[:2]), "title"),
+        "price": (None, CatalogFilters(in_stock=True), "price"),
+        "year_desc": (None, CatalogFilters(publishers=PUBLISHERS[:1], year_from=1950), "year_desc"),
+        "search": ("классика", CatalogFilters(on_sale=True), "price_desc"),
+    }
+    result = {}
+    for name, (query, filters, sort) in cases.items():
+        facet_samples, page_samples = [], []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            db.get_facets(query, filters)
+            facet_samples.append((time.perf_counter() - started) * 1000)
+            
+            started = time.perf_counter()
+            page = db.query_books(query, filters, sort, limit=30, columns=CARD_COLUMNS)
+            if page:
+                db.query_books(query, filters, sort, after=sort_key(page[-1], sort), limit=30, columns=CARD_COLUMNS)
+            page_samples.append((time.perf_counter() - started) * 1000)
+        result[name] = {"facets": percentiles(facet_samples), "pages": percentiles(page_samples)}
+    return result
+
+
+def measure_snapshot(db_path: str, resources_dir: str, repeats: int = REPEATS):
+    """Сборка снимка каталога и холодный запуск: первая страница и обложки
+    из снимка против первой страницы из базы и миниатюр с диска через PIL"""
+    from PIL import Image
+    
+    db = DatabaseManager(db_path, cache_catalog=False)
+    build = build_snapshot(db, snapshot_path(db_path), resources_dir)
+    
+    snapshot_samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        snapshot = load_snapshot(db, resources_dir=resources_dir, rebuild=False)
+        snapshot.page(None, 30)
+        snapshot_samples.append((time.perf_counter() - started) * 1000)
+        snapshot.close()
+    db.close()
+    
+    # Каждый замер с базой начинается с нового подключения и пустого кэша каталога
+    db_samples = []
+    for _ in range(3):
+        cold_db = DatabaseManager(db_path)
+        started = time.perf_counter()
+        cold_db.iter_books("", limit=30, columns=CARD_COLUMNS)
+        db_samples.append((time.perf_counter() - started) * 1000)
+        cold_db.close()
+    
+    snapshot = load_snapshot(DatabaseManager(db_path, cache_catalog=False), resources_dir=resources_dir, rebuild=False)
+    names = [snapshot._string(snapshot.cover_names, index) for index in range(snapshot.meta["covers"]["count"])]
+    started = time.perf_counter()
+    for name in names:
+        base64.b64encode(snapshot.thumbnail(name))
+    packed_ms = (time.perf_counter() - started) * 1000 / max(len(names), 1)
+    started = time.perf_counter()
+    for name in names:
+        Image.open(thumbnail_path(os.path.join(resources_dir, name), thumbnail_dir=os.path.join(resources_dir, ".thumbnails"))).load()
+    pil_ms = (time.perf_counter() - started) * 1000 / max(len(names), 1)
+    snapshot.close()
+    return {
+        "build_s": build["seconds"],
+        "size_kb": build["size_kb"],
+        "covers": build["covers"],
+        "first_page_ms": percentiles(snapshot_samples),
+        "db_first_page_ms": percentiles(db_samples),
+        "cover_ms": round(packed_ms, 3),
+        "pil_cover_ms": round(pil_ms, 3),
+    }
+
+
+def misspell(word: str, rng: random.Random) -> str:
+    """Слово с одной случайной опечаткой: пропуск, перестановка или замена буквы"""
+    position = rng.randrange(1, len(word) - 1)
+    kind = rng.choice(("drop", "swap", "replace"))
+    if kind == "drop":
+        return word[:position] + word[position + 1:]
+    if kind == "swap":
+        return word[:position] + word[position + 1] + word[position] + word[position + 2:]
+    return word[:position] + rng.choice("аеиоуя") + word[position + 1:]
+
+
+def measure_fuzzy(db: DatabaseManager, seed: int, samples: int = 100):
+    """Время и полнота нечеткого поиска по словам с опечатками и в транслитерации"""
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    db.trigram_index.search("прогрев")
+    build_s = time.perf_counter() - started
+    
+    words = [word.lower() for word in make_surnames() + TITLE_NOUNS]
+    cases = {
+        "typo": [(misspell(word, rng), word) for word in rng.choices(words, k=samples)],
+        "translit": [("".join(TRANSLIT.get(ch, ch) for ch in word), word) for word in rng.choices(words, k=samples)],
+    }
+    result = {"build_s": round(build_s, 3)}
+    for name, queries in cases.items():
+        latency, hits = [], 0
+        for query, word in queries:
+            started = time.perf_counter()
+            books = db.fuzzy_books(query, limit=RECALL_TOP, columns=("title", "author"))
+            latency.append((time.perf_counter() - started) * 1000)
+            target = fold_text(word)
+            hits += any(target in fold_words(f"{book['title']} {book['author']}") for book in books)
+        result[name] = {"ms": percentiles(latency), "recall": round(hits / len(queries), 3)}
+    return result
+
+
+def run_fuzzy_recall(db_path: str = SOURCE_DB) -> bool:
+    """Проверка полноты нечеткого поиска по набору RECALL_QUERIES"""
+    with tempfile.TemporaryDirectory() as tmp:
+        # Индекс сохраняется в базе, поэтому проверка выполняется на копии
+        copy_path = os.path.join(tmp, "recall.db")
+        shutil.copyfile(db_path, copy_path)
+        db = DatabaseManager(copy_path, cache_catalog=False)
+        try:
+            misses = []
+            for query, article in RECALL_QUERIES:
+                books = db.fuzzy_books(query, limit=RECALL_TOP, columns=("article", "title"))
+                if article not in [book['article'] for book in books]:
+                    misses.append((query, article, [book['title'] for book in books[:3]]))
+        finally:
+            db.close()
+    
+    recall = 1 - len(misses) / len(RECALL_QUERIES)
+    for query, article, found in misses:
+        print(f" не найдено: {query!r} -> {article}, первые результаты: {found}")
+    print(f"полнота нечеткого поиска: {recall:.3f} ({len(RECALL_QUERIES) - len(misses)} из {len(RECALL_QUERIES)})")
+    return not misses
+
+
+def run_generated_recall(books: int = CHECK_RECALL_BOOKS, seed: int = 42, samples: int = 200) -> bool:
+    """Проверка полноты и времени нечеткого поиска на синтетическом каталоге"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "recall.db")
+        generate_database(db_path, books, seed, orders=0)
+        db = DatabaseManager(db_path, cache_catalog=False)
+        try:
+            result = measure_fuzzy(db, seed, samples)
+        finally:
+            db.close()
+    
+    ok = True
+    print(f"построение индекса: {result['build_s']} с")
+    for name in ("typo", "translit"):
+        stats, recall = result[name]["ms"], result[name]["recall"]
+        print(f"{name:<10} полнота {recall:.3f}, p50 {stats['p50']:.2f} мс, p99 {stats['p99']:.2f} мс")
+        ok = ok and recall >= CHECK_MIN_RECALL and stats["p99"] <= CHECK_FUZZY_P99_MS
+    print("OK" if ok else f"ОШИБКА: полнота ниже {CHECK_MIN_RECALL} или p99 выше {CHECK_FUZZY_P99_MS} мс")
+    return ok
+
+
+def measure_row_decoding(db_path: str):
+    """Скорость получения строк и размер записи: словари против Book с проекцией"""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    
+    # Прежний способ: SELECT * и построение словаря по cursor.description
+    started = time.perf_counter()
+    cursor = conn.execute("SELECT * FROM books")
+    columns = [description[0] for description in cursor.description]
+    dicts = []
+    for row in cursor.fetchall():
+        book_dict = {}
+        for i, column in enumerate(columns):
+            book_dict[column] = row[i]
+        dicts.append(book_dict)
+    dict_elapsed = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    cursor = conn.cursor()
+    cursor.row_factory = book_row_factory
+    books = cursor.execute(f"SELECT {projection(CARD_COLUMNS)} FROM books").fetchall()
+    book_elapsed = time.perf_counter() - started
+    conn.close()
+    
+    # Размер самой записи без учета хранимых в ней значений
+    return {
+        "dict_rows_per_sec": round(len(dicts) / dict_elapsed),
+        "dict_bytes_per_row": round(sum(sys.getsizeof(book) for book in dicts) / len(dicts)),
+        "book_rows_per_sec": round(len(books) / book_elapsed),
+        "book_bytes_per_row": round(sum(sys.getsizeof(book) for book in books) / len(books)),
+    }
+
+
+def measure_ui(db_path: str, repeats: int = REPEATS, first_page_timeout: float = 30.0):
+    """Время запуска до первого кадра каталога, до первой страницы книг и время отрисовки сетки.
+    
+    Окно создается скрытым; без доступного дисплея (например, вне Xvfb)
+    замеры интерфейса пропускаются.
+    """
+    import tkinter as tk
+    from main import LiteratureClubApp
+    
+    started = time.perf_counter()
+    try:
+        app = LiteratureClubApp(db_path)
+    except tk.TclError as e:
+        print(f" Замеры интерфейса пропущены: {e}")
+        return None
+    app.root.withdraw()
+    app.on_auth_success({'user_id': 1, 'role': 'Авторизованный клиент', 'full_name': 'Замер'})
+    app.root.update()
+    startup_ms = (time.perf_counter() - started) * 1000
+    
+    # Первая страница приходит из фонового потока поиска
+    deadline = time.perf_counter() + first_page_timeout
+    while not app.main_window.first_page_shown and time.perf_counter() < deadline:
+        app.root.update()
+        time.sleep(0.001)
+    first_page_ms = (time.perf_counter() - started) * 1000
+    
+    grid = app.main_window.book_grid
+    pages = [app.db.iter_books(query, limit=30, columns=CARD_COLUMNS) for query in QUERIES]
+    samples = []
+    for _ in range(repeats):
+        for page in pages:
+            started = time.perf_counter()
+            grid.set_books(page)
+            app.root.update_idletasks()
+            samples.append((time.perf_counter() - started) * 1000)
+    
+    app.main_window.destroy()
+    app.cover_service.close()
+    app.root.destroy()
+    app.db.close()
+    return {
+        "startup_ms": round(startup_ms, 3),
+        "first_page_ms": round(first_page_ms, 3),
+        "grid_render_ms": percentiles(samples),
+    }
+
+
+def peak_rss_kb() -> int:
+    """Пиковый объем резидентной памяти процесса в килобайтах"""
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def current_rss_kb() -> int:
+    """Текущий объем резидентной памяти процесса в килобайтах"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        return peak_rss_kb()
+
+
+def count_widgets(widget) -> int:
+    """Число виджетов в дереве, начиная с указанного"""
+    return 1 + sum(count_widgets(child) for child in widget.winfo_children())
+
+
+@contextlib.contextmanager
+def virtual_display():
+    """Запуск Xvfb на время проверок интерфейса, если дисплей не задан.
+    
+    Без DISPLAY и без установленного Xvfb окружение не меняется, и проверки
+    интерфейса сообщают о пропуске.
+    """
+    if os.environ.get("DISPLAY") or shutil.which("Xvfb") is None:
+        yield
+        return
+    display = f":{random.randint(100, 999)}"
+    server = subprocess.Popen(["Xvfb", display, "-nolisten", "tcp"],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.environ["DISPLAY"] = display
+    try:
+        time.sleep(0.5)
+        yield
+    finally:
+        del os.environ["DISPLAY"]
+        server.terminate()
+        server.wait()
+
+
+def run_session_soak(cycles: int, warmup: int = 50, rss_limit_kb: int = 20_000) -> Optional[bool]:
+    """Многократный вход и выход из сеанса с контролем памяти и числа виджетов.
+    
+    Корневое окно скрыто; без доступного дисплея возвращается None.
+    """
+    import tkinter as tk
+    from main import LiteratureClubApp
+    
+    user = {'user_id': 1, 'role': 'Авторизованный клиент', 'full_name': 'Нагрузочный тест'}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bookworld.db")
+        shutil.copyfile(SOURCE_DB, db_path)
+        try:
+            app = LiteratureClubApp(db_path)
+        except tk.TclError as e:
+            print(f" Проверка сеансов пропущена: {e}")
+            return None
+        app.root.withdraw()
+        app.show_auth_window()
+        
+        baseline_widgets = baseline_rss = None
+        started = time.perf_counter()
+        for cycle in range(1, cycles + 1):
+            app.on_auth_success(user)
+            app.root.update()
+            app.logout()
+            app.root.update()
+            if cycle == warmup:
+                baseline_widgets = count_widgets(app.root)
+                baseline_rss = current_rss_kb()
+                started = time.perf_counter()
+        
+        measured = max(cycles - warmup, 1)
+        widgets = count_widgets(app.root)
+        rss = current_rss_kb()
+        app.maintenance.stop()
+        app.cover_service.close()
+        if app.snapshot is not None:
+            app.snapshot.close()
+        app.root.destroy()
+        app.db.close()
+    
+    print(f"циклов: {cycles}, среднее время цикла: {(time.perf_counter() - started) / measured * 1000:.2f} мс")
+    print(f"виджетов: {baseline_widgets} -> {widgets}, RSS: {baseline_rss} -> {rss} КБ")
+    ok = widgets == baseline_widgets and rss - baseline_rss <= rss_limit_kb
+    print("OK" if ok else "ОШИБКА: ресурсы растут от сеанса к сеансу")
+    return ok
+
+
+def run_checks(seed: int = 42) -> bool:
+    """Автоматические проверки: сокращенный цикл входа и выхода из сеанса
+    и полнота нечеткого поиска на поставляемой базе и синтетическом каталоге.
+    
+    Возвращает False, если хотя бы одна проверка не прошла; пропущенная
+    из-за отсутствия дисплея проверка ошибкой не считается.
+    """
+    results = {}
+    with virtual_display():
+        print(f"\n=== вход и выход из сеанса, {CHECK_SOAK_CYCLES} циклов ===")
+        results["сеансы"] = run_session_soak(CHECK_SOAK_CYCLES, warmup=CHECK_SOAK_WARMUP)
+    print("\n=== нечеткий поиск, поставляемая база ===")
+    results["полнота, база"] = run_fuzzy_recall()
+    print(f"\n=== нечеткий поиск, {CHECK_RECALL_BOOKS} книг ===")
+    results["полнота, синт."] = run_generated_recall(CHECK_RECALL_BOOKS, seed)
+    
+    print("\n=== итог проверок ===")
+    for name, ok in results.items():
+        print(f"{name:<16}{'пропущена' if ok is None else 'OK' if ok else 'ОШИБКА'}")
+    return all(ok is not False for ok in results.values())
+
+
+def _reservation_worker(db_path: str, articles, attempts: int, seed: int, results):
+    """Процесс нагрузочного теста: случайные заказы на ограниченный набор книг"""
+    db = DatabaseManager(db_path, pool_size=1, cache_catalog=False)
+    rng = random.Random(seed)
+    reserved = rejected = 0
+    for _ in range(attempts):
+        items = [(rng.choice(articles), rng.randint(1, 2)) for _ in range(rng.randint(1, 3))]
+        if db.reserve_books(items, "Нагрузочный тест", 1):
+            reserved += 1
+        else:
+            rejected += 1
+    db.close()
+    results.put((reserved, rejected))
+
+
+def run_reservation_stress(processes: int, books: int = 20, stock: int = 100,
+                           attempts: int = 500, seed: int = 42) -> bool:
+    """Одновременное резервирование из нескольких процессов с проверкой отсутствия перепродаж.
+    
+    Спрос заведомо превышает остаток, поэтому часть заказов упирается в нулевой
+    остаток; сумма проданного по каждой книге должна совпасть со списанным.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "stress.db")
+        generate_database(db_path, max(books, 1000), seed, orders=0)
+        DatabaseManager(db_path, cache_catalog=False).close()
+        
+        with sqlite3.connect(db_path) as conn:
+            articles = [row[0] for row in conn.execute("SELECT article FROM books ORDER BY article LIMIT ?", (books,))]
+            conn.executemany("UPDATE books SET stock_quantity = ? WHERE article = ?", [(stock, a) for a in articles])
+        
+        results = multiprocessing.Queue()
+        workers = [
+            multiprocessing.Process(target=_reservation_worker, args=(db_path, articles, attempts, seed + i, results))
+            for i in range(processes)
+        ]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        totals = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        
+        with sqlite3.connect(db_path) as conn:
+            oversold = conn.execute(
+                f"""
+                SELECT COUNT(*) FROM books
+                WHERE article IN ({', '.join('?' * len(articles))})
+                  AND (stock_quantity < 0 OR stock_quantity + (
+                      SELECT COALESCE(SUM(quantity), 0) FROM order_items WHERE book_article = books.article
+                  ) <> ?)
+                """,
+                (*articles, stock)
+            ).fetchone()[0]
+            orders = conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+    
+    reserved = sum(total[0] for total in totals)
+    rejected = sum(total[1] for total in totals)
+    print(f"процессов: {processes}, заказов: {reserved}, отказов: {rejected}, за {elapsed:.2f} с")
+    print(f"пропускная способность: {reserved / elapsed:.0f} резервирований/с")
+    print(f"книг с перепродажей или расхождением остатка: {oversold}")
+    ok = oversold == 0 and orders == reserved
+    print("OK" if ok else "ОШИБКА: остатки не сходятся с заказами")
+    return ok
+
+
+async def _http_client(host: str, port: int, requests: dict, deadline: float, seed: int, samples, errors):
+    """Клиент нагрузочного теста: запросы по одному соединению keep-alive до истечения времени"""
+    rng = random.Random(seed)
+    kinds = sorted(requests)
+    reader, writer = await asyncio.open_connection(host, port)
+    etags = {}
+    while time.perf_counter() < deadline:
+        kind = rng.choice(kinds)
+        path = rng.choice(requests[kind])
+        request = f"GET {path} HTTP/1.1\r\nHost: {host}\r\n"
+        if kind == "revalidate" and path in etags:
+            request += f"If-None-Match: {etags[path]}\r\n"
+        
+        started = time.perf_counter()
+        writer.write((request + "\r\n").encode("utf-8"))
+        status = int((await reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1")
+            if line in ("\r\n", ""):
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        await reader.readexactly(int(headers.get("content-length", 0)))
+        samples.setdefault(kind, []).append((time.perf_counter() - started) * 1000)
+        
+        if status not in (200, 304):
+            errors.append((status, path))
+        if "etag" in headers:
+            etags[path] = headers["etag"]
+    writer.close()
+
+
+def _start_service(db_path: str, resources_dir: str):
+    """Запуск сервиса каталога в отдельном процессе на свободном порту"""
+    service = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalog_service.py"),
+         "--db", db_path, "--resources", resources_dir, "--port", "0"],
+        stdout=subprocess.PIPE, text=True
+    )
+    line = service.stdout.readline()
+    if "http://" not in line:
+        service.kill()
+        raise RuntimeError("сервис каталога не запустился")
+    return service, line[line.index("http://"):].rsplit("/api/", 1)[0]
+
+
+def run_http_load(connections: int, duration: float = 10.0, url: str = None,
+                  books: int = 100_000, seed: int = 42) -> bool:
+    """Нагрузочный тест HTTP-сервиса каталога: запросов в секунду и задержки p50/p99.
+    
+    Без url сервис запускается в отдельном процессе над синтетическим каталогом.
+    Смесь запросов: первая страница, поиск, книга по артикулу, обложка и
+    повторная проверка страницы по If-None-Match.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        service = None
+        if url is None:
+            db_path = os.path.join(tmp, "service.db")
+            resources_dir = os.path.join(tmp, "resources")
+            generate_database(db_path, books, seed, resources_dir=resources_dir)
+            service, url = _start_service(db_path, resources_dir)
+        
+        try:
+            with urllib.request.urlopen(f"{url}/api/books?limit=100") as response:
+                page = json.load(response)["books"]
+            requests = {
+                "page": ["/api/books?limit=30"],
+                "revalidate": ["/api/books?limit=30"],
+                "search": [f"/api/books?q={quote(query)}&limit=30" for query in QUERIES],
+                "book": [f"/api/books/{quote(book['article'])}" for book in page],
+                "cover": [f"/api/covers/{quote(book['article'])}" for book in page if book['cover_image']],
+            }
+            requests = {kind: paths for kind, paths in requests.items() if paths}
+            
+            address = urlsplit(url)
+            samples, errors = {}, []
+            deadline = time.perf_counter() + duration
+            started = time.perf_counter()
+            
+            async def run_clients():
+                await asyncio.gather(*(
+                    _http_client(address.hostname, address.port, requests, deadline, seed + i, samples, errors)
+                    for i in range(connections)
+                ))
+            
+            asyncio.run(run_clients())
+            elapsed = time.perf_counter() - started
+        finally:
+            if service is not None:
+                service.terminate()
+                service.wait()
+    
+    total = sum(len(values) for values in samples.values())
+    print(f"соединений: {connections}, запросов: {total} за {elapsed:.2f} с, {total / elapsed:.0f} запросов/с")
+    print(f"{'запрос, мс':<16}{'число':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for kind, values in sorted(samples.items()) + [("всего", [v for values in samples.values() for v in values])]:
+        stats = percentiles(values)
+        print(f"{kind:<16}{len(values):>10}{stats['p50']:>10.2f}{stats['p95']:>10.2f}{stats['p99']:>10.2f}")
+    print("OK" if not errors else f"ОШИБКА: {len(errors)} неуспешных ответов, например {errors[0]}")
+    return not errors
+
+
+def benchmark_size(size: int, seed: int, with_ui: bool, orders: int = None):
+    """Полный набор замеров для каталога заданного размера"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        started = time.perf_counter()
+        generate_database(db_path, size, seed, resources_dir=os.path.join(tmp, "resources"), orders=orders)
+        generate_s = time.perf_counter() - started
+        
+        # Первое открытие базы создает индексы и заполняет сводные таблицы
+        started = time.perf_counter()
+        fts_db = DatabaseManager(db_path, cache_catalog=False)
+        setup_s = time.perf_counter() - started
+        like_db = DatabaseManager(db_path, cache_catalog=False)
+        like_db.fts_enabled = False
+        cached_db = DatabaseManager(db_path)
+        
+        with sqlite3.connect(db_path) as conn:
+            order_items = conn.execute("SELECT COUNT(*) FROM order_items").fetchone()[0]
+        
+        result = {
+            "books": size,
+            "order_items": order_items,
+            "generate_s": round(generate_s, 3),
+            "setup_s": round(setup_s, 3),
+            "search_ms": {
+                "fts": measure_search(fts_db.get_all_books),
+                "like": measure_search(like_db.get_all_books),
+                "page": measure_search(lambda query: fts_db.iter_books(query, limit=30, columns=CARD_COLUMNS)),
+                "cached_page": measure_search(lambda query: cached_db.iter_books(query, limit=30, columns=CARD_COLUMNS)),
+            },
+            "dashboard_ms": measure_dashboard(fts_db),
+            "facets_ms": measure_facets(fts_db),
+            "cached_facets_ms": measure_facets(cached_db),
+            "fuzzy": measure_fuzzy(fts_db, seed),
+            "snapshot": measure_snapshot(db_path, os.path.join(tmp, "resources")),
+            "rows": measure_row_decoding(db_path),
+        }
+        for db in (fts_db, like_db, cached_db):
+            db.close()
+        
+        result["ui"] = measure_ui(db_path) if with_ui else None
+        result["peak_rss_kb"] = peak_rss_kb()
+        return result
+
+
+def print_result(result):
+    """Вывод результатов замеров в виде таблицы"""
+    print(
+        f"\n=== {result['books']} книг, {result['order_items']} позиций заказов "
+        f"(генерация {result['generate_s']} с, подготовка {result['setup_s']} с) ==="
+    )
+    print(f"{'поиск, мс':<16}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for name, stats in result["search_ms"].items():
+        print(f"{name:<16}{stats['p50']:>10.2f}{stats['p95']:>10.2f}{stats['p99']:>10.2f}")
+    
+    print(f"{'заказы, мс':<16}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for name, stats in result["dashboard_ms"].items():
+        print(f"{name:<16}{stats['p50']:>10.2f}{stats['p95']:>10.2f}{stats['p99']:>10.2f}")
+    
+    for key, title in (("facets_ms", "фильтры, мс"), ("cached_facets_ms", "фильтры, кэш")):
+        print(f"{title:<16}{'фасеты p50':>12}{'p99':>10}{'2 стр. p50':>12}{'p99':>10}")
+        for name, stats in result[key].items():
+            facets, pages = stats["facets"], stats["pages"]
+            print(f"{name:<16}{facets['p50']:>12.2f}{facets['p99']:>10.2f}{pages['p50']:>12.2f}{pages['p99']:>10.2f}")
+    
+    fuzzy = result["fuzzy"]
+    print(f"нечеткий поиск: построение индекса {fuzzy['build_s']} с")
+    print(f"{'':<16}{'p50':>10}{'p95':>10}{'p99':>10}{'полнота':>10}")
+    for name in ("typo", "translit"):
+        stats = fuzzy[name]["ms"]
+        print(f"{name:<16}{stats['p50']:>10.2f}{stats['p95']:>10.2f}{stats['p99']:>10.2f}{fuzzy[name]['recall']:>10.3f}")
+    
+    snapshot = result["snapshot"]
+    print(
+        f"снимок каталога: {snapshot['size_kb']} КБ, обложек {snapshot['covers']}, "
+        f"сборка {snapshot['build_s']} с"
+    )
+    print(
+        f"первая страница: снимок p50 {snapshot['first_page_ms']['p50']:.2f} мс, "
+        f"база p50 {snapshot['db_first_page_ms']['p50']:.2f} мс; обложка: снимок "
+        f"{snapshot['cover_ms']:.3f} мс, PIL {snapshot['pil_cover_ms']:.3f} мс"
+    )
+    
+    rows = result["rows"]
+    print(f"{'строки':<16}{'строк/с':>12}{'байт/строка':>14}")
+    print(f"{'dict, SELECT *':<16}{rows['dict_rows_per_sec']:>12}{rows['dict_bytes_per_row']:>14}")
+    print(f"{'Book, проекция':<16}{rows['book_rows_per_sec']:>12}{rows['book_bytes_per_row']:>14}")
+    
+    if result["ui"]:
+        grid = result["ui"]["grid_render_ms"]
+        print(f"запуск до первого кадра: {result['ui']['startup_ms']:.1f} мс")
+        print(f"запуск до первой страницы книг: {result['ui']['first_page_ms']:.1f} мс")
+        print(f"отрисовка сетки: p50 {grid['p50']:.2f} мс, p99 {grid['p99']:.2f} мс")
+    print(f"пиковый RSS: {result['peak_rss_kb']} КБ")
+
+
+def current_commit():
+    """Хеш текущего коммита git, если он доступен"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(sizes, seed: int = 42, with_ui: bool = True, json_path: str = None, orders: int = None):
+    report = {
+        "commit": current_commit(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "seed": seed,
+        "results": [],
+    }
+    for size in sizes:
+        result = benchmark_size(size, seed, with_ui, orders)
+        print_result(result)
+        report["results"].append(result)
+    
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+        print(f"\nРезультаты сохранены в {json_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Замеры производительности каталога")
+    parser.add_argument("sizes", nargs="*", type=int, help="размеры синтетического каталога")
+    parser.add_argument("--seed", type=int, default=42, help="начальное значение генератора данных")
+    parser.add_argument("--json", metavar="PATH", help="сохранить результаты в JSON")
+    parser.add_argument("--orders", type=int, help="число заказов (по умолчанию размер каталога / 10)")
+    parser.add_argument("--no-ui", action="store_true", help="не выполнять замеры интерфейса")
+    parser.add_argument("--soak", type=int, metavar="N", help="выполнить N циклов входа и выхода из сеанса")
+    parser.add_argument("--check", action="store_true",
+                        help="выполнить автоматические проверки и завершиться с ошибкой при их провале")
+    parser.add_argument("--stress", type=int, metavar="P", help="резервировать книги из P процессов одновременно")
+    parser.add_argument("--http", type=int, metavar="C", help="нагрузить HTTP-сервис каталога из C соединений")
+    parser.add_argument("--http-url", metavar="URL", help="адрес уже запущенного сервиса, например http://127.0.0.1:8765")
+    parser.add_argument("--recall", action="store_true", help="проверить полноту нечеткого поиска на поставляемой базе")
+    parser.add_argument("--duration", type=float, default=10.0, help="длительность нагрузочного теста HTTP в секундах")
+    args = parser.parse_args()
+    
+    if args.check:
+        sys.exit(0 if run_checks(args.seed) else 1)
+    if args.soak:
+        sys.exit(0 if run_session_soak(args.soak) is not False else 1)
+    if args.stress:
+        sys.exit(0 if run_reservation_stress(args.stress, seed=args.seed) else 1)
+    if args.recall:
+        sys.exit(0 if run_fuzzy_recall() else 1)
+    if args.http:
+        sys.exit(0 if run_http_load(args.http, args.duration, args.http_url, seed=args.seed) else 1)
+    main(args.sizes or DEFAULT_SIZES, args.seed, not args.no_ui, args.json, args.orders)
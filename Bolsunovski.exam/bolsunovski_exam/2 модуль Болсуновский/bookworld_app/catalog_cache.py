@@ -0,0 +1,260 @@
+import re
+import sqlite3
+import threading
+import unicodedata
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+from catalog_facets import CatalogFilters, facets_from_bitmaps, positions_bitmap, value_bitmaps
+from instrumentation import instrumentation
+from models import Book
+
+# Столбцы, по которым полнотекстовый индекс ищет совпадения
+SEARCH_COLUMNS = ("title", "author", "genre", "publisher", "description")
+
+
+def normalize_text(text: str) -> str:
+    """Приведение текста к виду, который использует токенизатор unicode61"""
+    decomposed = unicodedata.normalize("NFD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+
+def split_terms(text: str) -> List[str]:
+    """Разбиение нормализованного текста на слова"""
+    return re.findall(r"\w+", normalize_text(text))
+
+
+class CatalogCache:
+    """Снимок таблицы books в памяти, хранящийся по столбцам.
+    
+    Строки отсортированы по (title, article). Повторные запросы
+    обслуживаются из памяти, а запрос, продолжающий предыдущий,
+    фильтрует уже найденные строки без обращения к базе. Изменения,
+    сделанные другими подключениями и процессами, обнаруживаются по
+    PRAGMA data_version; затем по журналу books_changelog проверяется,
+    затронута ли таблица books, и измененные строки переносятся на свои
+    места в снимке без его пересортировки. Счетчики фасетов считаются по
+    битовым картам значений столбцов.
+    """
+    
+    def __init__(self, db, max_queries: int = 64, narrow_limit: int = 5000,
+                 max_changes: int = 5000):
+        self.db = db
+        self.max_queries = max_queries
+        self.narrow_limit = narrow_limit
+        self.max_changes = max_changes
+        self.lock = threading.Lock()
+        
+        self.columns = None
+        self.data = None
+        self.keys = None
+        self.positions = None
+        self.version = None
+        self.change_id = None
+        self.queries = OrderedDict()
+        self.bitmaps = None
+        self.masks = OrderedDict()
+        self.watch_conn = None
+    
+    def _data_version(self) -> int:
+        """Номер версии базы данных, меняющийся при фиксации изменений другими подключениями"""
+        if self.watch_conn is None:
+            # Отдельное подключение не участвует в записи, поэтому видит
+            # изменения как пула DatabaseManager, так и других процессов
+            self.watch_conn = sqlite3.connect(self.db.db_path, check_same_thread=False)
+        return self.watch_conn.execute("PRAGMA data_version").fetchone()[0]
+    
+    def _load(self):
+        """Полная загрузка снимка каталога"""
+        # Номер журнала читается до строк: изменение, зафиксированное между
+        # запросами, будет применено повторно, что не меняет результата
+        self.change_id = self.db.get_last_change_id()
+        with self.db.get_connection() as conn, instrumentation.span("cache.load"):
+            cursor = conn.execute("SELECT * FROM books ORDER BY title, article")
+            self.columns = [description[0] for description in cursor.description]
+            rows = cursor.fetchall()
+        self._build(rows)
+    
+    def _build(self, rows):
+        """Формирование столбцов снимка из отсортированных строк"""
+        self.data = {column: [row[i] for row in rows] for i, column in enumerate(self.columns)}
+        self.keys = list(zip(self.data["title"], self.data["article"]))
+        self.positions = {article: i for i, article in enumerate(self.data["article"])}
+        self._invalidate()
+    
+    def _invalidate(self):
+        """Сброс результатов запросов и битовых карт, зависящих от номеров строк"""
+        self.queries.clear()
+        self.bitmaps = None
+        self.masks.clear()
+    
+    def _refresh(self):
+        """Применение изменений таблицы books, записанных в журнал после загрузки.
+        
+        Фиксация, не затронувшая книги (заказы, резервирование без изменения
+        каталога, очистка журнала), определяется по номеру журнала и снимок
+        не трогает. Если записей слишком много или часть журнала уже удалена,
+        снимок перечитывается полностью.
+        """
+        if self.db.get_last_change_id() == self.change_id:
+            return
+        changes = self.db.get_book_changes(self.change_id, self.max_changes + 1)
+        # Номера AUTOINCREMENT идут подряд, пропуск означает удаленные записи
+        if not changes or len(changes) > self.max_changes or changes[0][0] != self.change_id + 1:
+            self._load()
+            return
+        
+        with instrumentation.span("cache.refresh") as span:
+            articles = list(dict.fromkeys(article for _, article, _ in changes))
+            rows = {
+                book['article']: tuple(book.get(column) for column in self.columns)
+                for book in self.db.get_books_by_articles(articles)
+            }
+            span.rows = len(articles)
+            title_index = self.columns.index("title")
+            article_index = self.columns.index("article")
+            
+            # Строка, сохранившая ключ сортировки, обновляется на месте;
+            # остальные удаляются и вставляются заново в позицию по ключу
+            removed = []
+            inserted = []
+            for article in articles:
+                position = self.positions.get(article)
+                row = rows.get(article)
+                if position is not None:
+                    if row is not None and self.keys[position] == (row[title_index], article):
+                        for column, value in zip(self.columns, row):
+                            self.data[column][position] = value
+                        continue
+                    removed.append(position)
+                    del self.positions[article]
+                if row is not None:
+                    inserted.append(row)
+            
+            lowest = len(self.keys)
+            for position in sorted(removed, reverse=True):
+                for values in self.data.values():
+                    del values[position]
+                del self.keys[position]
+                lowest = position
+            for row in inserted:
+                key = (row[title_index], row[article_index])
+                position = bisect_left(self.keys, key)
+                for column, value in zip(self.columns, row):
+                    self.data[column].insert(position, value)
+                self.keys.insert(position, key)
+                lowest = min(lowest, position)
+            # Номера строк до первой удаленной или вставленной не меняются
+            self.positions.update(zip(self.data["article"][lowest:], range(lowest, len(self.keys))))
+            
+            self.change_id = changes[-1][0]
+            self._invalidate()
+    
+    def ensure_fresh(self):
+        """Проверка актуальности снимка и его обновление при необходимости"""
+        version = self._data_version()
+        if self.data is None:
+            self._load()
+        elif version != self.version:
+            self._refresh()
+        self.version = version
+    
+    def _matches(self, index: int, terms: List[str]) -> bool:
+        """Проверка строки снимка на соответствие всем словам запроса по префиксу"""
+        words = set()
+        for column in SEARCH_COLUMNS:
+            value = self.data[column][index]
+            if value:
+                words.update(split_terms(str(value)))
+        return all(any(word.startswith(term) for word in words) for term in terms)
+    
+    def _search(self, search_query: str) -> List[int]:
+        """Номера строк снимка, соответствующих запросу, в порядке (title, article)"""
+        if not search_query:
+            return range(len(self.keys))
+        
+        cached = self.queries.get(search_query)
+        if cached is not None:
+            self.queries.move_to_end(search_query)
+            return cached
+        
+        # Сужение результата самого длинного из предыдущих запросов,
+        # продолжением которого является текущий
+        base = None
+        if self.db.fts_enabled:
+            for previous, indices in self.queries.items():
+                if (search_query.startswith(previous) and len(indices) <= self.narrow_limit
+                        and (base is None or len(previous) > len(base[0]))):
+                    base = (previous, indices)
+        
+        if base is not None:
+            terms = split_terms(search_query)
+            indices = [index for index in base[1] if self._matches(index, terms)]
+        else:
+            condition, params = self.db._search_condition(search_query)
+            with self.db.get_connection() as conn:
+                articles = conn.execute(f"SELECT article FROM books WHERE {condition}", params).fetchall()
+            indices = sorted(self.positions[row[0]] for row in articles if row[0] in self.positions)
+        
+        self.queries[search_query] = indices
+        while len(self.queries) > self.max_queries:
+            self.queries.popitem(last=False)
+        return indices
+    
+    def page(self, search_query: Optional[str], after: Optional[Tuple[str, str]],
+             limit: int, columns: Optional[Sequence[str]] = None) -> List[Book]:
+        """Страница результатов поиска, следующая за ключом (title, article)"""
+        with self.lock, instrumentation.span("cache.page") as span:
+            self.ensure_fresh()
+            indices = self._search((search_query or "").strip())
+            start = 0
+            if after is not None:
+                start = bisect_right(indices, tuple(after), key=lambda index: self.keys[index])
+            selected = [(column, self.data[column]) for column in (columns or self.columns)]
+            books = [
+                Book(**{column: values[index] for column, values in selected})
+                for index in indices[start:start + limit]
+            ]
+            span.rows = len(books)
+            return books
+    
+    def _build_bitmaps(self) -> Dict:
+        """Битовые карты значений фасетов; строятся при первом запросе счетчиков"""
+        size = len(self.keys)
+        return {
+            "genre": value_bitmaps(self.data["genre"]),
+            "publisher": value_bitmaps(self.data["publisher"]),
+            "year": value_bitmaps(self.data["year"]),
+            "on_sale": positions_bitmap((i for i, value in enumerate(self.data["on_sale"]) if value), size),
+            "in_stock": positions_bitmap(
+                (i for i, value in enumerate(self.data["stock_quantity"]) if value and value > 0), size
+            ),
+        }
+    
+    def _search_mask(self, search_query: str) -> int:
+        """Битовая карта строк, найденных запросом"""
+        if not search_query:
+            return (1 << len(self.keys)) - 1
+        mask = self.masks.get(search_query)
+        if mask is None:
+            mask = positions_bitmap(self._search(search_query), len(self.keys))
+            self.masks[search_query] = mask
+            while len(self.masks) > self.max_queries:
+                self.masks.popitem(last=False)
+        else:
+            self.masks.move_to_end(search_query)
+        return mask
+    
+    def facets(self, search_query: Optional[str], filters: Optional[CatalogFilters]) -> Dict:
+        """Счетчики фасетов для результатов поиска с учетом фильтров"""
+        with self.lock, instrumentation.span("cache.facets"):
+            self.ensure_fresh()
+            if self.bitmaps is None:
+                self.bitmaps = self._build_bitmaps()
+            return facets_from_bitmaps(self.bitmaps, self._search_mask((search_query or "").strip()), filters)
+    
+    def close(self):
+        """Закрытие подключения для отслеживания изменений"""
+        if self.watch_conn is not None:
+            self.watch_conn.close()
+            self.watch_conn = None
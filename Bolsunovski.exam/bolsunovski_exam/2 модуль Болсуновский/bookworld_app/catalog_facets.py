@@ -0,0 +1,291 @@
+from collections import Counter
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+# Фактическая цена книги с учетом акции; выражение совпадает с индексом
+# idx_books_price_article, иначе планировщик не сможет его использовать
+EFFECTIVE_PRICE_SQL = (
+    "CASE WHEN books.on_sale AND books.sale_price IS NOT NULL "
+    "THEN books.sale_price ELSE books.price END"
+)
+
+# Индексы для фильтров и сортировок: составные индексы с (title, article)
+# отдают страницу по одному жанру или издательству без сортировки, индексы
+# по году и цене обслуживают сортировки, а покрывающий индекс idx_books_facets
+# позволяет посчитать фасеты одним проходом без чтения строк таблицы
+FACET_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_books_genre_title ON books(genre, title, article)",
+    "CREATE INDEX IF NOT EXISTS idx_books_publisher_title ON books(publisher, title, article)",
+    "CREATE INDEX IF NOT EXISTS idx_books_year_article ON books(year, article)",
+    f"CREATE INDEX IF NOT EXISTS idx_books_price_article ON books({EFFECTIVE_PRICE_SQL.replace('books.', '')}, article)",
+    "CREATE INDEX IF NOT EXISTS idx_books_facets ON books(genre, publisher, year, on_sale, stock_quantity > 0)",
+)
+
+# Порядки сортировки: выражение ключа и направление
+SORT_ORDERS = {
+    "title": ("books.title", False),
+    "price": (EFFECTIVE_PRICE_SQL, False),
+    "price_desc": (EFFECTIVE_PRICE_SQL, True),
+    "year": ("books.year", False),
+    "year_desc": ("books.year", True),
+}
+DEFAULT_SORT = "title"
+
+# Столбцы, необходимые для вычисления ключа страницы при каждой сортировке
+SORT_COLUMNS = {
+    "title": ("title", "article"),
+    "price": ("price", "sale_price", "on_sale", "article"),
+    "price_desc": ("price", "sale_price", "on_sale", "article"),
+    "year": ("year", "article"),
+    "year_desc": ("year", "article"),
+}
+
+# Ширина интервала фасета по году издания
+YEAR_BUCKET = 10
+
+
+class CatalogFilters:
+    """Набор фильтров каталога.
+    
+    Пустой набор жанров или издательств и значения None не ограничивают
+    выборку; on_sale и in_stock отбирают только книги по акции и в наличии.
+    """
+    
+    __slots__ = ("genres", "publishers", "year_from", "year_to", "on_sale", "in_stock")
+    
+    def __init__(self, genres: Iterable[str] = (), publishers: Iterable[str] = (),
+                 year_from: Optional[int] = None, year_to: Optional[int] = None,
+                 on_sale: bool = False, in_stock: bool = False):
+        self.genres = tuple(sorted(set(genres)))
+        self.publishers = tuple(sorted(set(publishers)))
+        self.year_from = year_from
+        self.year_to = year_to
+        self.on_sale = on_sale
+        self.in_stock = in_stock
+    
+    def is_empty(self) -> bool:
+        """Фильтры не ограничивают выборку"""
+        return not (self.genres or self.publishers or self.year_from is not None
+                    or self.year_to is not None or self.on_sale or self.in_stock)
+    
+    def key(self) -> Tuple:
+        """Неизменяемое представление фильтров для кэширования"""
+        return tuple(getattr(self, name) for name in self.__slots__)
+    
+    def replace(self, **changes) -> "CatalogFilters":
+        """Копия набора фильтров с измененными значениями"""
+        values = dict(zip(self.__slots__, self.key()))
+        values.update(changes)
+        return CatalogFilters(**values)
+    
+    def __eq__(self, other):
+        return isinstance(other, CatalogFilters) and self.key() == other.key()
+    
+    def __hash__(self):
+        return hash(self.key())
+    
+    def year_matches(self, year) -> bool:
+        """Попадание года в заданный диапазон"""
+        return ((self.year_from is None or year >= self.year_from)
+                and (self.year_to is None or year <= self.year_to))
+    
+    def matches(self, book) -> bool:
+        """Соответствие книги фильтрам без обращения к базе"""
+        return ((not self.genres or book['genre'] in self.genres)
+                and (not self.publishers or book['publisher'] in self.publishers)
+                and self.year_matches(book['year'])
+                and (not self.on_sale or bool(book['on_sale']))
+                and (not self.in_stock or (book['stock_quantity'] or 0) > 0))
+
+
+def filter_condition(filters: Optional[CatalogFilters], sort: str = DEFAULT_SORT) -> Tuple[str, tuple]:
+    """Условие WHERE для фильтров каталога.
+    
+    При сортировке не по названию столбцы фильтров, кроме ключа сортировки,
+    помечаются унарным плюсом: планировщик читает индекс сортировки и
+    останавливается, набрав страницу, вместо сортировки всех подходящих строк.
+    """
+    if filters is None or filters.is_empty():
+        return "1", ()
+    
+    def column(name):
+        if sort == DEFAULT_SORT or SORT_ORDERS[sort][0] == f"books.{name}":
+            return f"books.{name}"
+        return f"+books.{name}"
+    
+    conditions, params = [], []
+    if filters.genres:
+        conditions.append(f"{column('genre')} IN ({', '.join('?' * len(filters.genres))})")
+        params.extend(filters.genres)
+    if filters.publishers:
+        conditions.append(f"{column('publisher')} IN ({', '.join('?' * len(filters.publishers))})")
+        params.extend(filters.publishers)
+    if filters.year_from is not None:
+        conditions.append(f"{column('year')} >= ?")
+        params.append(filters.year_from)
+    if filters.year_to is not None:
+        conditions.append(f"{column('year')} <= ?")
+        params.append(filters.year_to)
+    if filters.on_sale:
+        conditions.append(f"{column('on_sale')} = 1")
+    if filters.in_stock:
+        conditions.append(f"{column('stock_quantity')} > 0")
+    return " AND ".join(conditions), tuple(params)
+
+
+def order_clause(sort: str) -> str:
+    """Выражение ORDER BY для порядка сортировки"""
+    expression, descending = SORT_ORDERS[sort]
+    direction = " DESC" if descending else ""
+    return f"{expression}{direction}, books.article{direction}"
+
+
+def after_condition(sort: str, after: Sequence) -> Tuple[str, tuple]:
+    """Условие продолжения страницы после ключа (значение сортировки, article).
+    
+    Сравнение записано через отдельные условия, а не сравнением пар: так
+    планировщик начинает чтение индекса с нужной позиции и для выражения цены.
+    """
+    expression, descending = SORT_ORDERS[sort]
+    operator = "<" if descending else ">"
+    value, article = after
+    return (
+        f"({expression} {operator}= ? AND ({expression} {operator} ? OR books.article {operator} ?))",
+        (value, value, article)
+    )
+
+
+def sort_key(book, sort: str = DEFAULT_SORT) -> Tuple:
+    """Ключ книги для продолжения выборки в заданном порядке"""
+    if sort in ("price", "price_desc"):
+        on_sale = book['on_sale'] and book['sale_price'] is not None
+        return (book['sale_price'] if on_sale else book['price'], book['article'])
+    if sort in ("year", "year_desc"):
+        return (book['year'], book['article'])
+    return (book['title'], book['article'])
+
+
+def precedes(first: Tuple, second: Tuple, sort: str = DEFAULT_SORT) -> bool:
+    """Ключ first стоит раньше ключа second в заданном порядке сортировки"""
+    return first > second if SORT_ORDERS[sort][1] else first < second
+
+
+def empty_facets() -> Dict:
+    """Структура счетчиков фасетов"""
+    return {"total": 0, "genre": {}, "publisher": {}, "year": {}, "on_sale": 0, "in_stock": 0}
+
+
+def facets_from_groups(groups, filters: Optional[CatalogFilters]) -> Dict:
+    """Счетчики фасетов по сгруппированной выборке.
+    
+    groups - строки (genre, publisher, year, on_sale, in_stock, count).
+    Счетчик каждого фасета учитывает все фильтры, кроме фильтра самого
+    фасета, чтобы пользователь видел, сколько книг даст другой выбор.
+    """
+    filters = filters or CatalogFilters()
+    facets = empty_facets()
+    genres, publishers = set(filters.genres), set(filters.publishers)
+    for genre, publisher, year, on_sale, in_stock, count in groups:
+        passed = (
+            not genres or genre in genres,
+            not publishers or publisher in publishers,
+            filters.year_matches(year),
+            not filters.on_sale or bool(on_sale),
+            not filters.in_stock or bool(in_stock),
+        )
+        failed = passed.count(False)
+        if failed > 1:
+            continue
+        bucket = year // YEAR_BUCKET * YEAR_BUCKET
+        if failed == 0:
+            facets["total"] += count
+        if failed == 0 or not passed[0]:
+            facets["genre"][genre] = facets["genre"].get(genre, 0) + count
+        if failed == 0 or not passed[1]:
+            facets["publisher"][publisher] = facets["publisher"].get(publisher, 0) + count
+        if failed == 0 or not passed[2]:
+            facets["year"][bucket] = facets["year"].get(bucket, 0) + count
+        if on_sale and (failed == 0 or not passed[3]):
+            facets["on_sale"] += count
+        if in_stock and (failed == 0 or not passed[4]):
+            facets["in_stock"] += count
+    return facets
+
+
+def facets_from_books(books, filters: Optional[CatalogFilters]) -> Dict:
+    """Счетчики фасетов по уже выбранным книгам, например по результатам нечеткого поиска"""
+    groups = Counter(
+        (book['genre'], book['publisher'], book['year'], book['on_sale'], (book['stock_quantity'] or 0) > 0)
+        for book in books
+    )
+    return facets_from_groups(((*group, count) for group, count in groups.items()), filters)
+
+
+def positions_bitmap(positions: Iterable[int], size: int) -> int:
+    """Битовая карта (целое число), в которой установлены биты позиций"""
+    bits = bytearray((size + 7) // 8)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bits, "little")
+
+
+def value_bitmaps(values: Sequence) -> Dict:
+    """Битовые карты позиций для каждого значения столбца"""
+    groups = {}
+    for position, value in enumerate(values):
+        groups.setdefault(value, []).append(position)
+    return {value: positions_bitmap(positions, len(values)) for value, positions in groups.items()}
+
+
+def facets_from_bitmaps(bitmaps: Dict, search_mask: int, filters: Optional[CatalogFilters]) -> Dict:
+    """Счетчики фасетов по битовым картам снимка каталога.
+    
+    bitmaps содержит карты значений genre, publisher и year и карты книг
+    on_sale и in_stock; search_mask - карта строк, найденных поисковым запросом.
+    Семантика счетчиков та же, что и в facets_from_groups: значения
+    с нулевым счетчиком не возвращаются.
+    """
+    filters = filters or CatalogFilters()
+    masks = {}
+    if filters.genres:
+        masks["genre"] = _union(bitmaps["genre"], filters.genres)
+    if filters.publishers:
+        masks["publisher"] = _union(bitmaps["publisher"], filters.publishers)
+    if filters.year_from is not None or filters.year_to is not None:
+        masks["year"] = _union(bitmaps["year"], [year for year in bitmaps["year"] if filters.year_matches(year)])
+    if filters.on_sale:
+        masks["on_sale"] = bitmaps["on_sale"]
+    if filters.in_stock:
+        masks["in_stock"] = bitmaps["in_stock"]
+    
+    def base(excluded=None):
+        mask = search_mask
+        for name, facet_mask in masks.items():
+            if name != excluded:
+                mask &= facet_mask
+        return mask
+    
+    facets = empty_facets()
+    facets["total"] = base().bit_count()
+    for name in ("genre", "publisher"):
+        mask = base(name)
+        for value, bitmap in bitmaps[name].items():
+            count = (bitmap & mask).bit_count()
+            if count:
+                facets[name][value] = count
+    mask = base("year")
+    for year, bitmap in bitmaps["year"].items():
+        count = (bitmap & mask).bit_count()
+        if count:
+            bucket = year // YEAR_BUCKET * YEAR_BUCKET
+            facets["year"][bucket] = facets["year"].get(bucket, 0) + count
+    facets["on_sale"] = (bitmaps["on_sale"] & base("on_sale")).bit_count()
+    facets["in_stock"] = (bitmaps["in_stock"] & base("in_stock")).bit_count()
+    return facets
+
+
+def _union(bitmaps: Dict, values) -> int:
+    """Объединение битовых карт выбранных значений"""
+    mask = 0
+    for value in values:
+        mask |= bitmaps.get(value, 0)
+    return mask
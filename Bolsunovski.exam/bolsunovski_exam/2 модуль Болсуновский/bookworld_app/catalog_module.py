@@ -1,30 +1,210 @@
 import tkinter as tk
 from tkinter import ttk
-from PIL import Image, ImageTk
 import os
+import queue
+import threading
+from catalog_facets import DEFAULT_SORT, CatalogFilters, facets_from_books, precedes, sort_key
+from change_feed import ChangeFeed
+from cover_service import CoverService, resolve_cover_path
 from database import DatabaseManager
+from instrumentation import instrumentation, startup_profiler
+from models import CARD_COLUMNS
+from orders_module import OrdersWindow
+from ui_components import BookGrid, FilterPanel
+
+# Количество книг, подгружаемых за один раз
+BOOKS_PAGE_SIZE = 30
+
+# Задержка перед запуском поиска после последнего нажатия клавиши
+SEARCH_DEBOUNCE_MS = 300
+# Период проверки готовности результатов фонового поиска
+SEARCH_POLL_MS = 30
+# Период применения изменений каталога, сделанных другими окнами и процессами
+CHANGE_POLL_MS = 250
+
+
+class SearchWorker:
+    """Фоновый поток выполнения поисковых запросов к каталогу.
+    
+    Каждый новый запрос получает номер поколения; запросы и результаты
+    устаревших поколений отбрасываются, а выполняющийся запрос прерывается.
+    Вместе с первой страницей при необходимости считаются счетчики фасетов.
+    Следующие страницы текущего списка загружаются в том же потоке и
+    передаются в очередь pages, чтобы прокрутка не ждала базу данных.
+    Если точный поиск ничего не нашел, выполняется нечеткий поиск с учетом
+    опечаток и латинской транслитерации.
+    """
+    
+    def __init__(self, db: DatabaseManager, page_size: int):
+        self.db = db
+        self.page_size = page_size
+        self.generation = 0
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.pages = queue.Queue()
+        self.stopped = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+    
+    def submit(self, search_query: str, filters: CatalogFilters = None, sort: str = DEFAULT_SORT,
+               with_facets: bool = False) -> int:
+        """Постановка запроса в очередь; предыдущие запросы становятся устаревшими"""
+        self.generation += 1
+        self.requests.put(("search", self.generation, search_query, filters, sort, with_facets))
+        return self.generation
+    
+    def submit_page(self, search_query: str, filters: CatalogFilters, sort: str, after) -> int:
+        """Постановка в очередь загрузки страницы, следующей за ключом after.
+        
+        Страница относится к текущему поколению и отбрасывается, если до ее
+        загрузки будет запущен новый поиск.
+        """
+        self.requests.put(("page", self.generation, search_query, filters, sort, after))
+        return self.generation
+    
+    def stop(self):
+        """Остановка фонового потока"""
+        self.stopped = True
+        self.generation += 1
+        self.requests.put(None)
+        self.thread.join(timeout=1.0)
+    
+    def _run(self):
+        while not self.stopped:
+            requests = [self.requests.get()]
+            while not self.requests.empty():
+                requests.append(self.requests.get_nowait())
+            # Из накопившихся запросов выполняются только последний поиск и
+            # последняя страница текущего поколения
+            latest = {}
+            for request in requests:
+                if request is not None and request[1] == self.generation:
+                    latest[request[0]] = request
+            if "search" in latest:
+                self._search(*latest["search"][1:])
+            if "page" in latest:
+                self._load_page(*latest["page"][1:])
+    
+    def _search(self, generation, search_query, filters, sort, with_facets):
+        """Выполнение поиска и загрузка первой страницы результатов"""
+        is_cancelled = lambda: generation != self.generation
+        books = self.db.query_books(
+            search_query,
+            filters,
+            sort,
+            limit=self.page_size,
+            is_cancelled=is_cancelled,
+            columns=CARD_COLUMNS
+        )
+        fuzzy = False
+        if not books and search_query and not is_cancelled():
+            books = self.db.fuzzy_books(search_query, filters, limit=self.page_size, columns=CARD_COLUMNS)
+            fuzzy = bool(books)
+        facets = None
+        if with_facets and not is_cancelled():
+            if fuzzy:
+                facets = facets_from_books(books, filters)
+            else:
+                facets = self.db.get_facets(search_query, filters)
+        if not is_cancelled():
+            self.results.put((generation, search_query, filters, sort, books, facets, fuzzy))
+    
+    def _load_page(self, generation, search_query, filters, sort, after):
+        """Загрузка следующей страницы текущего списка"""
+        is_cancelled = lambda: generation != self.generation
+        books = self.db.query_books(
+            search_query,
+            filters,
+            sort,
+            after=after,
+            limit=self.page_size,
+            is_cancelled=is_cancelled,
+            columns=CARD_COLUMNS
+        )
+        if not is_cancelled():
+            self.pages.put((generation, after, books))
+
 
 class MainWindow:
-    def __init__(self, user_data, logout_callback):
+    """Экран каталога, размещаемый в общем корневом окне приложения"""
+    
+    def __init__(self, window, user_data, logout_callback, db: DatabaseManager,
+                 cover_service: CoverService, cover_index, snapshot=None):
         self.user_data = user_data
         self.logout_callback = logout_callback
-        self.db = DatabaseManager()
+        self.db = db
         
-        self.window = tk.Tk()
+        self.window = window
         self.window.title("Литературный Клуб - Каталог произведений")
         self.window.geometry("1000x700")
+        self.window.resizable(True, True)
         self.window.configure(bg="#f5f5f5")
+        self.frame = tk.Frame(self.window, bg="#f5f5f5")
+        self.frame.pack(fill="both", expand=True)
         
-        # Кэш для хранения изображений книг
-        self.book_images = {}
+        # Обложки книг загружаются лениво, только для видимых карточек
+        self.cover_service = cover_service
+        # Соответствие артикулов файлам обложек строится приложением один раз
+        # и дополняется данными из каждой загруженной страницы каталога
+        self.cover_index = cover_index
+        # Снимок каталога отдает первые страницы без обращения к базе, пока
+        # журнал изменений не сообщит о вставке, удалении или переименовании книги
+        self.snapshot = snapshot
         self._load_book_images()
         
+        self.search_query = None
+        self.filters = None
+        self.sort = DEFAULT_SORT
+        self.fuzzy = False
+        self.filter_panel = None
+        self.search_after_id = None
+        self.search_poll_id = None
+        self.page_load_id = None
+        self.page_load_pending = False
+        self.first_page_shown = False
+        self.orders_window = None
+        self.search_worker = SearchWorker(self.db, BOOKS_PAGE_SIZE)
+        # Снимок используется всеми окнами каталога приложения: правки,
+        # сделанные после закрытия прошлого окна, накладываются до запуска
+        # отслеживания, чтобы оно продолжило с того же номера журнала
+        snapshot_current = snapshot is not None and snapshot.replay(self.db)
+        # Изменения, полученные во время поиска, применяются к его результатам
+        self.change_feed = ChangeFeed(self.db)
+        self.pending_changes = []
+        self.change_poll_id = self.window.after(CHANGE_POLL_MS, self._poll_changes)
+        self.snapshot_pages = snapshot_current and snapshot.change_id == self.change_feed.last_change_id
+        
+        # Каркас окна отрисовывается сразу, а первая страница каталога
+        # берется из снимка или загружается в фоновом потоке поиска
         self._create_interface()
-        self._load_books()
+        startup_profiler.mark("каталог: каркас окна")
+        if self.snapshot_pages:
+            filters = self.filter_panel.filters() if self.filter_panel is not None else None
+            self._show_books("", filters, DEFAULT_SORT, self.snapshot.page(None, BOOKS_PAGE_SIZE),
+                             self.snapshot.facets)
+        else:
+            self.book_grid.show_loading()
+            self._start_search("")
     
     def _load_book_images(self):
-        """Загрузка изображений обложек книг"""
+        """Загрузка логотипа и изображения-заглушки"""
+        self.logo_image = None
+        self.placeholder_image = None
+        if self.snapshot is not None and self.snapshot.meta["images"]:
+            # Изображения в снимке уже уменьшены, PIL не требуется
+            from catalog_snapshot import photo_image
+            
+            logo, placeholder = self.snapshot.image("logo"), self.snapshot.image("placeholder")
+            self.logo_image = photo_image(logo) if logo is not None else None
+            self.placeholder_image = photo_image(placeholder) if placeholder is not None else None
+            return
+        if not os.path.exists("resources/logo.png") and not os.path.exists("resources/placeholder.png"):
+            return
+        
         try:
+            # PIL загружается только при наличии изображений оформления
+            from PIL import Image, ImageTk
+            
             # Загрузка логотипа приложения
             if os.path.exists("resources/logo.png"):
                 logo_image = Image.open("resources/logo.png")
@@ -33,14 +213,6 @@ class MainWindow:
             else:
                 self.logo_image = None
             
-            # Загрузка изображений обложек (1.png, 2.png, ..., 10.png)
-            for i in range(1, 11):
-                image_path = f"resources/{i}.png"
-                if os.path.exists(image_path):
-                    book_image = Image.open(image_path)
-                    book_image = book_image.resize((100, 150), Image.Resampling.LANCZOS)
-                    self.book_images[str(i)] = ImageTk.PhotoImage(book_image)
-            
             # Загрузка изображения-заглушки для отсутствующих обложек
             if os.path.exists("resources/placeholder.png"):
                 placeholder_image = Image.open("resources/placeholder.png")
@@ -48,43 +220,37 @@ class MainWindow:
                 self.placeholder_image = ImageTk.PhotoImage(placeholder_image)
             else:
                 self.placeholder_image = None
-                
+        
         except Exception as e:
             print(f"Произошла ошибка при загрузке изображений: {e}")
             self.logo_image = None
             self.placeholder_image = None
     
-    def _get_book_image(self, book_article):
-        """Получение изображения книги по артикулу"""
-        # Соответствие артикулов книг номерам изображений
-        article_to_image_map = {
-            'B112F4': '1',  # Мастер и Маргарита
-            'F635R4': '2',  # 1984
-            'H782T5': '3',  # Преступление и наказание
-            'G783F5': '4',  # Три товарища
-            'J384T6': '5',  # Маленький принц
-            'D572U8': '6',  # Шерлок Холмс
-            'F572H7': '7',  # Гарри Поттер
-            'D329H3': '8',  # Убийство в Восточном экспрессе
-            'B320R5': '9',  # Война и мир
-            'G432E4': '10', # Алхимик
-            'S213E3': None, # Портрет Дориана Грея (изображение отсутствует)
-            'E482R4': None, # Над пропастью во ржи (изображение отсутствует)
-            'S634B5': None, # Игра Эндера (изображение отсутствует)
-            'K345R4': None, # Автостопом по галактике (изображение отсутствует)
-            'O754F4': None  # Цветы для Элджернона (изображение отсутствует)
-        }
+    def _get_book_image(self, book_article, on_ready):
+        """Получение изображения книги по артикулу.
         
-        image_key = article_to_image_map.get(book_article)
-        if image_key and image_key in self.book_images:
-            return self.book_images[image_key]
+        Пока обложка загружается в фоне, возвращается заглушка, а готовое
+        изображение передается в on_ready.
+        """
+        cover_image = self.cover_index.get(book_article)
+        packed_image = self.cover_service.get_packed(cover_image)
+        if packed_image is not None:
+            return packed_image
+        image_path = resolve_cover_path(cover_image)
+        if image_path and os.path.exists(image_path):
+            return self.cover_service.get(image_path, on_ready) or self.placeholder_image
         else:
             return self.placeholder_image
     
+    def _update_cover_index(self, books):
+        """Обновление индекса обложек по свежим данным о книгах"""
+        for book in books:
+            self.cover_index[book['article']] = book['cover_image']
+    
     def _create_interface(self):
         """Создание пользовательского интерфейса главного окна"""
         # Верхняя панель с навигацией
-        header_frame = tk.Frame(self.window, bg="#2E86AB", height=80)
+        header_frame = tk.Frame(self.frame, bg="#2E86AB", height=80)
         header_frame.pack(fill="x", padx=10, pady=10)
         header_frame.pack_propagate(False)
         
@@ -125,9 +291,21 @@ class MainWindow:
         )
         logout_button.pack(anchor="e", pady=(5, 0))
         
+        # Просмотр заказов и сводки продаж доступен менеджерам и администраторам
+        if self.user_data['role'] in ('Менеджер', 'Администратор'):
+            orders_button = tk.Button(
+                header_frame,
+                text="Заказы",
+                command=self._open_orders,
+                bg="#2E86AB",
+                fg="white",
+                font=("Arial", 10)
+            )
+            orders_button.pack(side="right", padx=10)
+        
         # Панель поиска (доступна для клиентов, менеджеров и администраторов)
         if self.user_data['role'] != 'Гость':
-            search_frame = tk.Frame(self.window, bg="#f5f5f5")
+            search_frame = tk.Frame(self.frame, bg="#f5f5f5")
             search_frame.pack(fill="x", padx=20, pady=10)
             
             tk.Label(
@@ -151,185 +329,247 @@ class MainWindow:
             search_button.pack(side="left", padx=5)
         
         # Контейнер для отображения списка книг
-        self.books_frame = tk.Frame(self.window, bg="#f5f5f5")
+        self.books_frame = tk.Frame(self.frame, bg="#f5f5f5")
         self.books_frame.pack(fill="both", expand=True, padx=20, pady=10)
         
+        # Боковая панель фильтров и сортировки (недоступна для гостей)
+        if self.user_data['role'] != 'Гость':
+            self.filter_panel = FilterPanel(self.books_frame, on_change=self._on_filters_change)
+            self.filter_panel.frame.pack(side="left", fill="y", padx=(0, 10))
+        
         # Элементы для прокрутки содержимого
-        self.canvas = tk.Canvas(self.books_frame, bg="#f5f5f5")
+        self.canvas = tk.Canvas(self.books_frame, bg="#f5f5f5", highlightthickness=0)
         self.scrollbar = ttk.Scrollbar(self.books_frame, orient="vertical", command=self.canvas.yview)
-        self.scrollable_frame = tk.Frame(self.canvas, bg="#f5f5f5")
         
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+        # Сетка отображает только видимые карточки и переиспользует их при прокрутке
+        self.book_grid = BookGrid(
+            self.canvas,
+            self.scrollbar,
+            image_provider=lambda book, on_ready: self._get_book_image(book['article'], on_ready),
+            on_need_more=self._request_next_page
         )
         
-        self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        self.canvas.configure(yscrollcommand=self.scrollbar.set)
-        
         self.canvas.pack(side="left", fill="both", expand=True)
         self.scrollbar.pack(side="right", fill="y")
     
-    def _load_books(self, search_query: str = None):
-        """Загрузка и отображение списка книг"""
-        books = self.db.get_all_books(search_query)
-        
-        # Очистка предыдущего содержимого
-        for widget in self.scrollable_frame.winfo_children():
-            widget.destroy()
-        
-        if not books:
-            no_books_label = tk.Label(
-                self.scrollable_frame,
-                text="Книги по вашему запросу не найдены",
-                font=("Arial", 14),
-                bg="#f5f5f5",
-                fg="gray"
-            )
-            no_books_label.pack(pady=50)
+    def _open_orders(self):
+        """Открытие окна заказов или перевод его на передний план"""
+        if self.orders_window is not None:
+            self.orders_window.window.lift()
             return
-        
-        # Отображение книг в виде сетки
-        row_frame = None
-        for i, book in enumerate(books):
-            if i % 3 == 0:  # По 3 книги в каждой строке
-                row_frame = tk.Frame(self.scrollable_frame, bg="#f5f5f5")
-                row_frame.pack(fill="x", pady=10)
-            
-            self._create_book_card(row_frame, book)
+        self.orders_window = OrdersWindow(self.window, self.db, on_close=self._on_orders_closed)
     
-    def _create_book_card(self, parent, book):
-        """Создание карточки для отображения информации о книге"""
-        # Основной контейнер для карточки книги
-        book_bg_color = "#ADD8E6" if book['stock_quantity'] == 0 else "white"
-        book_frame = tk.Frame(
-            parent,
-            bg=book_bg_color,
-            relief="raised",
-            bd=1,
-            width=300,
-            height=200
-        )
-        book_frame.pack(side="left", padx=10, fill="both", expand=True)
-        book_frame.pack_propagate(False)
-        
-        # Внутренний контейнер для содержимого карточки
-        content_frame = tk.Frame(book_frame, bg=book_bg_color)
-        content_frame.pack(fill="both", expand=True, padx=10, pady=10)
+    def _on_orders_closed(self):
+        """Обработчик закрытия окна заказов"""
+        self.orders_window = None
+    
+    def _show_books(self, search_query, filters, sort, books, facets, fuzzy=False):
+        """Отображение первой страницы результатов поиска и счетчиков фильтров.
         
-        # Блок с изображением обложки
-        cover_frame = tk.Frame(content_frame, bg=book_bg_color)
-        cover_frame.pack(side="left", padx=(0, 10))
+        Результаты нечеткого поиска упорядочены по сходству и не подгружаются
+        постранично.
+        """
+        self.search_query = search_query
+        self.filters = filters
+        self.sort = sort
+        self.fuzzy = fuzzy
+        self.page_load_pending = False
+        self._update_cover_index(books)
+        self.last_book_key = sort_key(books[-1], sort) if books else None
+        self.book_grid.set_books(books, has_more=not fuzzy and len(books) == BOOKS_PAGE_SIZE)
+        if facets is not None and self.filter_panel is not None:
+            self.filter_panel.set_facets(facets)
+        pending_changes, self.pending_changes = self.pending_changes, []
+        for changes in pending_changes:
+            self._apply_changes(changes)
+        if not self.first_page_shown:
+            self.first_page_shown = True
+            startup_profiler.mark("каталог: первая страница")
+    
+    def _request_next_page(self):
+        """Планирование подгрузки следующей страницы при прокрутке к концу списка.
         
-        book_image = self._get_book_image(book['article'])
-        if book_image:
-            cover_label = tk.Label(cover_frame, image=book_image, bg=book_bg_color)
+        Страницы из базы загружает поток поиска, а результат забирается
+        периодической проверкой; пока выполняется новый поиск, подгрузка
+        не запускается, так как список все равно будет заменен.
+        """
+        if self.page_load_pending or self.search_poll_id is not None:
+            return
+        self.page_load_pending = True
+        if self._snapshot_serves_page():
+            # Страница снимка читается из отображенного файла без обращения к базе
+            self.page_load_id = self.window.after_idle(self._load_snapshot_page)
         else:
-            cover_label = tk.Label(
-                cover_frame, 
-                text="Обложка\nотсутствует", 
-                bg=book_bg_color,
-                font=("Arial", 8),
-                width=12,
-                height=8
-            )
-        cover_label.pack()
-        
-        # Блок с информацией о книге
-        info_frame = tk.Frame(content_frame, bg=book_bg_color)
-        info_frame.pack(side="left", fill="both", expand=True)
-        
-        # Название и автор произведения
-        title_font = ("Arial", 10, "bold")
-        title_label = tk.Label(
-            info_frame,
-            text=f"{book['title']} | {book['author']}",
-            font=title_font,
-            bg=book_bg_color,
-            wraplength=180,
-            justify="left"
-        )
-        title_label.pack(anchor="w")
-        
-        # Жанр произведения
-        tk.Label(
-            info_frame,
-            text=f"Жанр: {book['genre']}",
-            font=("Arial", 8),
-            bg=book_bg_color,
-            justify="left"
-        ).pack(anchor="w")
-        
-        # Информация об издательстве
-        tk.Label(
-            info_frame,
-            text=f"Издательство: {book['publisher']}",
-            font=("Arial", 8),
-            bg=book_bg_color,
-            justify="left"
-        ).pack(anchor="w")
-        
-        # Год издания
-        tk.Label(
-            info_frame,
-            text=f"Год издания: {book['year']}",
-            font=("Arial", 8),
-            bg=book_bg_color,
-            justify="left"
-        ).pack(anchor="w")
-        
-        # Блок с информацией о цене
-        price_frame = tk.Frame(info_frame, bg=book_bg_color)
-        price_frame.pack(anchor="w")
+            self.search_worker.submit_page(self.search_query, self.filters, self.sort, self.last_book_key)
+            self.page_load_id = self.window.after(SEARCH_POLL_MS, self._poll_page_results)
+    
+    def _load_snapshot_page(self):
+        """Подгрузка следующей страницы каталога из снимка"""
+        self.page_load_id = None
+        self._append_page(self.snapshot.page(self.last_book_key, BOOKS_PAGE_SIZE))
+    
+    def _poll_page_results(self):
+        """Добавление страницы, загруженной фоновым потоком, в конец сетки"""
+        self.page_load_id = None
+        page = None
+        while not self.search_worker.pages.empty():
+            page = self.search_worker.pages.get_nowait()
         
-        if book['on_sale'] and book['sale_price']:
-            # Отображение акционной цены
-            original_price_label = tk.Label(
-                price_frame,
-                text=f"{book['price']} руб.",
-                font=("Arial", 8, "overstrike"),
-                fg="red",
-                bg=book_bg_color
-            )
-            original_price_label.pack(side="left")
-            
-            sale_price_label = tk.Label(
-                price_frame,
-                text=f" {book['sale_price']} руб.",
-                font=("Arial", 9, "bold"),
-                fg="black",
-                bg=book_bg_color
-            )
-            sale_price_label.pack(side="left")
+        if page is not None and page[0] == self.search_worker.generation and page[1] == self.last_book_key:
+            self._append_page(page[2])
         else:
-            # Отображение стандартной цены
-            tk.Label(
-                price_frame,
-                text=f"Цена: {book['price']} руб.",
-                font=("Arial", 8),
-                bg=book_bg_color,
-                justify="left"
-            ).pack(anchor="w")
-        
-        # Информация о наличии на складе
-        stock_color = "red" if book['stock_quantity'] == 0 else "black"
-        tk.Label(
-            info_frame,
-            text=f"В наличии: {book['stock_quantity']} шт.",
-            font=("Arial", 8),
-            fg=stock_color,
-            bg=book_bg_color,
-            justify="left"
-        ).pack(anchor="w")
+            self.page_load_id = self.window.after(SEARCH_POLL_MS, self._poll_page_results)
+    
+    def _append_page(self, books):
+        """Добавление следующей страницы книг в конец сетки"""
+        self.page_load_pending = False
+        if not self.book_grid.has_more:
+            return
+        if books:
+            self.last_book_key = sort_key(books[-1], self.sort)
+            self._update_cover_index(books)
+        self.book_grid.append_books(books, has_more=len(books) == BOOKS_PAGE_SIZE)
+    
+    def _snapshot_serves_page(self) -> bool:
+        """Текущий список - весь каталог по названию, и снимок еще актуален"""
+        return (self.snapshot_pages and not self.search_query and not self.fuzzy
+                and (self.filters is None or self.filters.is_empty()) and self.sort == DEFAULT_SORT)
     
     def _on_search_change(self, event):
         """Обработка изменения текста в поле поиска"""
-        self._load_books(self.search_entry.get().strip())
+        search_query = self.search_entry.get().strip()
+        if self.search_after_id is not None:
+            self.window.after_cancel(self.search_after_id)
+            self.search_after_id = None
+        # Клавиши, не изменившие текст (стрелки, Shift и т.п.), поиск не запускают
+        if search_query == (self.search_query or "") and self.search_poll_id is None:
+            return
+        self.search_after_id = self.window.after(SEARCH_DEBOUNCE_MS, self._start_search, search_query)
     
     def _perform_search(self):
         """Выполнение поиска по введенному запросу"""
-        self._load_books(self.search_entry.get().strip())
+        if self.search_after_id is not None:
+            self.window.after_cancel(self.search_after_id)
+        self._start_search(self.search_entry.get().strip())
+    
+    def _on_filters_change(self):
+        """Перезапуск поиска при изменении фильтров или сортировки"""
+        if self.filter_panel.filters() == self.filters and self.filter_panel.sort() == self.sort:
+            return
+        if self.search_after_id is not None:
+            self.window.after_cancel(self.search_after_id)
+        self._start_search(self.search_entry.get().strip())
+    
+    def _start_search(self, search_query):
+        """Запуск поиска в фоновом потоке с текущими фильтрами"""
+        self.search_after_id = None
+        # Загружаемая страница относится к списку, который заменит поиск
+        if self.page_load_id is not None:
+            self.window.after_cancel(self.page_load_id)
+            self.page_load_id = None
+        self.page_load_pending = False
+        if self.filter_panel is not None:
+            self.search_worker.submit(search_query, self.filter_panel.filters(),
+                                      self.filter_panel.sort(), with_facets=True)
+        else:
+            self.search_worker.submit(search_query)
+        if self.search_poll_id is None:
+            self.search_poll_id = self.window.after(SEARCH_POLL_MS, self._poll_search_results)
+    
+    def _poll_search_results(self):
+        """Применение результатов фонового поиска в потоке интерфейса"""
+        self.search_poll_id = None
+        latest = None
+        while not self.search_worker.results.empty():
+            latest = self.search_worker.results.get_nowait()
+        
+        if latest is not None and latest[0] == self.search_worker.generation:
+            _, search_query, filters, sort, books, facets, fuzzy = latest
+            self._show_books(search_query, filters, sort, books, facets, fuzzy)
+        else:
+            self.search_poll_id = self.window.after(SEARCH_POLL_MS, self._poll_search_results)
+    
+    def _poll_changes(self):
+        """Получение изменений каталога от фонового потока отслеживания"""
+        self.change_poll_id = None
+        while not self.change_feed.changes.empty():
+            changes = self.change_feed.changes.get_nowait()
+            # Правки остатков и цен накладываются на снимок; вставка, удаление
+            # или переименование книги переключают подгрузку страниц на базу
+            if self.snapshot_pages:
+                self.snapshot_pages = self.snapshot.apply(changes)
+            if self.search_query is None or self.search_poll_id is not None:
+                self.pending_changes.append(changes)
+            else:
+                self._apply_changes(changes)
+        self.change_poll_id = self.window.after(CHANGE_POLL_MS, self._poll_changes)
+    
+    def _apply_changes(self, changes):
+        """Точечное применение изменений каталога к показанным книгам.
+        
+        Карточка изменившейся книги обновляется на месте. Книга, переставшая
+        подходить под фильтры, или удаленная книга убирается из сетки, а книга
+        с новым значением ключа сортировки переставляется. Новые книги
+        добавляются, только если поиск не задан и книга попадает в уже
+        загруженную часть списка; остальные появятся при подгрузке страниц.
+        """
+        if changes.reload:
+            self._start_search(self.search_query or "")
+            return
+        for article in changes.deleted:
+            self.cover_index.pop(article, None)
+        self._update_cover_index(changes.books.values())
+        
+        with instrumentation.span("ui.apply_changes") as span:
+            books = self.book_grid.books
+            positions = {book['article']: index for index, book in enumerate(books)}
+            removed = {positions[article] for article in changes.deleted if article in positions}
+            updated = {}
+            inserted = []
+            can_insert = not self.search_query and not self.fuzzy
+            for article, book in changes.books.items():
+                index = positions.get(article)
+                matches = self.filters is None or self.filters.matches(book)
+                if index is None:
+                    if can_insert and matches:
+                        inserted.append(book)
+                elif not matches:
+                    removed.add(index)
+                elif self.fuzzy or sort_key(book, self.sort) == sort_key(books[index], self.sort):
+                    updated[index] = book
+                else:
+                    removed.add(index)
+                    inserted.append(book)
+            
+            # Книги за последней загруженной страницей не вставляются: они
+            # придут со следующими страницами в порядке сортировки
+            if self.book_grid.has_more:
+                inserted = [book for book in inserted
+                            if precedes(sort_key(book, self.sort), self.last_book_key, self.sort)]
+            span.rows = len(removed) + len(updated) + len(inserted)
+            
+            if not removed and not inserted:
+                for index, book in updated.items():
+                    self.book_grid.update_book(index, book)
+                return
+            
+            books = [updated.get(index, book) for index, book in enumerate(books) if index not in removed]
+            for book in inserted:
+                key = sort_key(book, self.sort)
+                position = next((index for index, other in enumerate(books)
+                                 if precedes(key, sort_key(other, self.sort), self.sort)), len(books))
+                books.insert(position, book)
+            self.book_grid.replace_books(books)
     
-    def run(self):
-        """Запуск основного цикла приложения"""
-        self.window.mainloop()
\ No newline at end of file
+    def destroy(self):
+        """Удаление экрана каталога и остановка его фоновых задач"""
+        for after_id in (self.search_after_id, self.search_poll_id, self.page_load_id, self.change_poll_id):
+            if after_id is not None:
+                self.window.after_cancel(after_id)
+        self.search_worker.stop()
+        self.change_feed.stop()
+        if self.orders_window is not None:
+            self.orders_window.destroy()
+        # Карточки отвязываются от книг, чтобы поздние обложки их не обновляли
+        self.book_grid.clear()
+        self.frame.destroy()
\ No newline at end of file
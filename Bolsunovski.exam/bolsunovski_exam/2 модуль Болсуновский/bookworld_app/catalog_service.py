@@ -0,0 +1,298 @@
+import argparse
+import asyncio
+import base64
+import json
+import os
+import secrets
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from cover_service import COVER_SIZE, RESOURCES_DIR, create_thumbnail, resolve_cover_path, thumbnail_path
+from database import DatabaseManager
+from instrumentation import instrumentation
+from models import CARD_COLUMNS
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Размер страницы по умолчанию и наибольший допустимый размер
+DEFAULT_PAGE_SIZE = 30
+MAX_PAGE_SIZE = 200
+# Ограничения на запрос клиента
+MAX_HEADERS = 100
+KEEP_ALIVE_TIMEOUT = 15.0
+
+
+class HttpError(Exception):
+    """Ошибка, возвращаемая клиенту с указанным кодом ответа"""
+    
+    def __init__(self, status: HTTPStatus, message: str = None):
+        super().__init__(message or status.phrase)
+        self.status = status
+
+
+def encode_cursor(book) -> str:
+    """Непрозрачный ключ следующей страницы по (title, article) последней книги"""
+    key = json.dumps([book['title'], book['article']], ensure_ascii=False)
+    return base64.urlsafe_b64encode(key.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str):
+    """Ключ (title, article) из параметра after"""
+    try:
+        title, article = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(title), str(article)
+    except (ValueError, TypeError):
+        raise HttpError(HTTPStatus.BAD_REQUEST, "некорректный параметр after") from None
+
+
+class CatalogVersion:
+    """Версия каталога для заголовков ETag.
+    
+    Номер поколения увеличивается при каждой фиксации изменений в базе,
+    обнаруженной по PRAGMA data_version; префикс отличает запуски сервиса,
+    чтобы ETag прежнего процесса не совпал с новым.
+    """
+    
+    def __init__(self, db_path: str):
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.prefix = secrets.token_hex(4)
+        self.data_version = None
+        self.generation = 0
+    
+    def etag(self) -> str:
+        """Текущее значение ETag"""
+        with self.lock:
+            data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self.data_version:
+                self.data_version = data_version
+                self.generation += 1
+            return f'"{self.prefix}-{self.generation}"'
+    
+    def close(self):
+        """Закрытие подключения для отслеживания изменений"""
+        self.conn.close()
+
+
+class CatalogService:
+    """Сервис чтения каталога по HTTP/JSON без интерфейса Tk.
+    
+    Запросы к базе выполняются в пуле потоков через подключения пула
+    DatabaseManager; цикл событий занят только разбором запросов и записью
+    ответов. Маршруты:
+    
+        GET /api/books?q=...&limit=...&after=...  страница каталога или результатов поиска
+                                                   (при пустом результате - нечеткого)
+        GET /api/books/<article>                   книга по артикулу
+        GET /api/covers/<article>                  миниатюра обложки в PNG
+    """
+    
+    def __init__(self, db: DatabaseManager, resources_dir: str = RESOURCES_DIR, workers: int = 4):
+        self.db = db
+        self.resources_dir = resources_dir
+        self.thumbnail_dir = os.path.join(resources_dir, ".thumbnails")
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="catalog-service")
+        self.version = CatalogVersion(db.db_path)
+        self.thumbnail_lock = threading.Lock()
+        self.routes = (
+            ("/api/books/", self._book),
+            ("/api/books", self._books),
+            ("/api/covers/", self._cover),
+        )
+    
+    async def _run(self, function, *args):
+        """Выполнение функции в пуле потоков"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+    
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Обслуживание соединения; поддерживается keep-alive"""
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), KEEP_ALIVE_TIMEOUT)
+                except HttpError as e:
+                    self._write_response(writer, e.status, *self._error_body(e), keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, target, headers, keep_alive = request
+                
+                with instrumentation.span("http.request", method=method):
+                    status, content_type, body, extra_headers = await self._dispatch(method, target, headers)
+                self._write_response(writer, status, content_type, body, extra_headers,
+                                     keep_alive=keep_alive, head=method == "HEAD")
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+    
+    async def _read_request(self, reader: asyncio.StreamReader):
+        """Разбор строки запроса и заголовков; None, если клиент закрыл соединение"""
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return None
+        try:
+            method, target, version = request_line.decode("utf-8", "replace").split()
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST) from None
+        
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= MAX_HEADERS:
+                raise HttpError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE)
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+        return method, target, headers, keep_alive
+    
+    async def _dispatch(self, method: str, target: str, headers):
+        """Выбор обработчика и формирование ответа"""
+        try:
+            if method not in ("GET", "HEAD"):
+                raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED)
+            url = urlsplit(target)
+            for prefix, handler in self.routes:
+                if url.path == prefix or (prefix.endswith("/") and url.path.startswith(prefix)):
+                    break
+            else:
+                raise HttpError(HTTPStatus.NOT_FOUND)
+            
+            # Неизменившийся каталог подтверждается без обращения к базе
+            etag = self.version.etag()
+            extra_headers = {"ETag": etag, "Cache-Control": "no-cache"}
+            if etag in (tag.strip() for tag in headers.get("if-none-match", "").split(",")):
+                return HTTPStatus.NOT_MODIFIED, None, b"", extra_headers
+            
+            content_type, body = await handler(unquote(url.path[len(prefix):]), parse_qs(url.query))
+            return HTTPStatus.OK, content_type, body, extra_headers
+        except HttpError as e:
+            extra_headers = {"Allow": "GET, HEAD"} if e.status == HTTPStatus.METHOD_NOT_ALLOWED else {}
+            return (e.status, *self._error_body(e), extra_headers)
+        except Exception as e:
+            print(f" Ошибка при обработке запроса {target}: {e}")
+            error = HttpError(HTTPStatus.INTERNAL_SERVER_ERROR)
+            return (error.status, *self._error_body(error), {})
+    
+    @staticmethod
+    def _error_body(error: HttpError):
+        """Тело ответа с описанием ошибки"""
+        return "application/json; charset=utf-8", json.dumps({"error": str(error)}, ensure_ascii=False).encode("utf-8")
+    
+    @staticmethod
+    def _json(data):
+        """Тело ответа в формате JSON"""
+        return "application/json; charset=utf-8", json.dumps(data, ensure_ascii=False).encode("utf-8")
+    
+    async def _books(self, _, query):
+        """Страница каталога с продолжением по ключу after"""
+        search_query = query.get("q", [""])[0].strip() or None
+        try:
+            limit = min(max(int(query.get("limit", [DEFAULT_PAGE_SIZE])[0]), 1), MAX_PAGE_SIZE)
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "некорректный параметр limit") from None
+        after = decode_cursor(query["after"][0]) if "after" in query else None
+        
+        books = await self._run(
+            lambda: self.db.iter_books(search_query, after=after, limit=limit, columns=CARD_COLUMNS)
+        )
+        # Если точный поиск ничего не нашел, возвращаются похожие книги одной страницей
+        if not books and search_query and after is None:
+            books = await self._run(
+                lambda: self.db.fuzzy_books(search_query, limit=limit, columns=CARD_COLUMNS)
+            )
+            return self._json({"books": [book.to_dict() for book in books], "next": None, "fuzzy": True})
+        return self._json({
+            "books": [book.to_dict() for book in books],
+            "next": encode_cursor(books[-1]) if len(books) == limit else None,
+        })
+    
+    async def _book(self, article, _):
+        """Полная запись о книге"""
+        book = await self._run(self.db.get_book_by_article, article)
+        if book is None:
+            raise HttpError(HTTPStatus.NOT_FOUND, f"книга {article} не найдена")
+        return self._json(book.to_dict())
+    
+    async def _cover(self, article, _):
+        """Миниатюра обложки книги"""
+        body = await self._run(self._read_thumbnail, article)
+        if body is None:
+            raise HttpError(HTTPStatus.NOT_FOUND, f"обложка книги {article} не найдена")
+        return "image/png", body
+    
+    def _read_thumbnail(self, article: str):
+        """Содержимое миниатюры; отсутствующая миниатюра создается и сохраняется на диск"""
+        book = self.db.get_book_by_article(article)
+        image_path = resolve_cover_path(book['cover_image'] if book else None, self.resources_dir)
+        if image_path is None or not os.path.isfile(image_path):
+            return None
+        
+        target_path = thumbnail_path(image_path, COVER_SIZE, self.thumbnail_dir)
+        if not os.path.exists(target_path):
+            with self.thumbnail_lock, instrumentation.span("cover.decode"):
+                if not os.path.exists(target_path):
+                    create_thumbnail(image_path, target_path)
+        with open(target_path, "rb") as thumbnail:
+            return thumbnail.read()
+    
+    def _write_response(self, writer, status: HTTPStatus, content_type, body: bytes,
+                        extra_headers=None, keep_alive: bool = True, head: bool = False):
+        """Запись ответа HTTP/1.1 в поток"""
+        lines = [f"HTTP/1.1 {status.value} {status.phrase}"]
+        if content_type:
+            lines.append(f"Content-Type: {content_type}")
+        lines.append(f"Content-Length: {len(body)}")
+        lines.append("Connection: keep-alive" if keep_alive else "Connection: close")
+        for name, value in (extra_headers or {}).items():
+            lines.append(f"{name}: {value}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        if not head:
+            writer.write(body)
+    
+    async def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        """Прием соединений до отмены задачи"""
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        address = server.sockets[0].getsockname()
+        print(f"Сервис каталога: http://{address[0]}:{address[1]}/api/books", flush=True)
+        async with server:
+            await server.serve_forever()
+    
+    def close(self):
+        """Остановка пула потоков и отслеживания версии"""
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.version.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP/JSON сервис чтения каталога книг")
+    parser.add_argument("--db", required=True, help="путь к базе данных приложения")
+    parser.add_argument("--resources", default=RESOURCES_DIR,
+                        help="каталог ресурсов приложения с обложками (по умолчанию resources)")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="адрес для приема соединений")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="порт (0 - любой свободный)")
+    parser.add_argument("--workers", type=int, default=4, help="число потоков и подключений к базе")
+    parser.add_argument("--no-cache", action="store_true", help="не держать снимок каталога в памяти")
+    args = parser.parse_args()
+    
+    instrumentation.configure_from_env()
+    db = DatabaseManager(args.db, pool_size=args.workers, cache_catalog=not args.no_cache, read_only=True)
+    service = CatalogService(db, args.resources, args.workers)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+        db.close()
+        instrumentation.flush()
@@ -0,0 +1,626 @@
+import argparse
+import io
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from catalog_facets import YEAR_BUCKET, empty_facets
+from change_feed import CatalogChanges, read_changes
+from cover_service import COVER_SIZE, RESOURCES_DIR, create_thumbnail, resolve_cover_path, thumbnail_path
+from instrumentation import instrumentation
+from models import CARD_COLUMNS, Book
+
+# Сигнатура и версия формата файла снимка
+SNAPSHOT_MAGIC = b"BWSNAP01"
+SNAPSHOT_FORMAT = 2
+# Расширение файла снимка, который хранится рядом с базой данных
+SNAPSHOT_EXTENSION = ".snapshot"
+# Выравнивание секций: числовые массивы читаются из отображения в память
+# напрямую через memoryview.cast
+SECTION_ALIGN = 8
+# Изображения оформления: имя в снимке, файл в каталоге ресурсов и размер
+DECOR_IMAGES = {
+    "logo": ("logo.png", (150, 50)),
+    "placeholder": ("placeholder.png", (100, 150)),
+}
+# Столбцы со строками, которые хранятся словарем значений: жанров и
+# издательств немного, и код строки занимает 4 байта вместо текста
+DICTIONARY_COLUMNS = ("author", "genre", "publisher", "cover_image")
+# Числовые значения: признак типа (NULL, целое, дробное, строка) и 8 байт
+# значения; строки в числовых столбцах (например, пустая цена) хранятся
+# отдельным блоком, а в 8 байтах записывается их номер
+NULL, INTEGER, REAL, TEXT = 0, 1, 2, 3
+# Столбцы, которые хранятся строками; остальные - числами с признаком типа
+STRING_COLUMNS = ("article", "title")
+# Число записей журнала изменений, которые применяются к снимку при
+# открытии; после большего числа правок снимок собирается заново
+SNAPSHOT_MAX_CHANGES = 5000
+
+
+def snapshot_path(db_path: str) -> str:
+    """Путь к снимку каталога для базы данных"""
+    return os.path.splitext(db_path)[0] + SNAPSHOT_EXTENSION
+
+
+def resources_fingerprint(resources_dir: str = RESOURCES_DIR) -> List:
+    """Отметки времени каталогов ресурсов и изображений оформления.
+    
+    Добавление или удаление обложки меняет время изменения каталога; файлы
+    в covers называются по хешу содержимого и на месте не изменяются.
+    """
+    fingerprint = []
+    paths = [resources_dir, os.path.join(resources_dir, "covers")]
+    paths += [os.path.join(resources_dir, file_name) for file_name, _ in DECOR_IMAGES.values()]
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            fingerprint.append([stat.st_mtime_ns, stat.st_size if os.path.isfile(path) else 0])
+        except OSError:
+            fingerprint.append(None)
+    return fingerprint
+
+
+class _SectionWriter:
+    """Накопление секций файла с выравниванием"""
+    
+    def __init__(self):
+        self.buffer = io.BytesIO()
+    
+    def add(self, data) -> List[int]:
+        """Запись секции; возвращает [смещение, длина] относительно начала данных"""
+        offset = self.buffer.tell()
+        self.buffer.write(data)
+        length = self.buffer.tell() - offset
+        self.buffer.write(b"\0" * (-self.buffer.tell() % SECTION_ALIGN))
+        return [offset, length]
+
+
+class _StringColumn:
+    """Строки подряд в одном блоке UTF-8 и массив смещений"""
+    
+    def __init__(self):
+        self.flags = bytearray()
+        self.offsets = array("I", [0])
+        self.blob = io.BytesIO()
+    
+    def add(self, value):
+        if value is None:
+            self.flags.append(0)
+        else:
+            self.flags.append(1)
+            self.blob.write((value if isinstance(value, str) else str(value)).encode("utf-8"))
+        self.offsets.append(self.blob.tell())
+    
+    def finish(self, writer: _SectionWriter) -> Dict:
+        return {
+            "kind": "str",
+            "flags": writer.add(self.flags),
+            "offsets": writer.add(self.offsets.tobytes()),
+            "data": writer.add(self.blob.getvalue()),
+        }
+
+
+class _DictionaryColumn:
+    """Коды строк в порядке появления; при записи словарь сортируется,
+    а коды переназначаются"""
+    
+    def __init__(self):
+        self.codes = array("i")
+        self.values = {}
+    
+    def add(self, value):
+        if value is None:
+            self.codes.append(-1)
+        else:
+            self.codes.append(self.values.setdefault(value, len(self.values)))
+    
+    def finish(self, writer: _SectionWriter) -> Dict:
+        dictionary = sorted(self.values, key=str)
+        remap = array("i", bytes(4 * len(dictionary)))
+        for code, value in enumerate(dictionary):
+            remap[self.values[value]] = code
+        codes = array("i", (remap[code] if code >= 0 else -1 for code in self.codes))
+        return {"kind": "dict", "codes": writer.add(codes.tobytes()), "values": _encode_strings(writer, dictionary)}
+
+
+class _ValueColumn:
+    """Числа с признаком типа; значения других типов хранятся строками"""
+    
+    def __init__(self):
+        self.kinds = bytearray()
+        self.slots = bytearray()
+        self.texts = _StringColumn()
+    
+    def add(self, value):
+        if value is None:
+            self.kinds.append(NULL)
+            self.slots += bytes(8)
+        elif isinstance(value, float):
+            self.kinds.append(REAL)
+            self.slots += struct.pack("d", value)
+        elif isinstance(value, int):
+            self.kinds.append(INTEGER)
+            self.slots += struct.pack("q", value)
+        else:
+            self.kinds.append(TEXT)
+            self.slots += struct.pack("q", len(self.texts.flags))
+            self.texts.add(value)
+    
+    def finish(self, writer: _SectionWriter) -> Dict:
+        return {
+            "kind": "num",
+            "flags": writer.add(self.kinds),
+            "values": writer.add(self.slots),
+            "texts": self.texts.finish(writer),
+        }
+
+
+def _column_encoder(column: str):
+    """Кодировщик столбца снимка"""
+    if column in DICTIONARY_COLUMNS:
+        return _DictionaryColumn()
+    if column in STRING_COLUMNS:
+        return _StringColumn()
+    return _ValueColumn()
+
+
+def _encode_strings(writer: _SectionWriter, values: Sequence[Optional[str]]) -> Dict:
+    """Строки подряд в одном блоке UTF-8 и массив смещений"""
+    column = _StringColumn()
+    for value in values:
+        column.add(value)
+    return column.finish(writer)
+
+
+def _in_stock(quantity) -> bool:
+    """Условие stock_quantity > 0 по правилам SQLite: строка больше любого числа"""
+    if quantity is None:
+        return False
+    return quantity > 0 if isinstance(quantity, (int, float)) else True
+
+
+def _count_book(facets: Dict, book, delta: int):
+    """Учет книги в счетчиках фасетов всего каталога (delta = 1 или -1)"""
+    facets["total"] += delta
+    for facet, key in (("genre", book['genre']), ("publisher", book['publisher']),
+                       ("year", book['year'] // YEAR_BUCKET * YEAR_BUCKET
+                        if isinstance(book['year'], int) else None)):
+        if key is None:
+            continue
+        count = facets[facet].get(key, 0) + delta
+        if count:
+            facets[facet][key] = count
+        else:
+            facets[facet].pop(key, None)
+    if book['on_sale']:
+        facets["on_sale"] += delta
+    if _in_stock(book['stock_quantity']):
+        facets["in_stock"] += delta
+
+
+def _thumbnail_bytes(image_path: str, resources_dir: str) -> bytes:
+    """Миниатюра обложки в PNG; используется готовая миниатюра с диска, если она есть"""
+    target_path = thumbnail_path(image_path, COVER_SIZE, os.path.join(resources_dir, ".thumbnails"))
+    if not os.path.exists(target_path):
+        create_thumbnail(image_path, target_path, COVER_SIZE)
+    with open(target_path, "rb") as thumbnail:
+        return thumbnail.read()
+
+
+def _resized_png(image_path: str, size) -> bytes:
+    """Изображение оформления, уменьшенное до размера, в котором оно показывается"""
+    from PIL import Image
+    
+    image = Image.open(image_path).resize(size, Image.Resampling.LANCZOS)
+    output = io.BytesIO()
+    image.save(output, format="PNG", optimize=True)
+    return output.getvalue()
+
+
+def build_snapshot(db, path: str, resources_dir: str = RESOURCES_DIR) -> Dict:
+    """Сборка снимка каталога из базы данных и каталога ресурсов.
+    
+    Номер записи журнала изменений читается до выборки книг: правки,
+    сделанные во время сборки, применяются к снимку при открытии.
+    Книги читаются постранично и сразу раскладываются по столбцам, а
+    счетчики фасетов считаются по тем же строкам. Файл записывается
+    рядом и подменяется целиком.
+    """
+    started = time.perf_counter()
+    with instrumentation.span("snapshot.build") as span:
+        change_id = db.get_last_change_id()
+        # Каталог миниатюр создается заранее, чтобы его появление не меняло
+        # отметку времени каталога ресурсов уже после снятия отпечатка
+        os.makedirs(os.path.join(resources_dir, ".thumbnails"), exist_ok=True)
+        resources = resources_fingerprint(resources_dir)
+        encoders = {column: _column_encoder(column) for column in CARD_COLUMNS}
+        facets = empty_facets()
+        cover_images = set()
+        rows = 0
+        for book in db.stream_books(page_size=5000, columns=CARD_COLUMNS):
+            for column, encoder in encoders.items():
+                encoder.add(book[column])
+            _count_book(facets, book, 1)
+            if book['cover_image']:
+                cover_images.add(book['cover_image'])
+            rows += 1
+        span.rows = rows
+        
+        writer = _SectionWriter()
+        columns = {column: encoder.finish(writer) for column, encoder in encoders.items()}
+        
+        covers = {}
+        for cover_image in sorted(cover_images):
+            image_path = resolve_cover_path(cover_image, resources_dir)
+            if not os.path.isfile(image_path):
+                continue
+            try:
+                covers[cover_image] = _thumbnail_bytes(image_path, resources_dir)
+            except Exception as e:
+                print(f" Не удалось уменьшить обложку {image_path}: {e}")
+        data_offsets = array("q", [0])
+        blob = io.BytesIO()
+        for data in covers.values():
+            blob.write(data)
+            data_offsets.append(blob.tell())
+        cover_index = {
+            "count": len(covers),
+            "names": _encode_strings(writer, list(covers)),
+            "offsets": writer.add(data_offsets.tobytes()),
+            "data": writer.add(blob.getvalue()),
+        }
+        
+        images = {}
+        for name, (file_name, size) in DECOR_IMAGES.items():
+            image_path = os.path.join(resources_dir, file_name)
+            if os.path.isfile(image_path):
+                try:
+                    images[name] = writer.add(_resized_png(image_path, size))
+                except Exception as e:
+                    print(f" Не удалось подготовить изображение {image_path}: {e}")
+        
+        meta = json.dumps({
+            "format": SNAPSHOT_FORMAT,
+            "byteorder": sys.byteorder,
+            "change_id": change_id,
+            "resources": resources,
+            "cover_size": list(COVER_SIZE),
+            "rows": rows,
+            "columns": columns,
+            "covers": cover_index,
+            "images": images,
+            "facets": facets,
+        }, ensure_ascii=False).encode("utf-8")
+        
+        header = SNAPSHOT_MAGIC + struct.pack("<I", len(meta)) + meta
+        header += b"\0" * (-len(header) % SECTION_ALIGN)
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "wb") as output:
+            output.write(header)
+            output.write(writer.buffer.getbuffer())
+        os.replace(temporary_path, path)
+    
+    return {
+        "rows": rows,
+        "covers": len(covers),
+        "images": len(images),
+        "size_kb": round(os.path.getsize(path) / 1024, 1),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+class CatalogSnapshot:
+    """Снимок каталога, отображенный в память.
+    
+    Столбцы карточек книг хранятся по отдельности в порядке (title, article),
+    миниатюры обложек - готовыми PNG с индексом смещений по имени файла.
+    Данные не копируются при открытии: числовые массивы читаются через
+    memoryview, а строки декодируются только для запрошенных книг.
+    
+    Правки книг, сделанные после сборки, хранятся в памяти поверх файла
+    (overrides): снимок остается пригодным после продаж и смены цен, пока
+    порядок книг не меняется.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "rb")
+        try:
+            self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise ValueError("пустой файл снимка")
+        self.buffer = memoryview(self.mmap)
+        self.views = []
+        try:
+            if self.buffer[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+                raise ValueError("файл не является снимком каталога")
+            meta_length = struct.unpack_from("<I", self.buffer, len(SNAPSHOT_MAGIC))[0]
+            meta_start = len(SNAPSHOT_MAGIC) + 4
+            self.meta = json.loads(str(self.buffer[meta_start:meta_start + meta_length], "utf-8"))
+            self.data_start = meta_start + meta_length + (-(meta_start + meta_length) % SECTION_ALIGN)
+            if self.meta["format"] != SNAPSHOT_FORMAT or self.meta["byteorder"] != sys.byteorder:
+                raise ValueError("несовместимый формат снимка")
+        except Exception:
+            self.close()
+            raise
+        
+        self.rows = self.meta["rows"]
+        # Номер последней записи журнала изменений, учтенной в снимке
+        self.change_id = self.meta["change_id"]
+        # Свежие данные измененных книг по номеру в порядке (title, article)
+        self.overrides = {}
+        self.columns = {column: self._open_column(entry) for column, entry in self.meta["columns"].items()}
+        covers = self.meta["covers"]
+        self.cover_names = self._open_strings(covers["names"])
+        self.cover_offsets = self._section(covers["offsets"], "q")
+        self.cover_data = self._section(covers["data"])
+        self.facets = self.meta["facets"]
+        # Ключи JSON - строки, а десятилетия в счетчиках фасетов - числа
+        self.facets["year"] = {int(year): count for year, count in self.facets["year"].items()}
+    
+    def _section(self, section: Sequence[int], format_char: str = "B") -> memoryview:
+        """Секция файла без копирования данных"""
+        offset, length = section
+        start = self.data_start + offset
+        view = self.buffer[start:start + length]
+        self.views.append(view)
+        return self._cast(view, format_char) if format_char != "B" else view
+    
+    def _cast(self, view: memoryview, format_char: str) -> memoryview:
+        """Представление секции массивом чисел; все представления
+        освобождаются до закрытия отображения"""
+        view = view.cast(format_char)
+        self.views.append(view)
+        return view
+    
+    def _open_strings(self, entry: Dict) -> Tuple:
+        return (self._section(entry["flags"]), self._section(entry["offsets"], "I"), self._section(entry["data"]))
+    
+    def _open_column(self, entry: Dict) -> Tuple:
+        if entry["kind"] == "str":
+            return ("str", self._open_strings(entry))
+        if entry["kind"] == "dict":
+            return ("dict", (self._section(entry["codes"], "i"), self._open_strings(entry["values"]), {}))
+        values = self._section(entry["values"])
+        return ("num", (self._section(entry["flags"]), self._cast(values, "q"), self._cast(values, "d"),
+                        self._open_strings(entry["texts"])))
+    
+    @staticmethod
+    def _string(strings: Tuple, index: int) -> Optional[str]:
+        flags, offsets, data = strings
+        if not flags[index]:
+            return None
+        return str(data[offsets[index]:offsets[index + 1]], "utf-8")
+    
+    def value(self, column: str, index: int):
+        """Значение столбца для книги с номером index"""
+        override = self.overrides.get(index)
+        if override is not None:
+            return override[column]
+        kind, parts = self.columns[column]
+        if kind == "str":
+            return self._string(parts, index)
+        if kind == "dict":
+            codes, strings, decoded = parts
+            code = codes[index]
+            if code < 0:
+                return None
+            if code not in decoded:
+                decoded[code] = self._string(strings, code)
+            return decoded[code]
+        flags, integers, reals, texts = parts
+        flag = flags[index]
+        if flag == INTEGER:
+            return integers[index]
+        if flag == TEXT:
+            return self._string(texts, integers[index])
+        return reals[index] if flag == REAL else None
+    
+    def book(self, index: int) -> Book:
+        """Книга с номером index в порядке (title, article)"""
+        override = self.overrides.get(index)
+        if override is not None:
+            return override
+        return Book(**{column: self.value(column, index) for column in self.columns})
+    
+    def _bisect(self, key: Tuple[str, str]) -> int:
+        """Номер первой книги с ключом (title, article) больше key.
+        
+        Двоичный поиск декодирует только сравниваемые названия.
+        """
+        low, high = 0, self.rows
+        while low < high:
+            middle = (low + high) // 2
+            if (self.value("title", middle), self.value("article", middle)) <= key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+    
+    def page(self, after: Optional[Tuple[str, str]] = None, limit: int = 50) -> List[Book]:
+        """Страница каталога после ключа (title, article), как у DatabaseManager.iter_books"""
+        with instrumentation.span("snapshot.page") as span:
+            start = self._bisect(tuple(after)) if after is not None else 0
+            books = [self.book(index) for index in range(start, min(start + limit, self.rows))]
+            span.rows = len(books)
+            return books
+    
+    def thumbnail(self, cover_image: str) -> Optional[memoryview]:
+        """PNG миниатюры обложки по значению books.cover_image"""
+        low, high = 0, self.meta["covers"]["count"]
+        while low < high:
+            middle = (low + high) // 2
+            name = self._string(self.cover_names, middle)
+            if name == cover_image:
+                return self.cover_data[self.cover_offsets[middle]:self.cover_offsets[middle + 1]]
+            if name < cover_image:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+    
+    def image(self, name: str) -> Optional[memoryview]:
+        """PNG изображения оформления (logo, placeholder)"""
+        section = self.meta["images"].get(name)
+        return self._section(section) if section else None
+    
+    def is_current(self, resources: List) -> bool:
+        """Снимок собран из тех же ресурсов и с тем же размером миниатюр"""
+        return self.meta["resources"] == resources and tuple(self.meta["cover_size"]) == tuple(COVER_SIZE)
+    
+    def apply(self, changes: CatalogChanges) -> bool:
+        """Наложение изменений каталога на снимок.
+        
+        Применяются только правки книг, у которых не изменился ключ
+        (title, article): остатки, цены, акции, обложки. Для вставки,
+        удаления или переименования возвращается False, и снимок больше
+        не годится для постраничного вывода; частично изменения не
+        применяются. После наложения снимок учитывает журнал до
+        changes.change_id.
+        """
+        if changes.reload or changes.deleted:
+            return False
+        updates = {}
+        for article, book in changes.books.items():
+            index = self._bisect((book['title'], article)) - 1
+            if index < 0 or self.value("article", index) != article or self.value("title", index) != book['title']:
+                return False
+            updates[index] = book
+        for index, book in updates.items():
+            _count_book(self.facets, self.book(index), -1)
+            _count_book(self.facets, book, 1)
+            self.overrides[index] = book
+        self.change_id = max(self.change_id, changes.change_id)
+        return True
+    
+    def replay(self, db, max_changes: int = SNAPSHOT_MAX_CHANGES) -> bool:
+        """Применение журнала изменений, записанных после сборки снимка.
+        
+        Возвращает False, если снимок устарел: порядок книг изменился,
+        правок слишком много или часть журнала уже удалена.
+        """
+        with instrumentation.span("snapshot.replay") as span:
+            last_change_id = db.get_last_change_id()
+            if last_change_id == self.change_id:
+                return True
+            _, changes = read_changes(db, self.change_id, max_changes, tuple(self.columns))
+            # Записей нет, хотя номер изменился: журнал очищен или база заменена
+            if changes is None or not self.apply(changes):
+                return False
+            span.rows = len(changes.books)
+            return True
+    
+    def close(self):
+        """Освобождение отображения файла"""
+        for view in reversed(self.views):
+            view.release()
+        self.views = []
+        self.buffer.release()
+        try:
+            self.mmap.close()
+        except BufferError:
+            # Миниатюра еще используется; отображение освободится вместе с ней
+            pass
+        self.file.close()
+
+
+def photo_image(data):
+    """PhotoImage из PNG снимка: Tk декодирует PNG сам, без PIL"""
+    import base64
+    import tkinter as tk
+    
+    return tk.PhotoImage(data=base64.b64encode(data))
+
+
+def load_snapshot(db, path: str = None, resources_dir: str = RESOURCES_DIR,
+                  rebuild: bool = True) -> Optional[CatalogSnapshot]:
+    """Открытие снимка каталога, если он соответствует базе и ресурсам.
+    
+    Правки книг из журнала изменений накладываются на открытый снимок.
+    Отсутствующий или устаревший снимок собирается заново в фоновом
+    потоке и будет использован при следующем запуске; до этого
+    приложение работает с базой данных.
+    """
+    path = path or snapshot_path(db.db_path)
+    with instrumentation.span("snapshot.load"):
+        snapshot = None
+        try:
+            if os.path.exists(path):
+                snapshot = CatalogSnapshot(path)
+                if snapshot.is_current(resources_fingerprint(resources_dir)) and snapshot.replay(db):
+                    return snapshot
+                snapshot.close()
+                snapshot = None
+        except (OSError, ValueError, KeyError) as e:
+            print(f" Снимок каталога поврежден и будет собран заново: {e}")
+            if snapshot is not None:
+                snapshot.close()
+    
+    if rebuild:
+        threading.Thread(target=_rebuild, args=(db, path, resources_dir), daemon=True).start()
+    return None
+
+
+def _rebuild(db, path: str, resources_dir: str):
+    """Сборка снимка в фоне без прерывания работы приложения"""
+    try:
+        build_snapshot(db, path, resources_dir)
+    except Exception as e:
+        print(f" Не удалось собрать снимок каталога: {e}")
+
+
+def main(argv=None):
+    from database import DatabaseManager
+    
+    parser = argparse.ArgumentParser(description="Снимок каталога и обложек для быстрого запуска")
+    # База указывается явно: снимок записывается рядом с ней, а сборка
+    # открывает базу на запись и дополняет схему
+    parser.add_argument("--db", required=True, help="путь к базе данных")
+    parser.add_argument("--resources", default=RESOURCES_DIR,
+                        help="каталог ресурсов приложения с обложками")
+    parser.add_argument("--output", help="файл снимка (по умолчанию рядом с базой)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("build", help="собрать снимок")
+    commands.add_parser("check", help="проверить, соответствует ли снимок базе")
+    args = parser.parse_args(argv)
+    
+    path = args.output or snapshot_path(args.db)
+    # Проверка только читает базу и снимок
+    db = DatabaseManager(args.db, pool_size=1, cache_catalog=False, read_only=args.command == "check")
+    try:
+        if args.command == "build":
+            result = build_snapshot(db, path, args.resources)
+            print(
+                f"Снимок {path}: книг {result['rows']}, обложек {result['covers']}, "
+                f"{result['size_kb']} КБ, {result['seconds']} с",
+                file=sys.stderr
+            )
+            return 0
+        
+        if not os.path.exists(path):
+            print(f"Снимок {path} не найден", file=sys.stderr)
+            return 1
+        snapshot = CatalogSnapshot(path)
+        try:
+            current = snapshot.is_current(resources_fingerprint(args.resources)) and snapshot.replay(db)
+            print(
+                f"Снимок {path}: книг {snapshot.rows}, обложек {snapshot.meta['covers']['count']}, "
+                f"{f'актуален, измененных книг {len(snapshot.overrides)}' if current else 'устарел'}",
+                file=sys.stderr
+            )
+        finally:
+            snapshot.close()
+        return 0 if current else 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,298 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+from cover_service import RESOURCES_DIR, store_cover
+from database import DatabaseManager
+from models import BOOK_COLUMNS, DATA_COLUMNS
+
+# Поля, без которых книга не может быть добавлена в каталог
+REQUIRED_COLUMNS = ("article", "title", "author", "genre", "publisher", "year", "price")
+# Допустимые записи логических полей; created_at и updated_at при загрузке
+# пропускаются, так как их заполняет база
+TRUE_VALUES = ("1", "true", "yes", "да", "y")
+FALSE_VALUES = ("", "0", "false", "no", "нет", "n")
+# Число сообщений о некорректных строках, выводимых в отчете
+MAX_REPORTED_ERRORS = 20
+# Размер страницы при выгрузке каталога
+EXPORT_PAGE_SIZE = 5000
+
+
+def detect_format(path: str, requested: str = None) -> str:
+    """Формат файла по ключу --format или расширению имени"""
+    if requested:
+        return requested
+    return "jsonl" if path.lower().endswith((".jsonl", ".json", ".ndjson")) else "csv"
+
+
+def read_rows(stream, file_format: str, delimiter: str = ","):
+    """Построчное чтение файла: пары (номер строки, словарь значений)"""
+    if file_format == "csv":
+        reader = csv.DictReader(stream, delimiter=delimiter)
+        unknown = set(reader.fieldnames or ()) - set(BOOK_COLUMNS)
+        if unknown:
+            raise ValueError(f"неизвестные столбцы: {', '.join(sorted(unknown))}")
+        for row in reader:
+            yield reader.line_num, row
+        return
+    
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, ValueError(f"некорректный JSON: {e}")
+            continue
+        if not isinstance(row, dict):
+            yield line_number, ValueError("строка должна быть объектом JSON")
+            continue
+        yield line_number, row
+
+
+def _text(row, column, required: bool = False):
+    """Строковое значение поля; пустая строка считается отсутствующим значением"""
+    value = row.get(column)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        if required:
+            raise ValueError(f"не заполнено поле {column}")
+        return None
+    return str(value).strip()
+
+
+def _number(row, column, convert, required: bool = False):
+    """Неотрицательное число; допускается десятичная запятая"""
+    value = _text(row, column, required)
+    if value is None:
+        return None
+    try:
+        number = convert(value.replace(",", "."))
+    except ValueError:
+        raise ValueError(f"поле {column} должно быть числом: {value!r}") from None
+    if number < 0:
+        raise ValueError(f"поле {column} не может быть отрицательным: {value!r}")
+    return number
+
+
+def _flag(row, column) -> bool:
+    """Логическое значение из JSON или текстового представления (1/0, да/нет)"""
+    value = row.get(column)
+    if isinstance(value, bool):
+        return value
+    text = str(value if value is not None else "").strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValueError(f"поле {column} должно быть логическим: {value!r}")
+
+
+def validate_book(row) -> dict:
+    """Проверка строки файла по схеме books и приведение типов значений"""
+    unknown = set(row) - set(BOOK_COLUMNS)
+    if unknown:
+        raise ValueError(f"неизвестные поля: {', '.join(sorted(unknown))}")
+    
+    book = {column: _text(row, column, column in REQUIRED_COLUMNS)
+            for column in ("article", "title", "author", "genre", "publisher", "description", "cover_image")}
+    book["year"] = _number(row, "year", int, required=True)
+    book["price"] = _number(row, "price", float, required=True)
+    book["sale_price"] = _number(row, "sale_price", float)
+    book["on_sale"] = _flag(row, "on_sale")
+    book["stock_quantity"] = _number(row, "stock_quantity", int) or 0
+    return book
+
+
+class CoverImporter:
+    """Копирование обложек загружаемых книг в хранилище ресурсов.
+    
+    Каждый исходный файл хешируется один раз, даже если на него
+    ссылается несколько строк файла.
+    """
+    
+    def __init__(self, covers_dir: str, resources_dir: str):
+        self.covers_dir = covers_dir
+        self.resources_dir = resources_dir
+        self.stored = {}
+        self.copied = 0
+        self.missing = 0
+    
+    def resolve(self, cover_image):
+        """Значение books.cover_image для обложки из файла загрузки"""
+        if not cover_image:
+            return None
+        if cover_image in self.stored:
+            return self.stored[cover_image]
+        
+        result = None
+        source_path = os.path.join(self.covers_dir, cover_image) if self.covers_dir else None
+        if source_path and os.path.isfile(source_path):
+            result = store_cover(source_path, self.resources_dir)
+            self.copied += 1
+        elif os.path.isfile(os.path.join(self.resources_dir, cover_image)):
+            # Обложка уже в хранилище, например при загрузке выгруженного каталога
+            result = cover_image
+        else:
+            self.missing += 1
+        self.stored[cover_image] = result
+        return result
+
+
+class ImportReport:
+    """Счетчики загрузки для итогового отчета"""
+    
+    def __init__(self):
+        self.rows = 0
+        self.rejected = 0
+        self.errors = []
+        self.started = time.perf_counter()
+    
+    def reject(self, line_number: int, error: Exception):
+        """Учет отклоненной строки; в отчет попадают только первые ошибки"""
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"строка {line_number}: {error}")
+
+
+def import_catalog(db: DatabaseManager, stream, file_format: str, covers: CoverImporter,
+                   delimiter: str = ",", batch_size: int = None) -> dict:
+    """Потоковая загрузка книг из CSV или JSONL с пакетной записью в базу"""
+    report = ImportReport()
+    
+    def valid_rows():
+        for line_number, row in read_rows(stream, file_format, delimiter):
+            report.rows += 1
+            try:
+                if isinstance(row, Exception):
+                    raise row
+                book = validate_book(row)
+            except ValueError as e:
+                report.reject(line_number, e)
+                continue
+            book["cover_image"] = covers.resolve(book["cover_image"])
+            yield tuple(book[column] for column in DATA_COLUMNS)
+    
+    options = {"batch_size": batch_size} if batch_size else {}
+    written = db.upsert_books(valid_rows(), **options)
+    elapsed = time.perf_counter() - report.started
+    return {
+        "rows": report.rows,
+        "written": written,
+        "unchanged": report.rows - report.rejected - written,
+        "rejected": report.rejected,
+        "errors": report.errors,
+        "covers_copied": covers.copied,
+        "covers_missing": covers.missing,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(report.rows / elapsed) if elapsed > 0 else report.rows,
+    }
+
+
+def export_catalog(db: DatabaseManager, stream, file_format: str, covers_dir: str = None,
+                   resources_dir: str = None, delimiter: str = ",") -> dict:
+    """Потоковая выгрузка каталога в CSV или JSONL"""
+    started = time.perf_counter()
+    rows = 0
+    exported_covers = set()
+    if file_format == "csv":
+        writer = csv.writer(stream, delimiter=delimiter)
+        writer.writerow(BOOK_COLUMNS)
+    
+    for book in db.stream_books(page_size=EXPORT_PAGE_SIZE):
+        if file_format == "csv":
+            writer.writerow(["" if book[column] is None else book[column] for column in BOOK_COLUMNS])
+        else:
+            stream.write(json.dumps(book.to_dict(), ensure_ascii=False) + "\n")
+        rows += 1
+        
+        cover_image = book['cover_image']
+        if covers_dir and cover_image and cover_image not in exported_covers:
+            exported_covers.add(cover_image)
+            _copy_cover(os.path.join(resources_dir, cover_image), os.path.join(covers_dir, cover_image))
+    
+    elapsed = time.perf_counter() - started
+    return {
+        "rows": rows,
+        "covers": len(exported_covers),
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(rows / elapsed) if elapsed > 0 else rows,
+    }
+
+
+def _copy_cover(source_path: str, target_path: str):
+    """Копирование файла обложки рядом с выгрузкой"""
+    if not os.path.isfile(source_path) or os.path.exists(target_path):
+        return
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    with open(source_path, "rb") as source, open(target_path, "wb") as target:
+        for chunk in iter(lambda: source.read(1 << 16), b""):
+            target.write(chunk)
+
+
+def _open(path: str, mode: str):
+    """Открытие файла или стандартного потока для пути "-" """
+    if path == "-":
+        return open((sys.stdin if "r" in mode else sys.stdout).fileno(), mode, encoding="utf-8",
+                    newline="", closefd=False)
+    encoding = "utf-8-sig" if "r" in mode else "utf-8"
+    return open(path, mode, encoding=encoding, newline="")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Загрузка и выгрузка каталога книг")
+    parser.add_argument("--db", required=True, help="путь к базе данных приложения")
+    parser.add_argument("--resources", default=RESOURCES_DIR,
+                        help="каталог ресурсов приложения с обложками (по умолчанию resources)")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="формат файла (по умолчанию по расширению)")
+    parser.add_argument("--delimiter", default=",", help="разделитель полей CSV")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    import_parser = commands.add_parser("import", help="загрузить книги из файла")
+    import_parser.add_argument("path", help="файл CSV или JSONL, '-' для стандартного ввода")
+    import_parser.add_argument("--covers", help="каталог с файлами обложек (по умолчанию каталог файла)")
+    import_parser.add_argument("--batch-size", type=int, help="число строк в одной транзакции")
+    
+    export_parser = commands.add_parser("export", help="выгрузить каталог в файл")
+    export_parser.add_argument("path", help="файл CSV или JSONL, '-' для стандартного вывода")
+    export_parser.add_argument("--covers", help="каталог, в который копируются обложки")
+    args = parser.parse_args(argv)
+    
+    file_format = detect_format(args.path, args.format)
+    db = DatabaseManager(args.db, pool_size=1, cache_catalog=False)
+    try:
+        if args.command == "import":
+            covers_dir = args.covers
+            if covers_dir is None and args.path != "-":
+                covers_dir = os.path.dirname(os.path.abspath(args.path))
+            with _open(args.path, "r") as stream:
+                try:
+                    result = import_catalog(db, stream, file_format, CoverImporter(covers_dir, args.resources),
+                                            args.delimiter, args.batch_size)
+                except ValueError as e:
+                    parser.error(f"{args.path}: {e}")
+            for error in result["errors"]:
+                print(f" {error}", file=sys.stderr)
+            print(
+                f"Обработано строк: {result['rows']}, записано: {result['written']}, "
+                f"без изменений: {result['unchanged']}, отклонено: {result['rejected']}",
+                file=sys.stderr
+            )
+            print(
+                f"Обложек скопировано: {result['covers_copied']}, не найдено: {result['covers_missing']}",
+                file=sys.stderr
+            )
+        else:
+            with _open(args.path, "w") as stream:
+                result = export_catalog(db, stream, file_format, args.covers, args.resources, args.delimiter)
+            print(f"Выгружено книг: {result['rows']}, обложек: {result['covers']}", file=sys.stderr)
+        print(f"Время: {result['seconds']} с, {result['rows_per_sec']} строк/с", file=sys.stderr)
+    finally:
+        db.close()
+    return 0 if args.command == "export" or not result["rejected"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
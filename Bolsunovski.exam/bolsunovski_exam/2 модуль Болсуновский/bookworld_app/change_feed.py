@@ -0,0 +1,119 @@
+import queue
+import sqlite3
+import threading
+from typing import Dict, Optional, Sequence, Set, Tuple
+
+from instrumentation import instrumentation
+from models import CARD_COLUMNS
+
+# Период проверки PRAGMA data_version фоновым потоком, в секундах
+CHANGE_FEED_INTERVAL = 0.5
+# Число записей журнала, после которого точечное обновление дороже повторного
+# поиска (например, после пакетной загрузки каталога)
+MAX_CHANGES = 500
+
+
+class CatalogChanges:
+    """Изменения каталога, накопленные между двумя проверками журнала.
+    
+    books - свежие данные вставленных и измененных книг по артикулам,
+    deleted - артикулы удаленных книг, change_id - номер последней учтенной
+    записи журнала. Флаг reload означает, что изменений слишком много или
+    часть журнала уже удалена, и результаты поиска нужно загрузить заново.
+    """
+    
+    __slots__ = ("books", "deleted", "reload", "change_id")
+    
+    def __init__(self, books: Optional[Dict] = None, deleted: Optional[Set[str]] = None,
+                 reload: bool = False, change_id: int = 0):
+        self.books = books or {}
+        self.deleted = deleted or set()
+        self.reload = reload
+        self.change_id = change_id
+
+
+def read_changes(db, after_id: int, max_changes: int = MAX_CHANGES,
+                 columns: Sequence[str] = CARD_COLUMNS) -> Tuple[int, Optional[CatalogChanges]]:
+    """Изменения каталога после записи журнала after_id.
+    
+    Для каждого изменившегося артикула берется последняя операция, а
+    данные книг загружаются одним запросом. Возвращает номер последней
+    учтенной записи и изменения; None, если новых записей нет.
+    """
+    rows = db.get_book_changes(after_id, max_changes + 1)
+    if not rows:
+        return after_id, None
+    
+    # Номера AUTOINCREMENT идут подряд, поэтому пропуск означает,
+    # что непрочитанные записи уже удалены из журнала
+    if len(rows) > max_changes or rows[0][0] != after_id + 1:
+        last_change_id = db.get_last_change_id()
+        return last_change_id, CatalogChanges(reload=True, change_id=last_change_id)
+    
+    operations = {}
+    for _, article, operation in rows:
+        operations[article] = operation
+    changed = [article for article, operation in operations.items() if operation != "delete"]
+    books = {book['article']: book for book in db.get_books_by_articles(changed, columns)}
+    # Книга могла быть удалена уже после записи об изменении
+    deleted = {article for article in operations if article not in books}
+    return rows[-1][0], CatalogChanges(books, deleted, change_id=rows[-1][0])
+
+
+class ChangeFeed:
+    """Фоновое отслеживание изменений каталога по журналу books_changelog.
+    
+    Поток раз в interval секунд читает PRAGMA data_version на отдельном
+    подключении; журнал читается только после фиксации изменений любым
+    подключением или процессом, а изменения (read_changes) передаются
+    в очередь changes для потока интерфейса.
+    """
+    
+    def __init__(self, db, columns: Sequence[str] = CARD_COLUMNS,
+                 interval: float = CHANGE_FEED_INTERVAL, max_changes: int = MAX_CHANGES):
+        self.db = db
+        self.columns = columns
+        self.interval = interval
+        self.max_changes = max_changes
+        self.changes = queue.Queue()
+        # Изменения, сделанные до открытия окна, уже учтены в первой странице
+        self.last_change_id = db.get_last_change_id()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        """Остановка фонового потока"""
+        self.stop_event.set()
+        self.thread.join(timeout=1.0)
+    
+    def _run(self):
+        try:
+            watch_conn = sqlite3.connect(self.db.db_path)
+        except sqlite3.Error as e:
+            print(f" Отслеживание изменений каталога недоступно: {e}")
+            return
+        try:
+            version = None
+            while not self.stop_event.wait(self.interval):
+                try:
+                    current = watch_conn.execute("PRAGMA data_version").fetchone()[0]
+                except sqlite3.Error as e:
+                    print(f" Ошибка при проверке изменений каталога: {e}")
+                    continue
+                if current == version:
+                    continue
+                version = current
+                changes = self._collect()
+                if changes is not None:
+                    self.changes.put(changes)
+        finally:
+            watch_conn.close()
+    
+    def _collect(self) -> Optional[CatalogChanges]:
+        """Чтение новых записей журнала и загрузка изменившихся книг"""
+        with instrumentation.span("feed.collect") as span:
+            self.last_change_id, changes = read_changes(self.db, self.last_change_id,
+                                                        self.max_changes, self.columns)
+            span.rows = len(changes.books) + len(changes.deleted) if changes is not None else 0
+            return changes
@@ -0,0 +1,209 @@
+import hashlib
+import os
+import queue
+import shutil
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from instrumentation import instrumentation
+
+# Размер миниатюры обложки в карточке книги
+COVER_SIZE = (100, 150)
+# Каталог с исходными изображениями приложения
+RESOURCES_DIR = "resources"
+# Каталог обложек, имена файлов в котором совпадают с хешем содержимого
+COVERS_DIR = "covers"
+# Каталог с заранее уменьшенными обложками
+THUMBNAIL_DIR = "resources/.thumbnails"
+# Период проверки готовности обложек, декодируемых в фоне
+COVER_POLL_MS = 30
+
+
+def resolve_cover_path(cover_image, resources_dir: str = RESOURCES_DIR):
+    """Путь к файлу обложки по значению books.cover_image"""
+    if not cover_image:
+        return None
+    return os.path.join(resources_dir, cover_image)
+
+
+def store_cover(source_path: str, resources_dir: str = RESOURCES_DIR) -> str:
+    """Копирование обложки в каталог covers под именем, равным хешу содержимого.
+    
+    Возвращает значение для books.cover_image; одинаковые файлы хранятся
+    в одном экземпляре.
+    """
+    digest = hashlib.sha1()
+    with open(source_path, "rb") as source:
+        for chunk in iter(lambda: source.read(1 << 16), b""):
+            digest.update(chunk)
+    extension = os.path.splitext(source_path)[1].lower() or ".png"
+    cover_image = f"{COVERS_DIR}/{digest.hexdigest()}{extension}"
+    
+    target_path = os.path.join(resources_dir, cover_image)
+    if not os.path.exists(target_path):
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        shutil.copyfile(source_path, target_path)
+    return cover_image
+
+
+def thumbnail_path(image_path: str, size=COVER_SIZE, thumbnail_dir: str = THUMBNAIL_DIR) -> str:
+    """Путь к миниатюре, зависящий от содержимого и времени изменения файла"""
+    stat = os.stat(image_path)
+    key = f"{os.path.abspath(image_path)}:{stat.st_mtime_ns}:{stat.st_size}:{size}"
+    return os.path.join(thumbnail_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".png")
+
+
+def create_thumbnail(image_path: str, target_path: str, size=COVER_SIZE):
+    """Уменьшение обложки и сохранение миниатюры на диск.
+    
+    Наличие файла миниатюры означает, что она готова: ее читают потоки
+    приложения, сборка снимка и сервис каталога в другом процессе. Поэтому
+    миниатюра пишется во временный файл того же каталога и подменяет
+    целевой одной операцией.
+    """
+    from PIL import Image
+    
+    image = Image.open(image_path)
+    image = image.resize(size, Image.Resampling.LANCZOS)
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    temporary_path = f"{target_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        image.save(temporary_path, format="PNG")
+        os.replace(temporary_path, target_path)
+    except Exception:
+        try:
+            os.remove(temporary_path)
+        except OSError:
+            pass
+        raise
+    return image
+
+
+def file_stamp(path: str):
+    """Время изменения и размер файла или None, если файла нет"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class CoverService:
+    """Ленивая загрузка обложек книг.
+    
+    Обложки декодируются и уменьшаются в фоновых потоках только по запросу,
+    готовые миниатюры сохраняются на диск, а в памяти хранится ограниченное
+    число последних использованных изображений. Неудачная загрузка запоминается
+    по времени изменения файла, и битая обложка не декодируется повторно,
+    пока файл не будет заменен. Миниатюры из снимка каталога
+    (catalog_snapshot) создаются сразу, без PIL и фоновых потоков.
+    """
+    
+    def __init__(self, window, size=COVER_SIZE, thumbnail_dir: str = THUMBNAIL_DIR,
+                 max_images: int = 120, workers: int = 2, snapshot=None):
+        self.window = window
+        self.snapshot = snapshot
+        self.size = size
+        self.thumbnail_dir = thumbnail_dir
+        self.max_images = max_images
+        self.images = OrderedDict()
+        # Обложки, которые не удалось загрузить: путь -> отметка файла
+        self.failed = {}
+        self.waiting = {}
+        self.ready = queue.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cover")
+        self.poll_id = None
+    
+    def get(self, image_path: str, on_ready):
+        """Получение обложки из кэша или постановка ее в очередь на загрузку.
+        
+        Если обложка уже в памяти, она возвращается сразу; иначе возвращается
+        None, а on_ready(image) будет вызван в потоке интерфейса после загрузки.
+        Для обложки, которую не удалось загрузить, сразу возвращается None.
+        """
+        image = self.images.get(image_path)
+        if image is not None:
+            self.images.move_to_end(image_path)
+            return image
+        if image_path in self.failed:
+            if self.failed[image_path] == file_stamp(image_path):
+                return None
+            del self.failed[image_path]
+        
+        callbacks = self.waiting.get(image_path)
+        if callbacks is None:
+            self.waiting[image_path] = [on_ready]
+            self.executor.submit(self._decode, image_path)
+            if self.poll_id is None:
+                self.poll_id = self.window.after(COVER_POLL_MS, self._poll)
+        else:
+            callbacks.append(on_ready)
+        return None
+    
+    def get_packed(self, cover_image: str):
+        """Обложка из снимка каталога по значению books.cover_image или None,
+        если снимка нет или обложка в него не попала"""
+        if self.snapshot is None or not cover_image:
+            return None
+        key = ("snapshot", cover_image)
+        image = self.images.get(key)
+        if image is not None:
+            self.images.move_to_end(key)
+            return image
+        
+        data = self.snapshot.thumbnail(cover_image)
+        if data is None:
+            return None
+        from catalog_snapshot import photo_image
+        
+        with instrumentation.span("cover.snapshot"):
+            image = photo_image(data)
+        self.images[key] = image
+        while len(self.images) > self.max_images:
+            self.images.popitem(last=False)
+        return image
+    
+    def _decode(self, image_path: str):
+        """Декодирование обложки в фоновом потоке"""
+        try:
+            # PIL загружается при первой обложке, а не при запуске приложения
+            from PIL import Image
+            
+            target_path = thumbnail_path(image_path, self.size, self.thumbnail_dir)
+            if os.path.exists(target_path):
+                with instrumentation.span("cover.load_thumbnail"):
+                    image = Image.open(target_path)
+                    image.load()
+            else:
+                with instrumentation.span("cover.decode"):
+                    image = create_thumbnail(image_path, target_path, self.size)
+        except Exception as e:
+            print(f"Произошла ошибка при загрузке обложки {image_path}: {e}")
+            image = None
+            self.failed[image_path] = file_stamp(image_path)
+        self.ready.put((image_path, image))
+    
+    def _poll(self):
+        """Создание PhotoImage для готовых обложек в потоке интерфейса"""
+        from PIL import ImageTk
+        
+        self.poll_id = None
+        while not self.ready.empty():
+            image_path, image = self.ready.get_nowait()
+            photo = ImageTk.PhotoImage(image) if image is not None else None
+            if photo is not None:
+                self.images[image_path] = photo
+                while len(self.images) > self.max_images:
+                    self.images.popitem(last=False)
+            for on_ready in self.waiting.pop(image_path, []):
+                on_ready(photo)
+        
+        if self.waiting:
+            self.poll_id = self.window.after(COVER_POLL_MS, self._poll)
+    
+    def close(self):
+        """Остановка фоновой загрузки обложек"""
+        if self.poll_id is not None:
+            self.window.after_cancel(self.poll_id)
+            self.poll_id = None
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,314 @@
+import argparse
+import os
+import random
+import sqlite3
+import string
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import List, Tuple
+
+from cover_service import store_cover
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DB = os.path.join(APP_DIR, "bookworld.db")
+SOURCE_COVERS = os.path.join(APP_DIR, "resources")
+
+ROLES = ("Администратор", "Менеджер", "Авторизованный клиент")
+ORDER_STATUSES = ("Новый", "В обработке", "Доставлен", "Отменен")
+GENRES = (
+    "Классика", "Антиутопия", "Детская", "Детектив", "Фэнтези", "Роман",
+    "Фантастика", "Научная фантастика", "Поэзия", "Приключения", "История",
+)
+PUBLISHERS = ("АСТ", "Эксмо", "Азбука", "Питер", "Росмэн", "Махаон", "Альпина", "МИФ")
+FIRST_NAMES = (
+    "Александр", "Михаил", "Федор", "Лев", "Анна", "Мария", "Сергей", "Иван",
+    "Николай", "Елена", "Ольга", "Дмитрий", "Андрей", "Татьяна", "Алексей",
+    "Борис", "Владимир", "Галина", "Евгений", "Зинаида", "Игорь", "Кира",
+    "Людмила", "Марина", "Наталья", "Олег", "Павел", "Роман", "Светлана",
+    "Тимур", "Ульяна", "Юрий", "Яна", "Вера", "Григорий", "Денис", "Жанна",
+    "Константин", "Лидия", "Виктор",
+)
+LAST_NAMES = (
+    "Пушкин", "Булгаков", "Достоевский", "Толстой", "Чехов", "Гоголь", "Тургенев",
+    "Ахматова", "Цветаева", "Набоков", "Пастернак", "Лермонтов", "Бунин", "Куприн",
+)
+# Корни и окончания синтетических фамилий авторов: вместе с LAST_NAMES дают
+# несколько сотен фамилий и десятки тысяч сочетаний с именами и инициалами
+SURNAME_ROOTS = (
+    "Абрам", "Белоус", "Богдан", "Вален", "Ветл", "Волк", "Воронц", "Гаврил",
+    "Голуб", "Горбун", "Грач", "Гусл", "Давыд", "Дорож", "Ермол", "Жук",
+    "Журавл", "Заруб", "Зим", "Игнат", "Калин", "Карп", "Кедр", "Клим",
+    "Козл", "Комар", "Кудр", "Лебед", "Лис", "Лопат", "Любим", "Макар",
+    "Медвед", "Мельн", "Мирон", "Мороз", "Назар", "Неклюд", "Оболен", "Озер",
+    "Орл", "Осип", "Панкрат", "Пахом", "Полян", "Родион", "Руд", "Савел",
+    "Сверч", "Сев", "Синиц", "Сокол", "Степан", "Сухар", "Тарас", "Тихон",
+    "Трофим", "Туман", "Ушак", "Филат", "Хром", "Чайк", "Черн", "Шувал",
+    "Щегл", "Юд", "Ябл", "Ярц",
+)
+SURNAME_SUFFIXES = ("ов", "ин", "ский", "ич", "енко", "цев")
+PATRONYMIC_INITIALS = "АБВГДЕИКЛМНОПРСТ"
+TITLE_ADJECTIVES = (
+    "Белая", "Тихий", "Последний", "Золотой", "Северная", "Темные", "Далекий",
+    "Забытая", "Вечный", "Красная", "Старый", "Новая", "Горькая", "Ледяной",
+    "Синий", "Зеленая", "Тайный", "Осенний", "Весенняя", "Летний", "Зимняя",
+    "Чужой", "Родной", "Легкий", "Тяжелая", "Быстрый", "Медленная", "Ночной",
+    "Утренняя", "Вечерний", "Пустой", "Полная", "Железный", "Серебряная",
+    "Хрустальный", "Каменная", "Деревянный", "Бумажная", "Стеклянный", "Огненная",
+    "Морской", "Лесная", "Степной", "Горная", "Речной", "Небесный", "Подземная",
+    "Первый", "Седьмая", "Тысячный", "Странный", "Веселая", "Грустный", "Храбрая",
+)
+TITLE_NOUNS = (
+    "гвардия", "Дон", "день", "телёнок", "звезда", "аллеи", "берег",
+    "песня", "город", "комната", "сад", "дорога", "правда", "ветер",
+    "мастер", "остров", "маяк", "поезд", "письмо", "тень", "мост", "лес",
+    "река", "море", "дом", "окно", "ключ", "зеркало", "часы", "корабль",
+    "замок", "дракон", "шторм", "рассвет", "закат", "путь", "вокзал", "сон",
+    "память", "тайна", "буря", "граница", "пристань", "крепость", "площадь",
+    "библиотека", "экспедиция", "хроника", "легенда", "сказка", "повесть",
+    "карта", "компас", "фонарь", "перо", "свеча", "колокол", "лабиринт",
+    "страж", "странник", "капитан", "охотник", "художник", "музыкант", "доктор",
+    "учитель", "наследник", "королева", "пилигрим", "садовник", "сторож",
+    "волк", "ворон", "лисица", "медведь", "журавль", "кит", "соловей",
+)
+STREETS = ("Тверская", "Арбат", "Ленина", "Пушкина", "Садовая", "Гагарина", "Мира", "Лесная")
+CITIES = ("Москва", "Санкт-Петербург", "Казань", "Екатеринбург", "Новосибирск")
+
+
+def make_article(number: int) -> str:
+    """Уникальный артикул в формате исходного каталога (например, B112F4)"""
+    number, digit = divmod(number, 10)
+    number, second_letter = divmod(number, 26)
+    number, digits = divmod(number, 1000)
+    first_letter = number % 26
+    return (
+        f"{string.ascii_uppercase[first_letter]}{digits:03d}"
+        f"{string.ascii_uppercase[second_letter]}{digit}"
+    )
+
+
+def copy_schema(conn):
+    """Создание таблиц, индексов и триггеров по схеме bookworld.db"""
+    with sqlite3.connect(SOURCE_DB) as source:
+        statements = [
+            row[0] for row in source.execute(
+                """
+                SELECT sql FROM sqlite_master
+                WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' AND name NOT LIKE 'books_fts%'
+                ORDER BY CASE type WHEN 'table' THEN 0 WHEN 'index' THEN 1 ELSE 2 END
+                """
+            )
+        ]
+    for statement in statements:
+        conn.execute(statement)
+
+
+def prepare_covers(resources_dir: str):
+    """Копирование образцов обложек в каталог covers целевых ресурсов"""
+    covers = []
+    for name in sorted(os.listdir(SOURCE_COVERS)):
+        if name[:-4].isdigit() and name.endswith(".png"):
+            covers.append(store_cover(os.path.join(SOURCE_COVERS, name), resources_dir))
+    return covers
+
+
+def generate_database(db_path: str, books: int, seed: int = 42, resources_dir: str = None,
+                      orders: int = None, batch_size: int = 50_000):
+    """Создание базы данных с синтетическим каталогом, пользователями и заказами"""
+    rng = random.Random(seed)
+    orders = books // 10 if orders is None else orders
+    covers = prepare_covers(resources_dir) if resources_dir else []
+    started_at = datetime(2024, 1, 1)
+    
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = OFF")
+    with conn:
+        copy_schema(conn)
+        
+        pickup_points = max(books // 1000, 10)
+        conn.executemany(
+            "INSERT INTO pickup_points (address) VALUES (?)",
+            (
+                (f"г. {rng.choice(CITIES)}, ул. {rng.choice(STREETS)}, д. {i + 1}",)
+                for i in range(pickup_points)
+            )
+        )
+        
+        conn.executemany(
+            "INSERT INTO users (role, full_name, login, password) VALUES (?, ?, ?, ?)",
+            (
+                (
+                    ROLES[0] if i == 0 else rng.choice(ROLES),
+                    f"{rng.choice(LAST_NAMES)} {rng.choice(FIRST_NAMES)}",
+                    f"user{i}@example.com",
+                    "".join(rng.choices(string.ascii_letters + string.digits, k=6)),
+                )
+                for i in range(max(books // 100, 10))
+            )
+        )
+    
+    articles = [make_article(i) for i in range(books)]
+    book_rows = _book_rows(rng, articles, covers)
+    _insert_batches(
+        conn,
+        """
+        INSERT INTO books (article, title, author, genre, publisher, year, price,
+                           sale_price, on_sale, stock_quantity, description, cover_image)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        book_rows,
+        batch_size
+    )
+    
+    order_rows = []
+    for i in range(orders):
+        order_date = started_at + timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+        order_rows.append((
+            i + 1,
+            order_date.strftime("%Y-%m-%d %H:%M:%S"),
+            (order_date + timedelta(days=rng.randint(1, 14))).strftime("%Y-%m-%d %H:%M:%S"),
+            rng.randint(1, pickup_points),
+            f"{rng.choice(LAST_NAMES)} {rng.choice(FIRST_NAMES)}",
+            f"{rng.randint(100, 999)}",
+            rng.choice(ORDER_STATUSES),
+        ))
+    _insert_batches(
+        conn,
+        """
+        INSERT INTO orders (order_number, order_date, delivery_date, pickup_point_id,
+                            client_name, pickup_code, status)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        order_rows,
+        batch_size
+    )
+    
+    item_rows = (
+        (order_id, rng.choice(articles), rng.randint(1, 3), rng.randint(150, 3000))
+        for order_id in range(1, orders + 1)
+        for _ in range(rng.randint(1, 3))
+    )
+    _insert_batches(
+        conn,
+        "INSERT INTO order_items (order_id, book_article, quantity, unit_price) VALUES (?, ?, ?, ?)",
+        item_rows,
+        batch_size
+    )
+    conn.close()
+
+
+def zipf_weights(size: int, exponent: float = 0.8) -> List[float]:
+    """Накопленные веса закона Ципфа: первые элементы списка встречаются чаще"""
+    return list(accumulate(1 / (rank + 1) ** exponent for rank in range(size)))
+
+
+def make_surnames() -> Tuple[str, ...]:
+    """Фамилии авторов: известные писатели и сочетания корней с окончаниями"""
+    return LAST_NAMES + tuple(root + suffix for root in SURNAME_ROOTS for suffix in SURNAME_SUFFIXES)
+
+
+class TextGenerator:
+    """Названия книг и имена авторов переменной длины.
+    
+    Слова выбираются по закону Ципфа, поэтому одни слова встречаются в
+    тысячах названий, а большинство - в единицах, как в настоящем каталоге.
+    """
+    
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.surnames = make_surnames()
+        self.weights = {
+            "adjective": zipf_weights(len(TITLE_ADJECTIVES)),
+            "noun": zipf_weights(len(TITLE_NOUNS)),
+            "surname": zipf_weights(len(self.surnames)),
+            "first_name": zipf_weights(len(FIRST_NAMES)),
+        }
+    
+    def _pick(self, words, kind: str) -> str:
+        """Случайное слово списка с весами Ципфа"""
+        return self.rng.choices(words, cum_weights=self.weights[kind])[0]
+    
+    def adjective(self) -> str:
+        """Прилагательное для названия"""
+        return self._pick(TITLE_ADJECTIVES, "adjective")
+    
+    def noun(self) -> str:
+        """Существительное для названия"""
+        return self._pick(TITLE_NOUNS, "noun")
+    
+    def title(self) -> str:
+        """Название из одного-пяти слов по одному из типичных шаблонов"""
+        kind = self.rng.random()
+        if kind < 0.3:
+            return f"{self.adjective()} {self.noun()}"
+        if kind < 0.45:
+            return self.noun().capitalize()
+        if kind < 0.65:
+            return f"{self.noun().capitalize()} и {self.noun()}"
+        if kind < 0.8:
+            return f"{self.adjective()} {self.noun()}: {self.adjective().lower()} {self.noun()}"
+        if kind < 0.9:
+            return f"{self.adjective()}, {self.adjective().lower()} {self.noun()}"
+        return f"{self.noun().capitalize()} {self._pick(self.surnames, 'surname')}"
+    
+    def author(self) -> str:
+        """Имя и фамилия автора или инициалы и фамилия"""
+        surname = self._pick(self.surnames, "surname")
+        first_name = self._pick(FIRST_NAMES, "first_name")
+        if self.rng.random() < 0.4:
+            return f"{first_name[0]}. {self.rng.choice(PATRONYMIC_INITIALS)}. {surname}"
+        return f"{first_name} {surname}"
+
+
+def _book_rows(rng: random.Random, articles, covers):
+    """Строки таблицы books с правдоподобными названиями и авторами"""
+    text = TextGenerator(rng)
+    for i, article in enumerate(articles):
+        price = rng.randint(150, 3000)
+        on_sale = i % 7 == 0
+        title = text.title()
+        if i % 5 == 0:
+            title += f" (том {i % 7 + 1})"
+        yield (
+            article,
+            title,
+            text.author(),
+            rng.choice(GENRES),
+            rng.choice(PUBLISHERS),
+            rng.randint(1900, 2025),
+            price,
+            round(price * 0.8, 2) if on_sale else None,
+            on_sale,
+            0 if i % 9 == 0 else rng.randint(1, 100),
+            "Описание книги для нагрузочного тестирования каталога",
+            rng.choice(covers) if covers and i % 4 else None,
+        )
+
+
+def _insert_batches(conn, statement: str, rows, batch_size: int):
+    """Вставка строк крупными транзакциями"""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            with conn:
+                conn.executemany(statement, batch)
+            batch = []
+    if batch:
+        with conn:
+            conn.executemany(statement, batch)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Генерация синтетической базы данных книжного клуба")
+    parser.add_argument("db_path", help="путь к создаваемой базе данных")
+    parser.add_argument("--books", type=int, default=100_000, help="число книг")
+    parser.add_argument("--orders", type=int, help="число заказов (по умолчанию books / 10)")
+    parser.add_argument("--seed", type=int, default=42, help="начальное значение генератора")
+    parser.add_argument("--resources", help="каталог ресурсов, в который копируются обложки")
+    args = parser.parse_args()
+    
+    if os.path.exists(args.db_path):
+        parser.error(f"файл {args.db_path} уже существует")
+    generate_database(args.db_path, args.books, args.seed, args.resources, args.orders)
+    print(f"Создана база {args.db_path}: {args.books} книг")
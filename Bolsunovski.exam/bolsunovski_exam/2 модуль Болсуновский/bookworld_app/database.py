@@ -1,17 +1,552 @@
 import sqlite3
 import os
-from typing import List, Dict, Optional
+import queue
+import random
+import re
+import string
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, List, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+from catalog_cache import CatalogCache
+from catalog_facets import (DEFAULT_SORT, FACET_INDEXES, SORT_COLUMNS, CatalogFilters, after_condition,
+                            facets_from_groups, filter_condition, order_clause)
+from fuzzy_search import TrigramIndex
+from instrumentation import instrumentation
+from models import Book, DATA_COLUMNS, KEY_COLUMNS, book_row_factory, projection
 
-class DatabaseManager:
-    def __init__(self, db_path: str = "literature_club.db"):
+# Параметры, применяемые один раз к каждому новому подключению пула
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA temp_store = MEMORY",
+)
+
+# Число строк индекса, просматриваемых при сборе статистики планировщика
+ANALYSIS_LIMIT = 1000
+
+# Весовые коэффициенты bm25 для столбцов полнотекстового индекса
+# (title, author, genre, publisher, description)
+FTS_COLUMN_WEIGHTS = (10.0, 5.0, 2.0, 1.0, 0.5)
+
+# Составной индекс для постраничной выборки по ключу (title, article)
+CATALOG_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_books_title_article ON books(title, article)",
+)
+# Индексы, которые больше не используются запросами приложения: изменения
+# книг отслеживаются по журналу books_changelog, а не по updated_at
+OBSOLETE_INDEXES = (
+    "DROP INDEX IF EXISTS idx_books_updated_at",
+)
+
+# Триггер отметки времени срабатывает только для запросов, которые сами
+# не меняют updated_at: пакетная загрузка и списание остатков выставляют
+# отметку в том же UPDATE и не требуют повторной записи каждой строки
+BOOKS_TIMESTAMP_TRIGGER = """
+CREATE TRIGGER update_books_timestamp
+AFTER UPDATE ON books
+FOR EACH ROW
+WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    UPDATE books SET updated_at = CURRENT_TIMESTAMP WHERE article = NEW.article;
+END
+"""
+
+# Журнал изменений каталога: триггеры записывают артикул каждой вставленной,
+# измененной или удаленной книги, и открытые окна каталога обновляют только
+# затронутые карточки. Триггер изменения пропускает UPDATE, который меняет одну
+# отметку updated_at: его выполняет update_books_timestamp, и без условия
+# каждое изменение попадало бы в журнал дважды
+BOOKS_CHANGELOG_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS books_changelog (
+        change_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        article TEXT NOT NULL,
+        operation TEXT NOT NULL,
+        changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_changelog_insert
+    AFTER INSERT ON books
+    BEGIN
+        INSERT INTO books_changelog (article, operation) VALUES (NEW.article, 'insert');
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS books_changelog_update
+    AFTER UPDATE ON books
+    WHEN ({', '.join(f'OLD.{column}' for column in DATA_COLUMNS)})
+      IS NOT ({', '.join(f'NEW.{column}' for column in DATA_COLUMNS)})
+    BEGIN
+        INSERT INTO books_changelog (article, operation)
+        SELECT OLD.article, 'delete' WHERE OLD.article IS NOT NEW.article;
+        INSERT INTO books_changelog (article, operation) VALUES (NEW.article, 'update');
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_changelog_delete
+    AFTER DELETE ON books
+    BEGIN
+        INSERT INTO books_changelog (article, operation) VALUES (OLD.article, 'delete');
+    END
+    """,
+]
+
+# Срок хранения записей журнала изменений; более старые записи удаляются при запуске
+CHANGELOG_RETENTION = "-1 day"
+
+# Загрузка каталога: новая книга вставляется, существующая обновляется только
+# при изменении хотя бы одного поля, поэтому повторная загрузка того же прайс-листа
+# не переписывает строки, индексы и полнотекстовый индекс
+_CHANGED_COLUMNS = DATA_COLUMNS[1:]
+BOOKS_UPSERT = f"""
+INSERT INTO books ({', '.join(DATA_COLUMNS)})
+VALUES ({', '.join('?' * len(DATA_COLUMNS))})
+ON CONFLICT(article) DO UPDATE SET
+    {', '.join(f'{column} = excluded.{column}' for column in _CHANGED_COLUMNS)},
+    updated_at = CURRENT_TIMESTAMP
+WHERE ({', '.join(f'books.{column}' for column in _CHANGED_COLUMNS)})
+   IS NOT ({', '.join(f'excluded.{column}' for column in _CHANGED_COLUMNS)})
+"""
+
+# Число строк, записываемых в одной транзакции при загрузке каталога
+UPSERT_BATCH_SIZE = 20_000
+
+# Число артикулов в одном запросе выборки книг по списку артикулов
+ARTICLES_CHUNK_SIZE = 500
+
+# Повторы резервирования при занятой базе: число попыток и начальная пауза в секундах
+RESERVATION_RETRIES = 5
+RESERVATION_BACKOFF = 0.02
+
+# Статус заказа, который не учитывается в сводках продаж
+CANCELLED_STATUS = 'Отменен'
+
+
+def _order_item_summary_sql(row: str, sign: int) -> str:
+    """Изменение сводок при добавлении (sign=1) или удалении (sign=-1) позиции заказа"""
+    return f"""
+        INSERT INTO order_totals (order_id, items, quantity, amount)
+        VALUES ({row}.order_id, {sign}, {sign} * {row}.quantity, {sign} * {row}.quantity * {row}.unit_price)
+        ON CONFLICT(order_id) DO UPDATE SET
+            items = items + excluded.items,
+            quantity = quantity + excluded.quantity,
+            amount = amount + excluded.amount;
+        INSERT INTO book_sales (book_article, quantity, amount)
+        SELECT {row}.book_article, {sign} * {row}.quantity, {sign} * {row}.quantity * {row}.unit_price
+        FROM orders WHERE order_id = {row}.order_id AND status <> '{CANCELLED_STATUS}'
+        ON CONFLICT(book_article) DO UPDATE SET
+            quantity = quantity + excluded.quantity,
+            amount = amount + excluded.amount;
+        INSERT INTO pickup_point_sales (point_id, orders, quantity, amount)
+        SELECT pickup_point_id, 0, {sign} * {row}.quantity, {sign} * {row}.quantity * {row}.unit_price
+        FROM orders WHERE order_id = {row}.order_id AND status <> '{CANCELLED_STATUS}'
+        ON CONFLICT(point_id) DO UPDATE SET
+            quantity = quantity + excluded.quantity,
+            amount = amount + excluded.amount;
+    """
+
+
+def _order_summary_sql(row: str, sign: int) -> str:
+    """Изменение сводок при учете (sign=1) или исключении (sign=-1) заказа целиком"""
+    return f"""
+        INSERT INTO pickup_point_sales (point_id, orders, quantity, amount)
+        SELECT {row}.pickup_point_id, {sign}, {sign} * COALESCE(totals.quantity, 0), {sign} * COALESCE(totals.amount, 0)
+        FROM (SELECT 1) LEFT JOIN order_totals AS totals ON totals.order_id = {row}.order_id
+        WHERE {row}.status <> '{CANCELLED_STATUS}'
+        ON CONFLICT(point_id) DO UPDATE SET
+            orders = orders + excluded.orders,
+            quantity = quantity + excluded.quantity,
+            amount = amount + excluded.amount;
+        INSERT INTO book_sales (book_article, quantity, amount)
+        SELECT book_article, {sign} * SUM(quantity), {sign} * SUM(quantity * unit_price)
+        FROM order_items WHERE order_id = {row}.order_id AND {row}.status <> '{CANCELLED_STATUS}'
+        GROUP BY book_article
+        ON CONFLICT(book_article) DO UPDATE SET
+            quantity = quantity + excluded.quantity,
+            amount = amount + excluded.amount;
+    """
+
+
+# Сводные таблицы продаж, поддерживаемые триггерами, чтобы отчеты
+# не сканировали order_items; отмененные заказы в продажи не входят
+ORDER_SUMMARY_SCHEMA = [
+    "CREATE INDEX IF NOT EXISTS idx_orders_pickup_point ON orders(pickup_point_id)",
+    """
+    CREATE TABLE IF NOT EXISTS order_totals (
+        order_id INTEGER PRIMARY KEY,
+        items INTEGER NOT NULL DEFAULT 0,
+        quantity INTEGER NOT NULL DEFAULT 0,
+        amount REAL NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS book_sales (
+        book_article TEXT PRIMARY KEY,
+        quantity INTEGER NOT NULL DEFAULT 0,
+        amount REAL NOT NULL DEFAULT 0
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_book_sales_amount ON book_sales(amount)",
+    """
+    CREATE TABLE IF NOT EXISTS pickup_point_sales (
+        point_id INTEGER PRIMARY KEY,
+        orders INTEGER NOT NULL DEFAULT 0,
+        quantity INTEGER NOT NULL DEFAULT 0,
+        amount REAL NOT NULL DEFAULT 0
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS order_items_summary_insert
+    AFTER INSERT ON order_items
+    BEGIN
+        {_order_item_summary_sql("NEW", 1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS order_items_summary_delete
+    AFTER DELETE ON order_items
+    BEGIN
+        {_order_item_summary_sql("OLD", -1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS order_items_summary_update
+    AFTER UPDATE OF order_id, book_article, quantity, unit_price ON order_items
+    BEGIN
+        {_order_item_summary_sql("OLD", -1)}
+        {_order_item_summary_sql("NEW", 1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS orders_summary_insert
+    AFTER INSERT ON orders
+    BEGIN
+        {_order_summary_sql("NEW", 1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS orders_summary_update
+    AFTER UPDATE OF status, pickup_point_id ON orders
+    WHEN (OLD.status = '{CANCELLED_STATUS}') <> (NEW.status = '{CANCELLED_STATUS}')
+      OR OLD.pickup_point_id <> NEW.pickup_point_id
+    BEGIN
+        {_order_summary_sql("OLD", -1)}
+        {_order_summary_sql("NEW", 1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS orders_summary_delete
+    BEFORE DELETE ON orders
+    BEGIN
+        DELETE FROM order_items WHERE order_id = OLD.order_id;
+        UPDATE pickup_point_sales SET orders = orders - 1
+        WHERE point_id = OLD.pickup_point_id AND OLD.status <> '{CANCELLED_STATUS}';
+        DELETE FROM order_totals WHERE order_id = OLD.order_id;
+    END
+    """,
+]
+
+# Первичное заполнение сводок по уже существующим заказам
+ORDER_SUMMARY_BACKFILL = [
+    """
+    INSERT INTO order_totals (order_id, items, quantity, amount)
+    SELECT order_id, COUNT(*), SUM(quantity), SUM(quantity * unit_price)
+    FROM order_items GROUP BY order_id
+    """,
+    f"""
+    INSERT INTO book_sales (book_article, quantity, amount)
+    SELECT items.book_article, SUM(items.quantity), SUM(items.quantity * items.unit_price)
+    FROM order_items AS items JOIN orders ON orders.order_id = items.order_id
+    WHERE orders.status <> '{CANCELLED_STATUS}'
+    GROUP BY items.book_article
+    """,
+    f"""
+    INSERT INTO pickup_point_sales (point_id, orders, quantity, amount)
+    SELECT orders.pickup_point_id, COUNT(*), SUM(COALESCE(totals.quantity, 0)), SUM(COALESCE(totals.amount, 0))
+    FROM orders LEFT JOIN order_totals AS totals ON totals.order_id = orders.order_id
+    WHERE orders.status <> '{CANCELLED_STATUS}'
+    GROUP BY orders.pickup_point_id
+    """,
+]
+
+FTS_SCHEMA = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+        title, author, genre, publisher, description,
+        content='books',
+        content_rowid='rowid',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_insert
+    AFTER INSERT ON books
+    BEGIN
+        INSERT INTO books_fts(rowid, title, author, genre, publisher, description)
+        VALUES (NEW.rowid, NEW.title, NEW.author, NEW.genre, NEW.publisher, NEW.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_delete
+    AFTER DELETE ON books
+    BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author, genre, publisher, description)
+        VALUES ('delete', OLD.rowid, OLD.title, OLD.author, OLD.genre, OLD.publisher, OLD.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_update
+    AFTER UPDATE OF title, author, genre, publisher, description ON books
+    BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author, genre, publisher, description)
+        VALUES ('delete', OLD.rowid, OLD.title, OLD.author, OLD.genre, OLD.publisher, OLD.description);
+        INSERT INTO books_fts(rowid, title, author, genre, publisher, description)
+        VALUES (NEW.rowid, NEW.title, NEW.author, NEW.genre, NEW.publisher, NEW.description);
+    END
+    """,
+]
+
+
+def build_fts_query(search_query: str) -> Optional[str]:
+    """Преобразование пользовательского запроса в выражение FTS5 с поиском по префиксу"""
+    terms = re.findall(r"\w+", search_query)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def _is_busy_error(error: sqlite3.OperationalError) -> bool:
+    """Ошибка вызвана блокировкой базы другим подключением"""
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+def read_only_uri(db_path: str) -> str:
+    """URI для подключения к базе только на чтение: файл не создается,
+    а любая попытка записи завершается ошибкой"""
+    return f"{Path(db_path).resolve().as_uri()}?mode=ro"
+
+
+class ConnectionPool:
+    """Пул постоянных подключений к SQLite.
+    
+    Подключение выдается одному потоку на время аренды; повторный запрос
+    из того же потока возвращает уже арендованное подключение.
+    """
+    
+    def __init__(self, db_path: str, size: int = 4, timeout: float = 5.0,
+                 cached_statements: int = 256, read_only: bool = False):
         self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self.read_only = read_only
+        self._idle = queue.LifoQueue()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._closed = False
     
-    def get_connection(self):
-        """Установление подключения к базе данных"""
-        conn = sqlite3.connect(self.db_path)
+    def _create_connection(self):
+        """Открытие подключения и однократная настройка PRAGMA"""
+        conn = sqlite3.connect(
+            read_only_uri(self.db_path) if self.read_only else self.db_path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+            uri=self.read_only
+        )
         conn.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            # Режим журнала записывается в файл базы, поэтому подключение
+            # только на чтение работает в режиме, который уже задан
+            if self.read_only and "journal_mode" in pragma:
+                continue
+            try:
+                conn.execute(pragma)
+            except sqlite3.Error as e:
+                print(f" Не удалось применить '{pragma}': {e}")
         return conn
     
+    def acquire(self):
+        """Аренда подключения текущим потоком"""
+        if self._closed:
+            raise sqlite3.ProgrammingError("Пул подключений закрыт")
+        
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            self._local.depth += 1
+            return held
+        
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = len(self._connections) < self.size
+                if can_create:
+                    conn = self._create_connection()
+                    self._connections.append(conn)
+            if not can_create:
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise sqlite3.OperationalError("Нет свободных подключений в пуле")
+        
+        self._local.conn = conn
+        self._local.depth = 1
+        return conn
+    
+    def release(self, conn):
+        """Возврат подключения в пул"""
+        self._local.depth -= 1
+        if self._local.depth > 0:
+            return
+        self._local.conn = None
+        if self._closed:
+            conn.close()
+        else:
+            self._idle.put(conn)
+    
+    def close(self):
+        """Закрытие всех подключений пула.
+        
+        Перед закрытием выполняется PRAGMA optimize: SQLite обновляет статистику
+        планировщика только для таблиц, запросы к которым выполняло это подключение
+        и статистика которых устарела, поэтому обычно команда ничего не делает.
+        Подключения только на чтение закрываются без обновления статистики.
+        """
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if self.read_only:
+                conn.close()
+                continue
+            try:
+                conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+                conn.execute("PRAGMA optimize")
+            except sqlite3.Error as e:
+                print(f" Не удалось обновить статистику планировщика: {e}")
+            conn.close()
+        with self._lock:
+            self._connections.clear()
+
+
+class DatabaseManager:
+    def __init__(self, db_path: str = "literature_club.db", pool_size: int = 4,
+                 cache_catalog: bool = True, read_only: bool = False):
+        self.db_path = db_path
+        self.pool = ConnectionPool(db_path, size=pool_size, read_only=read_only)
+        if read_only:
+            # База открывается как есть: индексы, FTS, сводки и журнал
+            # изменений не создаются, журнал не очищается
+            self.fts_enabled = self._has_search_index()
+        else:
+            self._ensure_catalog_indexes()
+            self.fts_enabled = self._ensure_search_index()
+            self._ensure_order_summaries()
+            self._ensure_changelog()
+        self.catalog_cache = CatalogCache(self) if cache_catalog else None
+        # Триграммный индекс загружается при первом нечетком поиске
+        self.trigram_index = TrigramIndex(self)
+    
+    @contextmanager
+    def get_connection(self):
+        """Получение подключения из пула с фиксацией или откатом транзакции"""
+        conn = self.pool.acquire()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self.pool.release(conn)
+    
+    def close(self):
+        """Закрытие всех подключений к базе данных"""
+        if self.catalog_cache is not None:
+            self.catalog_cache.close()
+        self.trigram_index.close()
+        self.pool.close()
+    
+    def _ensure_catalog_indexes(self):
+        """Создание индексов, необходимых для постраничной выборки и фильтров каталога,
+        удаление устаревших индексов и замена триггера отметки времени на вариант с условием"""
+        try:
+            with self.get_connection() as conn:
+                for statement in CATALOG_INDEXES + FACET_INDEXES + OBSOLETE_INDEXES:
+                    conn.execute(statement)
+                trigger = conn.execute(
+                    "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'update_books_timestamp'"
+                ).fetchone()
+                if trigger is None or "WHEN" not in trigger[0].upper():
+                    conn.execute("DROP TRIGGER IF EXISTS update_books_timestamp")
+                    conn.execute(BOOKS_TIMESTAMP_TRIGGER)
+        except sqlite3.Error as e:
+            print(f" Не удалось создать индексы каталога: {e}")
+    
+    def _ensure_search_index(self) -> bool:
+        """Создание полнотекстового индекса FTS5 по каталогу книг"""
+        try:
+            with self.get_connection() as conn:
+                exists = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'books_fts'"
+                ).fetchone()
+                for statement in FTS_SCHEMA:
+                    conn.execute(statement)
+                if not exists:
+                    # Первичное заполнение индекса из существующих записей
+                    conn.execute("INSERT INTO books_fts(books_fts) VALUES ('rebuild')")
+            return True
+        except sqlite3.Error as e:
+            print(f" Полнотекстовый поиск недоступен, используется LIKE: {e}")
+            return False
+    
+    def _has_search_index(self) -> bool:
+        """Наличие полнотекстового индекса в базе без его создания"""
+        try:
+            with self.get_connection() as conn:
+                return conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'books_fts'"
+                ).fetchone() is not None
+        except sqlite3.Error as e:
+            print(f" Полнотекстовый поиск недоступен, используется LIKE: {e}")
+            return False
+    
+    def _ensure_order_summaries(self):
+        """Создание сводных таблиц продаж и триггеров для их обновления"""
+        try:
+            with self.get_connection() as conn:
+                exists = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'order_totals'"
+                ).fetchone()
+                for statement in ORDER_SUMMARY_SCHEMA:
+                    conn.execute(statement)
+                if not exists:
+                    for statement in ORDER_SUMMARY_BACKFILL:
+                        conn.execute(statement)
+        except sqlite3.Error as e:
+            print(f" Не удалось создать сводки по заказам: {e}")
+    
+    def _ensure_changelog(self):
+        """Создание журнала изменений каталога и удаление устаревших записей"""
+        try:
+            with self.get_connection() as conn:
+                for statement in BOOKS_CHANGELOG_SCHEMA:
+                    conn.execute(statement)
+                conn.execute(
+                    "DELETE FROM books_changelog WHERE changed_at < datetime('now', ?)",
+                    (CHANGELOG_RETENTION,)
+                )
+        except sqlite3.Error as e:
+            print(f" Не удалось создать журнал изменений каталога: {e}")
+    
     def authenticate_user(self, login: str, password: str) -> Optional[Dict]:
         """Проверка учетных данных пользователя"""
         try:
@@ -32,61 +567,536 @@ class DatabaseManager:
             print(f"Произошла ошибка при проверке учетных данных: {e}")
         return None
     
-    def get_all_books(self, search_query: str = None) -> List[Dict]:
+    def get_all_books(self, search_query: str = None,
+                      columns: Optional[Sequence[str]] = None) -> List[Book]:
         """Получение списка книг с поддержкой поиска"""
+        select_list = projection(columns)
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
+                cursor.row_factory = book_row_factory
+                
+                fts_query = None
+                if self.fts_enabled and search_query:
+                    fts_query = build_fts_query(search_query)
                 
-                if search_query and search_query.strip():
+                if fts_query:
+                    # Полнотекстовый поиск с ранжированием по bm25
+                    query = f"""
+                        SELECT {select_list} FROM books_fts
+                        JOIN books ON books.rowid = books_fts.rowid
+                        WHERE books_fts MATCH ?
+                        ORDER BY bm25(books_fts, {', '.join(map(str, FTS_COLUMN_WEIGHTS))}), books.title
+                    """
+                    params = (fts_query,)
+                elif search_query and search_query.strip():
                     # Поиск с учетом регистра
-                    query = """
-                        SELECT * FROM books 
+                    query = f"""
+                        SELECT {select_list} FROM books 
                         WHERE LOWER(title) LIKE LOWER(?) 
                            OR LOWER(author) LIKE LOWER(?)
                            OR LOWER(genre) LIKE LOWER(?)
                         ORDER BY title
                     """
                     search_pattern = f'%{search_query.strip()}%'
-                    cursor.execute(query, (search_pattern, search_pattern, search_pattern))
+                    params = (search_pattern, search_pattern, search_pattern)
                 else:
-                    query = "SELECT * FROM books ORDER BY title"
-                    cursor.execute(query)
-                
-                # Получение названий столбцов
-                columns = [description[0] for description in cursor.description]
-                books = []
+                    query = f"SELECT {select_list} FROM books ORDER BY title"
+                    params = ()
                 
-                for row in cursor.fetchall():
-                    book_dict = {}
-                    for i, column in enumerate(columns):
-                        book_dict[column] = row[i]
-                    books.append(book_dict)
-                
-                print(f" Поисковый запрос '{search_query}': найдено {len(books)} книг")
+                with instrumentation.query("db.get_all_books", conn, query, params) as span:
+                    books = cursor.execute(query, params).fetchall()
+                    span.rows = len(books)
                 return books
-                
+        
         except Exception as e:
             print(f" Ошибка при загрузке списка книг: {e}")
             return []
     
-    def get_book_by_article(self, article: str) -> Optional[Dict]:
+    def get_book_by_article(self, article: str) -> Optional[Book]:
         """Получение информации о книге по уникальному артикулу"""
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
+                cursor.row_factory = book_row_factory
                 cursor.execute("SELECT * FROM books WHERE article = ?", (article,))
-                
-                columns = [description[0] for description in cursor.description]
-                result = cursor.fetchone()
-                
-                if result:
-                    book_dict = {}
-                    for i, column in enumerate(columns):
-                        book_dict[column] = result[i]
-                    return book_dict
-                return None
-                
+                return cursor.fetchone()
+        
         except Exception as e:
             print(f"Ошибка при получении данных о книге: {e}")
-            return None
\ No newline at end of file
+            return None
+    
+    def get_cover_index(self) -> Dict[str, Optional[str]]:
+        """Получение соответствия артикулов книг файлам обложек"""
+        try:
+            with self.get_connection() as conn:
+                return dict(conn.execute("SELECT article, cover_image FROM books").fetchall())
+        except Exception as e:
+            print(f"Ошибка при загрузке списка обложек: {e}")
+            return {}
+    
+    def get_last_change_id(self) -> int:
+        """Номер последней записи журнала изменений каталога.
+        
+        Берется из sqlite_sequence, а не из самой таблицы: номера AUTOINCREMENT
+        не используются повторно, даже если старые записи уже удалены.
+        """
+        try:
+            with self.get_connection() as conn:
+                row = conn.execute(
+                    "SELECT seq FROM sqlite_sequence WHERE name = 'books_changelog'"
+                ).fetchone()
+                return row[0] if row else 0
+        except Exception as e:
+            print(f" Ошибка при чтении журнала изменений: {e}")
+            return 0
+    
+    def get_book_changes(self, after_id: int, limit: int) -> List[Tuple[int, str, str]]:
+        """Записи журнала изменений после after_id: (change_id, article, operation)"""
+        try:
+            with self.get_connection() as conn, instrumentation.span("db.book_changes") as span:
+                rows = conn.execute(
+                    "SELECT change_id, article, operation FROM books_changelog "
+                    "WHERE change_id > ? ORDER BY change_id LIMIT ?",
+                    (after_id, limit)
+                ).fetchall()
+                span.rows = len(rows)
+                return [tuple(row) for row in rows]
+        except Exception as e:
+            print(f" Ошибка при чтении журнала изменений: {e}")
+            return []
+    
+    def get_books_by_articles(self, articles: Iterable[str],
+                              columns: Optional[Sequence[str]] = None) -> List[Book]:
+        """Получение книг по набору артикулов; отсутствующие артикулы пропускаются"""
+        articles = list(articles)
+        select_list = projection(columns)
+        books = []
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = book_row_factory
+                # Число параметров запроса ограничено, поэтому артикулы читаются частями
+                for start in range(0, len(articles), ARTICLES_CHUNK_SIZE):
+                    chunk = articles[start:start + ARTICLES_CHUNK_SIZE]
+                    cursor.execute(
+                        f"SELECT {select_list} FROM books WHERE article IN ({', '.join('?' * len(chunk))})",
+                        chunk
+                    )
+                    books.extend(cursor.fetchall())
+            return books
+        except Exception as e:
+            print(f" Ошибка при загрузке измененных книг: {e}")
+            return []
+    
+    def _search_condition(self, search_query: Optional[str]) -> Tuple[str, tuple]:
+        """Формирование условия WHERE для поискового запроса"""
+        if not search_query or not search_query.strip():
+            return "1", ()
+        
+        fts_query = build_fts_query(search_query) if self.fts_enabled else None
+        if fts_query:
+            return "books.rowid IN (SELECT rowid FROM books_fts WHERE books_fts MATCH ?)", (fts_query,)
+        
+        search_pattern = f'%{search_query.strip()}%'
+        return (
+            "(LOWER(title) LIKE LOWER(?) OR LOWER(author) LIKE LOWER(?) OR LOWER(genre) LIKE LOWER(?))",
+            (search_pattern, search_pattern, search_pattern)
+        )
+    
+    def iter_books(self, search_query: str = None, after: Optional[Tuple[str, str]] = None,
+                   limit: int = 50, is_cancelled: Optional[Callable[[], bool]] = None,
+                   columns: Optional[Sequence[str]] = None) -> List[Book]:
+        """Получение страницы каталога, следующей за ключом (title, article).
+        
+        Если передан is_cancelled, выполнение запроса прерывается, как только
+        функция вернет True; в этом случае возвращается пустой список.
+        Столбцы title и article выбираются всегда, так как образуют ключ страницы.
+        """
+        if columns is not None:
+            columns = tuple(columns) + tuple(column for column in KEY_COLUMNS if column not in columns)
+        select_list = projection(columns)
+        
+        if self.catalog_cache is not None:
+            try:
+                return self.catalog_cache.page(search_query, after, limit, columns)
+            except Exception as e:
+                print(f" Ошибка кэша каталога, выполняется запрос к базе: {e}")
+        
+        condition, params = self._search_condition(search_query)
+        if after is not None:
+            condition += " AND (books.title, books.article) > (?, ?)"
+            params += tuple(after)
+        return self._fetch_page("db.iter_books", select_list, condition, params,
+                                "books.title, books.article", limit, is_cancelled)
+    
+    def query_books(self, search_query: str = None, filters: Optional[CatalogFilters] = None,
+                    sort: str = DEFAULT_SORT, after: Optional[Tuple] = None, limit: int = 50,
+                    is_cancelled: Optional[Callable[[], bool]] = None,
+                    columns: Optional[Sequence[str]] = None) -> List[Book]:
+        """Страница каталога с фильтрами и сортировкой.
+        
+        after - ключ последней книги предыдущей страницы, полученный
+        catalog_facets.sort_key для того же порядка сортировки.
+        """
+        if (filters is None or filters.is_empty()) and sort == DEFAULT_SORT:
+            return self.iter_books(search_query, after, limit, is_cancelled, columns)
+        
+        if columns is not None:
+            columns = tuple(columns) + tuple(column for column in SORT_COLUMNS[sort] if column not in columns)
+        select_list = projection(columns)
+        
+        if (sort == DEFAULT_SORT and filters is not None and len(filters.genres) > 1
+                and not (search_query and search_query.strip())):
+            # Страница по нескольким жанрам собирается из упорядоченных выборок
+            # по каждому жанру: каждая читает индекс (genre, title, article) не
+            # дальше limit строк, и сортировать остается не более limit строк на жанр.
+            # При поиске это не нужно: строк, найденных полнотекстовым индексом, немного
+            parts, params = [], ()
+            for genre in filters.genres:
+                condition, part_params = self._page_condition(search_query, filters.replace(genres=(genre,)),
+                                                              sort, after)
+                parts.append(
+                    f"SELECT * FROM (SELECT books.* FROM books WHERE {condition} "
+                    f"ORDER BY books.title, books.article LIMIT ?)"
+                )
+                params += part_params + (limit,)
+            return self._fetch_page("db.query_books", select_list, "1", params, order_clause(sort),
+                                    limit, is_cancelled, source=f"({' UNION ALL '.join(parts)}) AS books")
+        
+        condition, params = self._page_condition(search_query, filters, sort, after)
+        return self._fetch_page("db.query_books", select_list, condition, params,
+                                order_clause(sort), limit, is_cancelled)
+    
+    def fuzzy_books(self, search_query: str, filters: Optional[CatalogFilters] = None, limit: int = 50,
+                    columns: Optional[Sequence[str]] = None) -> List[Book]:
+        """Книги, похожие на запрос с опечатками или в латинской транслитерации,
+        по убыванию сходства названия и автора с запросом"""
+        try:
+            ranked = self.trigram_index.search(search_query, limit=limit * 4 if filters else limit)
+        except Exception as e:
+            print(f" Ошибка нечеткого поиска: {e}")
+            return []
+        if not ranked:
+            return []
+        
+        rank = {rowid: position for position, (rowid, _) in enumerate(ranked)}
+        filter_sql, filter_params = filter_condition(filters)
+        query = f"""
+            SELECT books.rowid, {projection(columns)} FROM books
+            WHERE books.rowid IN ({', '.join('?' * len(rank))}) AND {filter_sql}
+        """
+        try:
+            with self.get_connection() as conn:
+                rows = conn.execute(query, tuple(rank) + filter_params).fetchall()
+        except Exception as e:
+            print(f" Ошибка нечеткого поиска: {e}")
+            return []
+        rows.sort(key=lambda row: rank[row[0]])
+        return [Book(**{key: row[key] for key in row.keys()[1:]}) for row in rows[:limit]]
+    
+    def _page_condition(self, search_query: Optional[str], filters: Optional[CatalogFilters],
+                        sort: str, after: Optional[Tuple]) -> Tuple[str, tuple]:
+        """Условие WHERE страницы каталога: поиск, фильтры и продолжение после ключа"""
+        condition, params = self._search_condition(search_query)
+        filter_sql, filter_params = filter_condition(filters, sort)
+        condition += f" AND {filter_sql}"
+        params += filter_params
+        if after is not None:
+            after_sql, after_params = after_condition(sort, after)
+            condition += f" AND {after_sql}"
+            params += after_params
+        return condition, params
+    
+    def _fetch_page(self, name: str, select_list: str, condition: str, params: tuple, order: str,
+                    limit: int, is_cancelled: Optional[Callable[[], bool]], source: str = "books") -> List[Book]:
+        """Выполнение запроса страницы каталога с возможностью отмены"""
+        try:
+            with self.get_connection() as conn:
+                if is_cancelled:
+                    conn.set_progress_handler(is_cancelled, 1000)
+                try:
+                    cursor = conn.cursor()
+                    cursor.row_factory = book_row_factory
+                    query = f"""
+                        SELECT {select_list} FROM {source}
+                        WHERE {condition}
+                        ORDER BY {order}
+                        LIMIT ?
+                    """
+                    with instrumentation.query(name, conn, query, params + (limit,)) as span:
+                        books = cursor.execute(query, params + (limit,)).fetchall()
+                        span.rows = len(books)
+                    return books
+                finally:
+                    if is_cancelled:
+                        conn.set_progress_handler(None, 0)
+        except Exception as e:
+            if is_cancelled and is_cancelled():
+                return []
+            print(f" Ошибка при загрузке страницы каталога: {e}")
+            return []
+    
+    def get_facets(self, search_query: str = None, filters: Optional[CatalogFilters] = None) -> Dict:
+        """Счетчики фасетов (жанр, издательство, десятилетие, акция, наличие)
+        для результатов поиска с учетом выбранных фильтров"""
+        if self.catalog_cache is not None:
+            try:
+                return self.catalog_cache.facets(search_query, filters)
+            except Exception as e:
+                print(f" Ошибка кэша каталога, выполняется запрос к базе: {e}")
+        
+        condition, params = self._search_condition(search_query)
+        query = f"""
+            SELECT genre, publisher, year, on_sale, stock_quantity > 0, COUNT(*)
+            FROM books
+            WHERE {condition}
+            GROUP BY 1, 2, 3, 4, 5
+        """
+        try:
+            with self.get_connection() as conn:
+                with instrumentation.query("db.get_facets", conn, query, params) as span:
+                    groups = conn.execute(query, params).fetchall()
+                    span.rows = len(groups)
+            return facets_from_groups(groups, filters)
+        except Exception as e:
+            print(f" Ошибка при подсчете фасетов: {e}")
+            return facets_from_groups((), filters)
+    
+    def stream_books(self, search_query: str = None, page_size: int = 500,
+                     columns: Optional[Sequence[str]] = None) -> Iterator[Book]:
+        """Потоковый обход каталога постранично без загрузки всей таблицы"""
+        after = None
+        while True:
+            page = self.iter_books(search_query, after=after, limit=page_size, columns=columns)
+            yield from page
+            if len(page) < page_size:
+                return
+            after = (page[-1]['title'], page[-1]['article'])
+    
+    def upsert_books(self, rows: Iterable[Sequence], batch_size: int = UPSERT_BATCH_SIZE) -> int:
+        """Пакетная вставка и обновление книг.
+        
+        rows - кортежи значений в порядке DATA_COLUMNS; строки читаются из
+        итератора по мере записи и фиксируются транзакциями по batch_size строк.
+        Возвращает число вставленных или измененных книг.
+        """
+        written = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                written += self._upsert_batch(batch)
+                batch = []
+        if batch:
+            written += self._upsert_batch(batch)
+        return written
+    
+    def _upsert_batch(self, batch) -> int:
+        """Запись одного пакета книг в отдельной транзакции"""
+        with self.get_connection() as conn, instrumentation.span("db.upsert_books") as span:
+            cursor = conn.executemany(BOOKS_UPSERT, batch)
+            span.rows = len(batch)
+            return cursor.rowcount
+    
+    def get_pickup_points(self) -> List[Dict]:
+        """Получение списка пунктов выдачи"""
+        try:
+            with self.get_connection() as conn:
+                rows = conn.execute("SELECT point_id, address FROM pickup_points ORDER BY address").fetchall()
+                return [dict(row) for row in rows]
+        except Exception as e:
+            print(f"Ошибка при загрузке пунктов выдачи: {e}")
+            return []
+    
+    def get_orders(self, status: str = None, client_name: str = None, pickup_point_id: int = None,
+                   before_id: int = None, limit: int = 50) -> List[Dict]:
+        """Получение страницы заказов, начиная с самых новых.
+        
+        Следующая страница запрашивается с before_id, равным order_id
+        последнего полученного заказа.
+        """
+        conditions, params = [], []
+        if status:
+            conditions.append("orders.status = ?")
+            params.append(status)
+        if client_name:
+            # Точное совпадение: записи idx_orders_client упорядочены по order_id
+            # внутри одного имени, поэтому страница читается без сортировки
+            conditions.append("orders.client_name = ?")
+            params.append(client_name)
+        if pickup_point_id is not None:
+            conditions.append("orders.pickup_point_id = ?")
+            params.append(pickup_point_id)
+        if before_id is not None:
+            conditions.append("orders.order_id < ?")
+            params.append(before_id)
+        
+        query = f"""
+            SELECT orders.order_id, orders.order_number, orders.order_date, orders.delivery_date,
+                   orders.status, orders.client_name, orders.pickup_code,
+                   pickup_points.address AS pickup_address,
+                   COALESCE(totals.items, 0) AS items,
+                   COALESCE(totals.quantity, 0) AS quantity,
+                   COALESCE(totals.amount, 0) AS amount
+            FROM orders
+            JOIN pickup_points ON pickup_points.point_id = orders.pickup_point_id
+            LEFT JOIN order_totals AS totals ON totals.order_id = orders.order_id
+            WHERE {' AND '.join(conditions) or '1'}
+            ORDER BY orders.order_id DESC
+            LIMIT ?
+        """
+        params.append(limit)
+        try:
+            with self.get_connection() as conn:
+                with instrumentation.query("db.get_orders", conn, query, params) as span:
+                    rows = conn.execute(query, params).fetchall()
+                    span.rows = len(rows)
+                return [dict(row) for row in rows]
+        except Exception as e:
+            print(f"Ошибка при загрузке списка заказов: {e}")
+            return []
+    
+    def get_order_items(self, order_id: int) -> List[Dict]:
+        """Получение позиций заказа"""
+        try:
+            with self.get_connection() as conn:
+                rows = conn.execute(
+                    """
+                    SELECT items.item_id, items.book_article, books.title, items.quantity, items.unit_price,
+                           items.quantity * items.unit_price AS amount
+                    FROM order_items AS items
+                    LEFT JOIN books ON books.article = items.book_article
+                    WHERE items.order_id = ?
+                    ORDER BY items.item_id
+                    """,
+                    (order_id,)
+                ).fetchall()
+                return [dict(row) for row in rows]
+        except Exception as e:
+            print(f"Ошибка при загрузке позиций заказа: {e}")
+            return []
+    
+    def get_sales_summary(self, top: int = 10) -> Dict:
+        """Сводка продаж из таблиц, поддерживаемых триггерами"""
+        try:
+            with self.get_connection() as conn, instrumentation.span("db.get_sales_summary"):
+                total = conn.execute(
+                    """
+                    SELECT COALESCE(SUM(orders), 0) AS orders,
+                           COALESCE(SUM(quantity), 0) AS quantity,
+                           COALESCE(SUM(amount), 0) AS amount
+                    FROM pickup_point_sales
+                    """
+                ).fetchone()
+                books = conn.execute(
+                    """
+                    SELECT sales.book_article, books.title, sales.quantity, sales.amount
+                    FROM book_sales AS sales
+                    LEFT JOIN books ON books.article = sales.book_article
+                    ORDER BY sales.amount DESC
+                    LIMIT ?
+                    """,
+                    (top,)
+                ).fetchall()
+                pickup_points = conn.execute(
+                    """
+                    SELECT sales.point_id, pickup_points.address, sales.orders, sales.quantity, sales.amount
+                    FROM pickup_point_sales AS sales
+                    JOIN pickup_points ON pickup_points.point_id = sales.point_id
+                    ORDER BY sales.amount DESC
+                    """
+                ).fetchall()
+                return {
+                    'total': dict(total),
+                    'books': [dict(row) for row in books],
+                    'pickup_points': [dict(row) for row in pickup_points]
+                }
+        except Exception as e:
+            print(f"Ошибка при загрузке сводки продаж: {e}")
+            return {'total': {'orders': 0, 'quantity': 0, 'amount': 0}, 'books': [], 'pickup_points': []}
+    
+    def reserve_books(self, items: Sequence[Tuple[str, int]], client_name: str, pickup_point_id: int,
+                      delivery_days: int = 3, retries: int = RESERVATION_RETRIES) -> Optional[Dict]:
+        """Резервирование книг и создание заказа в одной транзакции.
+        
+        items - пары (артикул, количество). Остаток списывается только если
+        его хватает на все позиции; иначе заказ не создается и возвращается None.
+        Если база занята другим процессом, попытка повторяется с нарастающей паузой.
+        """
+        quantities = {}
+        for article, quantity in items:
+            if quantity <= 0:
+                raise ValueError(f"Некорректное количество для книги {article}: {quantity}")
+            quantities[article] = quantities.get(article, 0) + quantity
+        if not quantities:
+            raise ValueError("Заказ не содержит позиций")
+        
+        for attempt in range(retries + 1):
+            try:
+                with self.get_connection() as conn, instrumentation.span("db.reserve_books", attempt=attempt):
+                    # Сортировка задает одинаковый порядок изменения строк во всех процессах
+                    return self._reserve(conn, sorted(quantities.items()), client_name,
+                                         pickup_point_id, delivery_days)
+            except sqlite3.OperationalError as e:
+                if not _is_busy_error(e) or attempt == retries:
+                    print(f"Ошибка при резервировании книг: {e}")
+                    return None
+                time.sleep(RESERVATION_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
+            except Exception as e:
+                print(f"Ошибка при резервировании книг: {e}")
+                return None
+    
+    def _reserve(self, conn, items, client_name: str, pickup_point_id: int,
+                 delivery_days: int) -> Optional[Dict]:
+        """Списание остатков и запись заказа в транзакции BEGIN IMMEDIATE"""
+        # Блокировка записи берется сразу, чтобы транзакция не завершилась
+        # ошибкой SQLITE_BUSY при переходе от чтения к записи
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        
+        lines = []
+        for article, quantity in items:
+            # Условное списание: строка меняется, только если экземпляров достаточно
+            row = conn.execute(
+                """
+                UPDATE books SET stock_quantity = stock_quantity - ?, updated_at = CURRENT_TIMESTAMP
+                WHERE article = ? AND stock_quantity >= ?
+                RETURNING CASE WHEN on_sale AND sale_price IS NOT NULL THEN sale_price ELSE price END
+                """,
+                (quantity, article, quantity)
+            ).fetchall()
+            if not row:
+                conn.rollback()
+                return None
+            lines.append((article, quantity, row[0][0]))
+        
+        order_number = conn.execute("SELECT COALESCE(MAX(order_number), 0) + 1 FROM orders").fetchone()[0]
+        pickup_code = "".join(random.choices(string.ascii_uppercase + string.digits, k=6))
+        order_date = datetime.now()
+        cursor = conn.execute(
+            """
+            INSERT INTO orders (order_number, order_date, delivery_date, pickup_point_id,
+                                client_name, pickup_code, status)
+            VALUES (?, ?, ?, ?, ?, ?, 'Новый')
+            """,
+            (
+                order_number,
+                order_date.strftime("%Y-%m-%d %H:%M:%S"),
+                (order_date + timedelta(days=delivery_days)).strftime("%Y-%m-%d %H:%M:%S"),
+                pickup_point_id,
+                client_name,
+                pickup_code
+            )
+        )
+        order_id = cursor.lastrowid
+        conn.executemany(
+            "INSERT INTO order_items (order_id, book_article, quantity, unit_price) VALUES (?, ?, ?, ?)",
+            [(order_id, article, quantity, price) for article, quantity, price in lines]
+        )
+        return {
+            'order_id': order_id,
+            'order_number': order_number,
+            'pickup_code': pickup_code,
+            'amount': sum(quantity * price for _, quantity, price in lines)
+        }
@@ -0,0 +1,424 @@
+import heapq
+import json
+import re
+import sqlite3
+import threading
+import unicodedata
+from array import array
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import Dict, List, Set, Tuple
+from catalog_facets import positions_bitmap
+from instrumentation import instrumentation
+
+# Версия нормализации текста; при ее изменении сохраненный индекс перестраивается
+FOLD_VERSION = 1
+
+# Поля книги, по которым выполняется нечеткий поиск
+FUZZY_COLUMNS = ("title", "author")
+
+# Транслитерация кириллицы; ё и е, а также й и ы, совпадают после нормализации
+TRANSLIT = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e",
+    "ж": "zh", "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m",
+    "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u",
+    "ф": "f", "х": "h", "ц": "c", "ч": "ch", "ш": "sh", "щ": "sh", "ъ": "",
+    "ы": "y", "ь": "", "э": "e", "ю": "yu", "я": "ya",
+}
+
+# Замены, сводящие разные варианты латинской записи к одному виду:
+# "tolstoy", "tolstoj" и "толстой" дают одну и ту же строку
+LATIN_FOLDS = (
+    ("shch", "sh"), ("sch", "sh"), ("kh", "h"), ("tz", "c"), ("ts", "c"),
+    ("w", "v"), ("x", "ks"), ("j", "y"), ("iy", "y"), ("yy", "y"),
+    ("ye", "e"), ("yo", "e"),
+)
+
+_TRANSLIT_TABLE = str.maketrans(TRANSLIT)
+_NON_WORD = re.compile(r"[\W_]+")
+
+# Наименьшее сходство слова запроса со словом каталога и наибольшее число
+# слов каталога, которые считаются вариантами одного слова запроса
+MIN_SIMILARITY = 0.5
+MAX_WORD_MATCHES = 32
+# Наибольшее число исправлений, учитываемое расстоянием редактирования; каждое
+# исправление меняет не более трех триграмм слова, поэтому слова, у которых
+# с запросом меньше общих триграмм, сравниваются только по триграммам
+MAX_EDITS = 2
+# Доля измененных строк, после которой индекс перестраивается целиком
+REBUILD_FRACTION = 0.05
+
+TRIGRAM_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS books_fuzzy_words (
+        word_id INTEGER PRIMARY KEY,
+        word TEXT NOT NULL,
+        rowids BLOB NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS books_trigrams (
+        trigram TEXT PRIMARY KEY,
+        word_ids BLOB NOT NULL
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS books_trigram_state (
+        key TEXT PRIMARY KEY,
+        value
+    )
+    """,
+)
+
+
+def fold_text(text: str) -> str:
+    """Приведение текста к латинскому написанию без регистра и диакритики"""
+    result = text.casefold().translate(_TRANSLIT_TABLE)
+    if not result.isascii():
+        decomposed = unicodedata.normalize("NFD", result)
+        result = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    result = _NON_WORD.sub(" ", result)
+    for source, target in LATIN_FOLDS:
+        result = result.replace(source, target)
+    return result
+
+
+def fold_words(text: str) -> List[str]:
+    """Слова нормализованного текста"""
+    return fold_text(text).split()
+
+
+@lru_cache(maxsize=65536)
+def _value_words(value: str) -> frozenset:
+    """Слова значения поля; авторы и серии повторяются, поэтому результат кэшируется"""
+    return frozenset(fold_words(value))
+
+
+def book_words(*values) -> Set[str]:
+    """Нормализованные слова полей книги"""
+    words = set()
+    for value in values:
+        if value:
+            words |= _value_words(str(value))
+    return words
+
+
+def word_trigrams(word: str) -> Set[str]:
+    """Триграммы слова с дополнением пробелами, как в pg_trgm"""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_similarity(first: str, second: str, max_edits: int = None) -> float:
+    """Сходство слов по расстоянию Дамерау-Левенштейна (с перестановкой соседних букв).
+    
+    Если расстояние заведомо больше max_edits, вычисление прекращается и
+    возвращается 0.
+    """
+    earlier, previous = None, list(range(len(second) + 1))
+    for i in range(1, len(first) + 1):
+        current = [i] + [0] * len(second)
+        for j in range(1, len(second) + 1):
+            cost = first[i - 1] != second[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and first[i - 1] == second[j - 2] and first[i - 2] == second[j - 1]:
+                current[j] = min(current[j], earlier[j - 2] + 1)
+        if max_edits is not None and min(current) > max_edits:
+            return 0.0
+        earlier, previous = previous, current
+    return 1 - previous[-1] / max(len(first), len(second), 1)
+
+
+class TrigramIndex:
+    """Триграммный индекс названий и авторов для поиска с опечатками и транслитом.
+    
+    Слова каталога после нормализации образуют словарь: для каждого слова
+    хранится список rowid книг, а для каждой триграммы - список слов словаря.
+    Поиск подбирает слова словаря, похожие на слова запроса (по доле общих
+    триграмм, а для близких по длине слов - по расстоянию редактирования),
+    и ранжирует книги по среднему сходству слов запроса.
+    
+    Индекс сохраняется в таблицах books_fuzzy_words и books_trigrams, поэтому
+    при следующем запуске загружается, а не строится заново. Изменения книг
+    подхватываются по PRAGMA data_version и журналу books_changelog: измененные
+    и удаленные строки исключаются из основных списков, измененные
+    индексируются отдельно, а при большом числе изменений индекс
+    перестраивается.
+    """
+    
+    def __init__(self, db, min_similarity: float = MIN_SIMILARITY):
+        self.db = db
+        self.min_similarity = min_similarity
+        self.lock = threading.Lock()
+        
+        self.words = None
+        self.word_ids = {}
+        self.word_sizes = []
+        self.postings = []
+        self.trigrams = {}
+        self.rows = 0
+        self.change_id = None
+        # Битовая карта rowid книг, попавших в индекс
+        self.indexed = 0
+        self.version = None
+        self.dirty = set()
+        self.delta = defaultdict(set)
+        self.watch_conn = None
+    
+    def _data_version(self) -> int:
+        """Номер версии базы данных, меняющийся при фиксации изменений другими подключениями"""
+        if self.watch_conn is None:
+            self.watch_conn = sqlite3.connect(self.db.db_path, check_same_thread=False)
+        return self.watch_conn.execute("PRAGMA data_version").fetchone()[0]
+    
+    def ensure_fresh(self):
+        """Загрузка или построение индекса и учет изменений каталога"""
+        version = self._data_version()
+        if self.words is None:
+            if not self._load():
+                self._rebuild()
+            self._refresh()
+        elif version != self.version:
+            self._refresh()
+        self.version = version
+    
+    def _reset(self, rows: int, change_id: int, indexed: int):
+        """Очистка индекса перед заполнением"""
+        self.words = []
+        self.word_ids = {}
+        self.word_sizes = []
+        self.postings = []
+        self.trigrams = {}
+        self.rows = rows
+        self.change_id = change_id
+        self.indexed = indexed
+        self.dirty.clear()
+        self.delta.clear()
+    
+    def _add_word(self, word: str, rowids=(), index_trigrams: bool = True) -> int:
+        """Добавление слова в словарь"""
+        word_id = len(self.words)
+        trigrams = word_trigrams(word)
+        self.words.append(word)
+        self.word_ids[word] = word_id
+        self.word_sizes.append(len(trigrams))
+        self.postings.append(rowids if isinstance(rowids, array) else array("I", rowids))
+        if index_trigrams:
+            for trigram in trigrams:
+                self.trigrams.setdefault(trigram, array("I")).append(word_id)
+        return word_id
+    
+    def _load(self) -> bool:
+        """Загрузка сохраненного индекса; False, если его нет или он построен другой версией"""
+        try:
+            with self.db.get_connection() as conn, instrumentation.span("fuzzy.load") as span:
+                state = dict(conn.execute("SELECT key, value FROM books_trigram_state").fetchall())
+                # Индекс, сохраненный до перехода на журнал изменений, строится заново
+                if state.get("fold_version") != FOLD_VERSION or state.get("change_id") is None:
+                    return False
+                self._reset(state.get("rows", 0), state["change_id"],
+                            int.from_bytes(state.get("indexed") or b"", "little"))
+                for word, rowids in conn.execute("SELECT word, rowids FROM books_fuzzy_words ORDER BY word_id"):
+                    posting = array("I")
+                    posting.frombytes(rowids)
+                    self._add_word(word, posting, index_trigrams=False)
+                for trigram, word_ids in conn.execute("SELECT trigram, word_ids FROM books_trigrams"):
+                    posting = array("I")
+                    posting.frombytes(word_ids)
+                    self.trigrams[trigram] = posting
+                span.rows = len(self.words)
+        except sqlite3.OperationalError:
+            # Индекс еще не сохранялся в этой базе
+            self.words = None
+            return False
+        return True
+    
+    def _rebuild(self):
+        """Построение индекса по всей таблице books и его сохранение в базе"""
+        # Номер журнала читается до строк: изменение, зафиксированное во время
+        # построения, будет учтено повторно, что не меняет индекса
+        change_id = self.db.get_last_change_id()
+        with self.db.get_connection() as conn, instrumentation.span("fuzzy.rebuild") as span:
+            lists = defaultdict(list)
+            rowids = []
+            query = f"SELECT rowid, {', '.join(FUZZY_COLUMNS)} FROM books ORDER BY rowid"
+            for rowid, *values in conn.execute(query):
+                for word in book_words(*values):
+                    lists[word].append(rowid)
+                rowids.append(rowid)
+            span.rows = len(rowids)
+        
+        self._reset(len(rowids), change_id, positions_bitmap(rowids, rowids[-1] + 1 if rowids else 0))
+        for word, rowids in lists.items():
+            self._add_word(word, rowids)
+        self._save()
+    
+    def _save(self):
+        """Сохранение индекса; при ошибке записи индекс остается только в памяти"""
+        # База, открытая только на чтение, не изменяется: индекс строится
+        # при первом нечетком поиске и живет в памяти процесса
+        if self.db.pool.read_only:
+            return
+        try:
+            with self.db.get_connection() as conn:
+                for statement in TRIGRAM_SCHEMA:
+                    conn.execute(statement)
+                conn.execute("DELETE FROM books_fuzzy_words")
+                conn.executemany(
+                    "INSERT INTO books_fuzzy_words (word_id, word, rowids) VALUES (?, ?, ?)",
+                    ((word_id, word, self.postings[word_id].tobytes()) for word_id, word in enumerate(self.words))
+                )
+                conn.execute("DELETE FROM books_trigrams")
+                conn.executemany(
+                    "INSERT INTO books_trigrams (trigram, word_ids) VALUES (?, ?)",
+                    ((trigram, word_ids.tobytes()) for trigram, word_ids in self.trigrams.items())
+                )
+                conn.execute("DELETE FROM books_trigram_state")
+                conn.executemany(
+                    "INSERT INTO books_trigram_state (key, value) VALUES (?, ?)",
+                    (
+                        ("fold_version", FOLD_VERSION), ("rows", self.rows), ("change_id", self.change_id),
+                        ("indexed", self.indexed.to_bytes((self.indexed.bit_length() + 7) // 8, "little")),
+                    )
+                )
+        except sqlite3.Error as e:
+            print(f" Не удалось сохранить триграммный индекс: {e}")
+    
+    def _refresh(self):
+        """Учет изменений книг, записанных в журнал после построения индекса.
+        
+        Измененные книги перечитываются по артикулам из журнала, поэтому
+        правки с одинаковой отметкой updated_at не теряются. Журнал и книги
+        читаются в одной транзакции: после учета изменений каждая книга
+        таблицы есть в индексе, и rowid удаленных книг находятся сравнением
+        числа строк в диапазонах rowid. Удаленные книги исключаются из
+        результатов и не занимают места среди кандидатов.
+        """
+        if self.db.get_last_change_id() == self.change_id:
+            return
+        limit = int(max(1000, self.rows * REBUILD_FRACTION))
+        with self.db.get_connection() as conn:
+            conn.execute("BEGIN")
+            changes = conn.execute(
+                "SELECT change_id, article, operation FROM books_changelog "
+                "WHERE change_id > ? ORDER BY change_id LIMIT ?",
+                (self.change_id, limit + 1)
+            ).fetchall()
+            # Номера AUTOINCREMENT идут подряд, пропуск означает удаленные записи
+            rebuild = not changes or len(changes) > limit or changes[0][0] != self.change_id + 1
+            if not rebuild:
+                articles = list(dict.fromkeys(row[1] for row in changes))
+                # Список артикулов передается одним параметром в виде JSON, без
+                # ограничения на число параметров запроса
+                changed = conn.execute(
+                    f"SELECT rowid, article, {', '.join(FUZZY_COLUMNS)} FROM books "
+                    "WHERE article IN (SELECT value FROM json_each(?))",
+                    (json.dumps(articles, ensure_ascii=False),)
+                ).fetchall()
+                rebuild = len(self.dirty | {row[0] for row in changed}) > limit
+            if not rebuild:
+                for rowid, _, *values in changed:
+                    self.dirty.add(rowid)
+                    if not self.indexed >> rowid & 1:
+                        self.indexed |= 1 << rowid
+                        self.rows += 1
+                    for word in book_words(*values):
+                        word_id = self.word_ids.get(word)
+                        if word_id is None:
+                            word_id = self._add_word(word)
+                        self.delta[word_id].add(rowid)
+                
+                found = {row[1] for row in changed}
+                if any(article not in found for article in articles):
+                    high = self.indexed.bit_length()
+                    present = conn.execute("SELECT COUNT(*) FROM books WHERE rowid < ?", (high,)).fetchone()[0]
+                    self._purge(self._deleted_rowids(conn, 0, high, self.indexed.bit_count() - present))
+                self.change_id = changes[-1][0]
+        if rebuild:
+            self._rebuild()
+    
+    def _deleted_rowids(self, conn, low: int, high: int, missing: int) -> List[int]:
+        """rowid из диапазона [low, high), которые есть в индексе, но не в таблице.
+        
+        Диапазон делится пополам, пока число книг индекса в половине больше
+        числа строк таблицы в ней; COUNT по диапазону rowid выполняется
+        по B-дереву таблицы без чтения строк в Python.
+        """
+        if missing <= 0:
+            return []
+        if high - low == 1:
+            return [low]
+        middle = (low + high) // 2
+        indexed = (self.indexed >> low & ((1 << (middle - low)) - 1)).bit_count()
+        present = conn.execute(
+            "SELECT COUNT(*) FROM books WHERE rowid >= ? AND rowid < ?", (low, middle)
+        ).fetchone()[0]
+        return (self._deleted_rowids(conn, low, middle, indexed - present)
+                + self._deleted_rowids(conn, middle, high, missing - (indexed - present)))
+    
+    def _purge(self, rowids: List[int]):
+        """Исключение удаленных книг из индекса до его перестроения"""
+        for rowid in rowids:
+            self.indexed &= ~(1 << rowid)
+            self.dirty.add(rowid)
+        for word_rowids in self.delta.values():
+            word_rowids.difference_update(rowids)
+        self.rows -= len(rowids)
+    
+    def _similar_words(self, word: str) -> List[Tuple[float, int]]:
+        """Слова словаря, похожие на слово запроса: пары (сходство, номер слова)"""
+        trigrams = word_trigrams(word)
+        shared = Counter()
+        for trigram in trigrams:
+            shared.update(self.trigrams.get(trigram, ()))
+        
+        matches = []
+        min_shared = len(trigrams) - 3 * MAX_EDITS
+        for word_id, count in shared.items():
+            score = count / max(len(trigrams), self.word_sizes[word_id])
+            if score < 1 and count >= min_shared:
+                candidate = self.words[word_id]
+                if abs(len(candidate) - len(word)) <= MAX_EDITS:
+                    score = max(score, edit_similarity(word, candidate, MAX_EDITS))
+            if score >= self.min_similarity:
+                matches.append((score, word_id))
+        return heapq.nlargest(MAX_WORD_MATCHES, matches)
+    
+    def _book_scores(self, word_matches) -> Dict[int, float]:
+        """Лучшее сходство слова запроса со словами каждой книги"""
+        best = {}
+        for score, word_id in word_matches:
+            rowids = self.postings[word_id]
+            if self.dirty:
+                rowids = [rowid for rowid in rowids if rowid not in self.dirty]
+            for rowids in (rowids, self.delta.get(word_id, ())):
+                for rowid in rowids:
+                    if best.get(rowid, 0) < score:
+                        best[rowid] = score
+        return best
+    
+    def search(self, search_query: str, limit: int = 50) -> List[Tuple[int, float]]:
+        """Пары (rowid, сходство) книг, похожих на запрос, по убыванию сходства"""
+        words = fold_words(search_query or "")
+        # Однобуквенные слова (предлоги и инициалы) не влияют на результат
+        words = [word for word in words if len(word) > 1] or words
+        if not words:
+            return []
+        
+        with instrumentation.span("fuzzy.search") as span, self.lock:
+            self.ensure_fresh()
+            totals = Counter()
+            for word in words:
+                totals.update(self._book_scores(self._similar_words(word)))
+            
+            ranked = heapq.nlargest(limit, totals.items(), key=lambda item: (item[1], -item[0]))
+            ranked = [(rowid, round(total / len(words), 4)) for rowid, total in ranked
+                      if total / len(words) >= self.min_similarity]
+            span.rows = len(ranked)
+            return ranked
+    
+    def close(self):
+        """Закрытие подключения для отслеживания изменений"""
+        if self.watch_conn is not None:
+            self.watch_conn.close()
+            self.watch_conn = None
@@ -0,0 +1,301 @@
+import builtins
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+
+class _NullSpan:
+    """Пустой замер, используемый при выключенной инструментации"""
+    
+    rows = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+    
+    def __setattr__(self, name, value):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """Замер длительности одной операции"""
+    
+    __slots__ = ("owner", "name", "labels", "rows", "conn", "sql", "params", "started")
+    
+    def __init__(self, owner, name, labels, conn=None, sql=None, params=None):
+        self.owner = owner
+        self.name = name
+        self.labels = labels
+        self.rows = None
+        self.conn = conn
+        self.sql = sql
+        self.params = params
+    
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, traceback):
+        elapsed_ms = (time.perf_counter() - self.started) * 1000
+        self.owner._finish(self, elapsed_ms, exc is not None)
+        return False
+
+
+class RingBufferSink:
+    """Хранение последних событий в памяти"""
+    
+    def __init__(self, size: int = 1000):
+        self.events = deque(maxlen=size)
+    
+    def emit(self, event):
+        self.events.append(event)
+    
+    def flush(self, instrumentation):
+        pass
+
+
+class LogFileSink:
+    """Запись событий в файл построчно в формате JSON"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, "a", encoding="utf-8")
+    
+    def emit(self, event):
+        line = json.dumps(event, ensure_ascii=False)
+        with self.lock:
+            self.file.write(line + "\n")
+    
+    def flush(self, instrumentation):
+        with self.lock:
+            self.file.flush()
+
+
+class PrometheusTextSink:
+    """Периодическая выгрузка счетчиков в текстовом формате Prometheus"""
+    
+    def __init__(self, path: str, interval: float = 10.0):
+        self.path = path
+        self.interval = interval
+        self.last_dump = 0.0
+        self.instrumentation = None
+    
+    def emit(self, event):
+        now = time.monotonic()
+        if self.instrumentation is not None and now - self.last_dump >= self.interval:
+            self.last_dump = now
+            self.flush(self.instrumentation)
+    
+    def flush(self, instrumentation):
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as output:
+            output.write(instrumentation.render_prometheus())
+        os.replace(temporary_path, self.path)
+
+
+class Instrumentation:
+    """Сбор времени выполнения операций и счетчиков.
+    
+    При выключенной инструментации span() и query() возвращают общий пустой
+    объект, поэтому замеры в горячих участках кода почти ничего не стоят.
+    """
+    
+    def __init__(self):
+        self.enabled = False
+        self.sinks = []
+        self.slow_query_ms = 50.0
+        self.explain_slow_queries = False
+        self.counters = {}
+        self.lock = threading.Lock()
+    
+    def configure(self, enabled: bool = True, sinks=(), slow_query_ms: float = 50.0,
+                  explain_slow_queries: bool = False):
+        """Включение или выключение инструментации и выбор приемников событий"""
+        self.sinks = list(sinks)
+        for sink in self.sinks:
+            if isinstance(sink, PrometheusTextSink):
+                sink.instrumentation = self
+        self.slow_query_ms = slow_query_ms
+        self.explain_slow_queries = explain_slow_queries
+        self.enabled = enabled
+    
+    def configure_from_env(self, variable: str = "BOOKWORLD_METRICS"):
+        """Настройка по переменной окружения, например "ring,log:metrics.log,prom:metrics.prom,explain" """
+        value = os.environ.get(variable)
+        if not value:
+            return
+        sinks = []
+        explain = False
+        for item in value.split(","):
+            kind, _, argument = item.strip().partition(":")
+            if kind == "ring":
+                sinks.append(RingBufferSink(int(argument or 1000)))
+            elif kind == "log":
+                sinks.append(LogFileSink(argument or "metrics.log"))
+            elif kind == "prom":
+                sinks.append(PrometheusTextSink(argument or "metrics.prom"))
+            elif kind == "explain":
+                explain = True
+        self.configure(True, sinks, explain_slow_queries=explain)
+    
+    def span(self, name: str, **labels):
+        """Замер длительности участка кода"""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, labels)
+    
+    def query(self, name: str, conn, sql: str, params=()):
+        """Замер SQL-запроса; для медленных запросов может сохраняться план выполнения"""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, {}, conn, sql, params)
+    
+    def _finish(self, span: Span, elapsed_ms: float, failed: bool):
+        """Обновление счетчиков и отправка события приемникам"""
+        with self.lock:
+            counter = self.counters.get(span.name)
+            if counter is None:
+                counter = self.counters[span.name] = {
+                    "count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0
+                }
+            counter["count"] += 1
+            counter["errors"] += failed
+            counter["total_ms"] += elapsed_ms
+            counter["max_ms"] = max(counter["max_ms"], elapsed_ms)
+            counter["rows"] += span.rows or 0
+        
+        if not self.sinks:
+            return
+        event = {"name": span.name, "ms": round(elapsed_ms, 3), "ts": time.time()}
+        if span.labels:
+            event.update(span.labels)
+        if span.rows is not None:
+            event["rows"] = span.rows
+        if failed:
+            event["error"] = True
+        if span.sql is not None and elapsed_ms >= self.slow_query_ms:
+            event["slow"] = True
+            if self.explain_slow_queries:
+                event["plan"] = self._explain(span.conn, span.sql, span.params)
+        for sink in self.sinks:
+            sink.emit(event)
+    
+    def _explain(self, conn, sql: str, params):
+        """План выполнения запроса (EXPLAIN QUERY PLAN)"""
+        try:
+            return [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+        except Exception as e:
+            return [f"не удалось получить план: {e}"]
+    
+    def snapshot(self):
+        """Копия текущих значений счетчиков"""
+        with self.lock:
+            return {name: dict(counter) for name, counter in self.counters.items()}
+    
+    def render_prometheus(self) -> str:
+        """Счетчики в текстовом формате Prometheus"""
+        lines = []
+        metrics = (
+            ("bookworld_operation_count", "count", "counter"),
+            ("bookworld_operation_errors", "errors", "counter"),
+            ("bookworld_operation_ms_total", "total_ms", "counter"),
+            ("bookworld_operation_ms_max", "max_ms", "gauge"),
+            ("bookworld_operation_rows_total", "rows", "counter"),
+        )
+        snapshot = self.snapshot()
+        for metric, field, kind in metrics:
+            lines.append(f"# TYPE {metric} {kind}")
+            for name, counter in sorted(snapshot.items()):
+                lines.append(f'{metric}{{operation="{name}"}} {counter[field]:g}')
+        return "\n".join(lines) + "\n"
+    
+    def flush(self):
+        """Сброс накопленных данных во все приемники"""
+        for sink in self.sinks:
+            sink.flush(self)
+
+
+class StartupProfiler:
+    """Замер холодного запуска: время импорта модулей и этапов запуска.
+    
+    Пока профилировщик включен, builtins.__import__ заменяется оберткой,
+    которая учитывает для каждого впервые загружаемого модуля полное время
+    импорта и время без вложенных импортов. Этапы отмечаются вызовом mark().
+    """
+    
+    def __init__(self):
+        self.enabled = False
+        self.started = None
+        self.phases = []
+        self.imports = {}
+        self.reported = False
+        self._original_import = None
+        self._local = threading.local()
+    
+    def start(self):
+        """Включение замеров; вызывается до импорта модулей приложения"""
+        self.enabled = True
+        self.started = time.perf_counter()
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._timed_import
+    
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        """Импорт с учетом времени загрузки нового модуля"""
+        if level or name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+        
+        # Стек времени вложенных импортов ведется отдельно для каждого потока
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - started
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            self.imports.setdefault(name, (elapsed, elapsed - nested, len(stack)))
+    
+    def mark(self, phase: str):
+        """Отметка завершения этапа запуска"""
+        if self.enabled:
+            self.phases.append((phase, time.perf_counter()))
+    
+    def report(self, top: int = 15, stream=None):
+        """Вывод времени этапов и самых долгих импортов; выполняется один раз"""
+        if not self.enabled or self.reported:
+            return
+        self.reported = True
+        builtins.__import__ = self._original_import
+        stream = stream or sys.stderr
+        
+        print(f"\n{'Этапы запуска, мс':<32}{'от начала':>10}{'этап':>10}", file=stream)
+        previous = self.started
+        for phase, moment in self.phases:
+            print(f"{phase:<32}{(moment - self.started) * 1000:>10.1f}{(moment - previous) * 1000:>10.1f}", file=stream)
+            previous = moment
+        
+        print(f"\n{'Импорт модулей, мс':<32}{'всего':>10}{'без вложенных':>15}", file=stream)
+        slowest = sorted(self.imports.items(), key=lambda item: item[1][0], reverse=True)[:top]
+        for name, (total, own, depth) in slowest:
+            print(f"{'  ' * depth + name:<32}{total * 1000:>10.1f}{own * 1000:>15.1f}", file=stream)
+        top_level = sum(total for total, _, depth in self.imports.values() if depth == 0)
+        print(f"всего на импорт: {top_level * 1000:.1f} мс", file=stream)
+
+
+# Общий экземпляр, используемый слоями базы данных и интерфейса
+instrumentation = Instrumentation()
+# Профилировщик запуска, включаемый ключом main.py --profile-startup
+startup_profiler = StartupProfiler()
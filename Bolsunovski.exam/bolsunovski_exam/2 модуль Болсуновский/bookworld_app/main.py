@@ -1,20 +1,66 @@
+import sys
+from instrumentation import instrumentation, startup_profiler
+
+# Замер импорта включается до загрузки остальных модулей приложения
+if __name__ == "__main__" and "--profile-startup" in sys.argv:
+    startup_profiler.start()
+
+import argparse
 import tkinter as tk
 from auth_module import AuthWindow
-from catalog_module import MainWindow
+from database import DatabaseManager
+from maintenance import IdleMaintenance
 
 class LiteratureClubApp:
-    def __init__(self):
+    def __init__(self, db_path: str = None):
         self.current_user = None
         
+        # Единственное корневое окно, в котором сменяются экраны приложения
+        self.root = tk.Tk()
+        startup_profiler.mark("корневое окно Tk")
+        self.db = DatabaseManager(db_path) if db_path else DatabaseManager()
+        startup_profiler.mark("база данных")
+        # Контрольная точка WAL, очистка и статистика выполняются, пока пользователь бездействует
+        self.maintenance = IdleMaintenance(self.root, self.db.db_path)
+        
+        # Экран каталога, PIL и служба обложек загружаются при первом входе,
+        # а индекс обложек заполняется по мере загрузки страниц каталога
+        self.cover_service = None
+        self.cover_index = {}
+        self.snapshot = None
+        
+        self.auth_window = AuthWindow(self.root, self.db, self.on_auth_success)
+        startup_profiler.mark("экран входа")
+        self.main_window = None
+    
     def on_auth_success(self, user_data):
         """Обработчик успешного завершения авторизации"""
         self.current_user = user_data
+        startup_profiler.mark("вход в систему")
         self.show_main_window()
     
     def show_main_window(self):
         """Отображение основного окна приложения"""
-        main_window = MainWindow(self.current_user, self.logout)
-        main_window.run()
+        from catalog_module import MainWindow
+        from catalog_snapshot import load_snapshot
+        from cover_service import CoverService
+        
+        self.auth_window.hide()
+        if self.cover_service is None:
+            # Снимок каталога и обложек открывается без копирования данных;
+            # устаревший снимок пересобирается в фоне к следующему запуску
+            self.snapshot = load_snapshot(self.db)
+            startup_profiler.mark("снимок каталога")
+            self.cover_service = CoverService(self.root, snapshot=self.snapshot)
+        self.main_window = MainWindow(
+            self.root,
+            self.current_user,
+            self.logout,
+            self.db,
+            self.cover_service,
+            self.cover_index,
+            self.snapshot
+        )
     
     def logout(self):
         """Завершение текущего сеанса пользователя"""
@@ -23,13 +69,35 @@ class LiteratureClubApp:
     
     def show_auth_window(self):
         """Отображение окна аутентификации"""
-        auth_window = AuthWindow(self.on_auth_success)
-        auth_window.run()
+        if self.main_window is not None:
+            self.main_window.destroy()
+            self.main_window = None
+        self.auth_window.show()
     
     def run(self):
         """Запуск основного цикла приложения"""
         self.show_auth_window()
+        self.root.update()
+        startup_profiler.mark("первый кадр")
+        self.root.mainloop()
+        
+        self.maintenance.stop()
+        if self.main_window is not None:
+            self.main_window.search_worker.stop()
+        if self.cover_service is not None:
+            self.cover_service.close()
+        if self.snapshot is not None:
+            self.snapshot.close()
+        self.db.close()
+        instrumentation.flush()
+        startup_profiler.report()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Литературный Клуб")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="вывести при выходе время импорта модулей и этапов запуска")
+    parser.parse_args()
+    
+    instrumentation.configure_from_env()
     app = LiteratureClubApp()
-    app.run()
\ No newline at end of file
+    app.run()
@@ -0,0 +1,564 @@
+import argparse
+import json
+import re
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from catalog_facets import CatalogFilters, sort_key
+from database import ANALYSIS_LIMIT, DatabaseManager, read_only_uri
+from instrumentation import instrumentation
+from models import CARD_COLUMNS
+
+# Периодичность сбора статистики планировщика командой ANALYZE; число
+# просматриваемых строк ограничено ANALYSIS_LIMIT: статистика получается
+# приблизительной, зато сбор на большом каталоге занимает миллисекунды
+ANALYZE_INTERVAL = timedelta(days=7)
+# Число страниц, возвращаемых файловой системе за один проход в простое
+IDLE_VACUUM_PAGES = 512
+# Время без действий пользователя, после которого выполняется обслуживание
+IDLE_SECONDS = 60
+IDLE_CHECK_MS = 5000
+# Доля свободных страниц, при которой отчет рекомендует полную очистку
+VACUUM_FREE_RATIO = 0.1
+
+MAINTENANCE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS maintenance_state (
+    task TEXT PRIMARY KEY,
+    finished_at TEXT NOT NULL
+)
+"""
+
+# Число выполнений каждого запроса при замере; в отчет попадает лучшее время
+PLAN_REPEATS = 3
+
+# Режимы PRAGMA auto_vacuum
+AUTO_VACUUM_MODES = {0: "none", 1: "full", 2: "incremental"}
+
+
+def connect(db_path: str, read_only: bool = False) -> sqlite3.Connection:
+    """Подключение для обслуживания в режиме автофиксации: VACUUM и
+    контрольная точка WAL не выполняются внутри транзакции.
+    
+    Подключение только на чтение используется для отчета: база
+    не создается и не изменяется.
+    """
+    if read_only:
+        return sqlite3.connect(read_only_uri(db_path), timeout=5.0, isolation_level=None, uri=True)
+    return sqlite3.connect(db_path, timeout=5.0, isolation_level=None)
+
+
+def quick_check(conn) -> List[str]:
+    """Быстрая проверка целостности; ["ok"], если ошибок нет"""
+    with instrumentation.span("maintenance.quick_check"):
+        return [row[0] for row in conn.execute("PRAGMA quick_check")]
+
+
+def _index_keys(conn, name: str) -> Optional[Tuple]:
+    """Ключевые столбцы индекса: (номер столбца, порядок, правило сравнения).
+    
+    Для индексов по выражениям возвращается None: их столбцы нельзя
+    сравнить с другими индексами.
+    """
+    keys = tuple((cid, desc, collation)
+                 for _, cid, _, desc, collation, key in conn.execute(f'PRAGMA index_xinfo("{name}")') if key)
+    if any(cid < 0 for cid, _, _ in keys):
+        return None
+    return keys
+
+
+def find_redundant_indexes(conn) -> List[Tuple[str, str, str]]:
+    """Индексы, которые дублируют другой индекс таблицы или являются его началом.
+    
+    Возвращает тройки (индекс, таблица, индекс, который его заменяет).
+    Удаляются только неуникальные индексы без условия WHERE; индексы
+    первичного ключа и ограничений UNIQUE остаются.
+    """
+    redundant = []
+    tables = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+    )]
+    for table in tables:
+        indexes = []
+        for _, name, unique, origin, partial in conn.execute(f'PRAGMA index_list("{table}")'):
+            if not partial:
+                indexes.append((name, bool(unique), origin, _index_keys(conn, name)))
+        for name, unique, origin, keys in indexes:
+            if unique or origin != "c" or keys is None:
+                continue
+            for other, other_unique, _, other_keys in indexes:
+                if other == name or other_keys is None or other_keys[:len(keys)] != keys:
+                    continue
+                # Из двух одинаковых неуникальных индексов остается первый по имени
+                if len(other_keys) > len(keys) or other_unique or other < name:
+                    redundant.append((name, table, other))
+                    break
+    return redundant
+
+
+def drop_redundant_indexes(conn) -> List[Tuple[str, str, str]]:
+    """Удаление избыточных индексов"""
+    redundant = find_redundant_indexes(conn)
+    with instrumentation.span("maintenance.drop_indexes") as span:
+        for name, _, _ in redundant:
+            conn.execute(f'DROP INDEX IF EXISTS "{name}"')
+        span.rows = len(redundant)
+    return redundant
+
+
+def storage_stats(conn) -> Dict:
+    """Размер файла, свободные страницы и фрагментация таблиц и индексов.
+    
+    Фрагментация - доля страниц объекта, которые не следуют в файле сразу
+    за предыдущей страницей при обходе дерева; считается по виртуальной
+    таблице dbstat, если SQLite собран с ее поддержкой.
+    """
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    stats = {
+        "page_size": page_size,
+        "pages": page_count,
+        "size_mb": round(page_size * page_count / 1_048_576, 2),
+        "free_pages": freelist,
+        "free_ratio": round(freelist / page_count, 4) if page_count else 0.0,
+        "auto_vacuum": AUTO_VACUUM_MODES.get(conn.execute("PRAGMA auto_vacuum").fetchone()[0], "unknown"),
+        "objects": None,
+    }
+    
+    try:
+        rows = conn.execute("SELECT name, pageno, unused, pgsize FROM dbstat ORDER BY name, path").fetchall()
+    except sqlite3.Error:
+        return stats
+    objects = {}
+    previous = None
+    for name, pageno, unused, pgsize in rows:
+        entry = objects.setdefault(name, {"pages": 0, "unused": 0, "size": 0, "jumps": 0})
+        entry["pages"] += 1
+        entry["unused"] += unused
+        entry["size"] += pgsize
+        if previous is not None and previous[0] == name and pageno != previous[1] + 1:
+            entry["jumps"] += 1
+        previous = (name, pageno)
+    stats["objects"] = {
+        name: {
+            "pages": entry["pages"],
+            "unused_ratio": round(entry["unused"] / entry["size"], 4) if entry["size"] else 0.0,
+            "fragmentation": round(entry["jumps"] / max(entry["pages"] - 1, 1), 4),
+        }
+        for name, entry in objects.items()
+    }
+    return stats
+
+
+def _task_due(conn, task: str, interval: timedelta) -> bool:
+    """Задача не выполнялась дольше interval"""
+    conn.execute(MAINTENANCE_SCHEMA)
+    row = conn.execute("SELECT finished_at FROM maintenance_state WHERE task = ?", (task,)).fetchone()
+    return row is None or datetime.fromisoformat(row[0]) + interval <= datetime.now()
+
+
+def _mark_done(conn, task: str):
+    """Запись времени выполнения задачи"""
+    conn.execute(MAINTENANCE_SCHEMA)
+    conn.execute(
+        "INSERT INTO maintenance_state (task, finished_at) VALUES (?, ?) "
+        "ON CONFLICT(task) DO UPDATE SET finished_at = excluded.finished_at",
+        (task, datetime.now().isoformat(timespec="seconds"))
+    )
+
+
+def analyze(conn):
+    """Сбор статистики планировщика с ограничением числа просматриваемых строк"""
+    with instrumentation.span("maintenance.analyze"):
+        conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+        conn.execute("ANALYZE")
+        _mark_done(conn, "analyze")
+
+
+def checkpoint(conn, mode: str = "PASSIVE") -> Dict:
+    """Перенос журнала WAL в основной файл базы.
+    
+    PASSIVE не ждет читателей и писателей; TRUNCATE дополнительно
+    обрезает файл журнала, если его никто не читает.
+    """
+    with instrumentation.span("maintenance.checkpoint"):
+        busy, log_pages, checkpointed = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+    return {"busy": bool(busy), "wal_pages": log_pages, "checkpointed": checkpointed}
+
+
+def incremental_vacuum(conn, pages: Optional[int] = IDLE_VACUUM_PAGES) -> int:
+    """Возврат свободных страниц файловой системе; число освобожденных страниц.
+    
+    Работает только в режиме auto_vacuum = INCREMENTAL; pages=None
+    освобождает все свободные страницы.
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return 0
+    before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    if not before:
+        return 0
+    with instrumentation.span("maintenance.incremental_vacuum") as span:
+        # Каждый шаг оператора освобождает одну страницу, а execute выполняет
+        # один шаг для запроса без столбцов; executescript выполняет его до конца
+        argument = f"({pages})" if pages else ""
+        conn.executescript(f"PRAGMA incremental_vacuum{argument};")
+        freed = before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+        span.rows = freed
+    return freed
+
+
+def enable_incremental_vacuum(conn):
+    """Перевод базы в режим auto_vacuum = INCREMENTAL.
+    
+    Режим применяется только полной перестройкой файла командой VACUUM,
+    поэтому выполняется один раз по явному запросу администратора.
+    """
+    with instrumentation.span("maintenance.vacuum"):
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+
+
+# Сводки заказов, без которых не выполняется выборка списка заказов
+ORDER_SUMMARY_TABLES = ("order_totals",)
+
+
+def capture_workload(db_path: str) -> Tuple[List[Tuple[str, str, str]], Dict[str, Tuple[str, str]]]:
+    """Запросы приложения для проверки планов выполнения.
+    
+    Типовые операции каталога, заказов и журнала изменений выполняются
+    методами DatabaseManager на значениях из самой базы, а тексты запросов
+    с подставленными параметрами перехватываются трассировкой SQLite.
+    Так проверяются те же запросы, что выполняет приложение. База
+    открывается только на чтение, без создания индексов и очистки журнала.
+    
+    Возвращает запросы (имя, таблица, SQL) и пропущенные операции
+    {имя: (таблица, причина)}: операция пропускается, если в базе нет
+    нужной таблицы или данных для подстановки.
+    """
+    db = DatabaseManager(db_path, pool_size=1, cache_catalog=False, read_only=True)
+    statements = []
+    conn = db.pool.acquire()
+    try:
+        conn.set_trace_callback(statements.append)
+        sample = conn.execute(
+            "SELECT genre, publisher, year, title, article FROM books ORDER BY rowid LIMIT 1"
+        ).fetchone()
+        genres = [row[0] for row in conn.execute("SELECT DISTINCT genre FROM books LIMIT 2")]
+        order = conn.execute(
+            "SELECT order_id, status, client_name, pickup_point_id FROM orders ORDER BY order_id LIMIT 1"
+        ).fetchone()
+        login = conn.execute("SELECT login FROM users LIMIT 1").fetchone()
+        # Журнал изменений и сводки заказов создает приложение при первом
+        # открытии базы; в базе без них соответствующие запросы пропускаются
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        word = re.findall(r"\w+", sample[3])[0] if sample else "книга"
+        
+        def page(sort, **filters):
+            first = db.query_books(None, CatalogFilters(**filters), sort, limit=30, columns=CARD_COLUMNS)
+            if first:
+                db.query_books(None, CatalogFilters(**filters), sort, after=sort_key(first[-1], sort),
+                               limit=30, columns=CARD_COLUMNS)
+        
+        def missing(required=(), data=True) -> Optional[str]:
+            """Причина пропуска операции или None"""
+            absent = [table for table in required if table not in tables]
+            if absent:
+                return f"нет таблицы {', '.join(absent)}"
+            return None if data else "нет данных"
+        
+        # Операции: имя, таблица, индексы которой проверяются, причина пропуска
+        steps = [
+            ("catalog.page", "books", missing(), lambda: page("title")),
+            ("catalog.search", "books", missing(), lambda: db.iter_books(word, limit=30, columns=CARD_COLUMNS)),
+            ("catalog.price", "books", missing(), lambda: page("price")),
+            ("catalog.price_desc", "books", missing(), lambda: page("price_desc")),
+            ("catalog.year_desc", "books", missing(), lambda: page("year_desc")),
+            ("catalog.facets", "books", missing(), lambda: db.get_facets(None)),
+            ("catalog.changes", "books_changelog", missing(["books_changelog"]),
+             lambda: db.get_book_changes(0, 10)),
+            ("catalog.genre", "books", missing(data=sample), lambda: page("title", genres=[sample[0]])),
+            ("catalog.genres", "books", missing(data=sample), lambda: page("title", genres=genres)),
+            ("catalog.publisher", "books", missing(data=sample), lambda: page("title", publishers=[sample[1]])),
+            ("catalog.years", "books", missing(data=sample),
+             lambda: page("title", year_from=sample[2], year_to=sample[2] + 9)),
+            ("catalog.in_stock", "books", missing(data=sample), lambda: page("price", in_stock=True, on_sale=True)),
+            ("catalog.search_facets", "books", missing(data=sample),
+             lambda: db.get_facets(word, CatalogFilters(genres=[sample[0]]))),
+            ("catalog.book", "books", missing(data=sample), lambda: db.get_book_by_article(sample[4])),
+            ("users.login", "users", missing(data=login), lambda: db.authenticate_user(login[0], "")),
+            ("orders.page", "orders", missing(ORDER_SUMMARY_TABLES, order), lambda: db.get_orders(limit=50)),
+            ("orders.status", "orders", missing(ORDER_SUMMARY_TABLES, order),
+             lambda: db.get_orders(status=order[1], limit=50)),
+            ("orders.client", "orders", missing(ORDER_SUMMARY_TABLES, order),
+             lambda: db.get_orders(client_name=order[2], limit=50)),
+            ("orders.pickup_point", "orders", missing(ORDER_SUMMARY_TABLES, order),
+             lambda: db.get_orders(pickup_point_id=order[3], limit=50)),
+            ("orders.items", "order_items", missing(data=order), lambda: db.get_order_items(order[0])),
+            ("orders.summary", "pickup_point_sales", missing(["pickup_point_sales"]),
+             lambda: db.get_sales_summary()),
+        ]
+        
+        workload = []
+        skipped = {}
+        for name, table, reason, step in steps:
+            if reason is not None:
+                skipped[name] = (table, reason)
+                continue
+            start = len(statements)
+            step()
+            queries = [sql for sql in statements[start:] if sql.lstrip().upper().startswith(("SELECT", "WITH"))]
+            for number, sql in enumerate(queries, 1):
+                workload.append((name if len(queries) == 1 else f"{name}.{number}", table, sql))
+        return workload, skipped
+    finally:
+        conn.set_trace_callback(None)
+        db.pool.release(conn)
+        db.close()
+
+
+def unchecked_tables(workload: List[Tuple[str, str, str]], skipped: Dict[str, Tuple[str, str]]) -> List[str]:
+    """Таблицы, все операции с которыми пропущены: об использовании их
+    индексов отчет судить не может"""
+    checked = {table for _, table, _ in workload}
+    return sorted({table for table, _ in skipped.values()} - checked)
+
+
+def explain_workload(conn, workload: List[Tuple[str, str, str]]) -> Dict[str, Dict]:
+    """Планы выполнения и лучшее время выполнения запросов"""
+    plans = {}
+    for name, _, sql in workload:
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+        best = None
+        for _ in range(PLAN_REPEATS):
+            started = time.perf_counter()
+            conn.execute(sql).fetchall()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        plans[name] = {"plan": plan, "ms": round(best * 1000, 2)}
+    return plans
+
+
+def index_usage(conn, plans: Dict[str, Dict], unchecked: Sequence[str] = ()) -> Dict[str, List[str]]:
+    """Индексы, которые используются и не используются запросами приложения.
+    
+    Индексы таблиц из unchecked попадают в отдельный список: запросы
+    к этим таблицам не выполнялись.
+    """
+    used = set()
+    for entry in plans.values():
+        for detail in entry["plan"]:
+            used.update(re.findall(r"USING (?:COVERING )?INDEX (\w+)", detail))
+    indexes = conn.execute(
+        "SELECT name, tbl_name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL ORDER BY name"
+    ).fetchall()
+    return {
+        "used": sorted(used),
+        "unused": [name for name, table in indexes if name not in used and table not in unchecked],
+        "unchecked": [name for name, table in indexes if name not in used and table in unchecked],
+    }
+
+
+def run_idle_maintenance(db_path: str) -> Dict:
+    """Обслуживание в простое: контрольная точка WAL, частичная очистка
+    свободных страниц и сбор статистики по расписанию"""
+    result = {}
+    with instrumentation.span("maintenance.idle"):
+        conn = connect(db_path)
+        try:
+            result["vacuumed_pages"] = incremental_vacuum(conn, IDLE_VACUUM_PAGES)
+            result["checkpoint"] = checkpoint(conn, "PASSIVE")
+            if _task_due(conn, "analyze", ANALYZE_INTERVAL):
+                analyze(conn)
+                result["analyzed"] = True
+        finally:
+            conn.close()
+    return result
+
+
+class IdleMaintenance:
+    """Запуск обслуживания базы после IDLE_SECONDS без действий пользователя.
+    
+    Нажатия клавиш и кнопок мыши в любом окне приложения сбрасывают
+    таймер; обслуживание выполняется в фоновом потоке один раз за период
+    простоя, чтобы не задерживать интерфейс.
+    """
+    
+    def __init__(self, root, db_path: str, idle_seconds: float = IDLE_SECONDS):
+        self.root = root
+        self.db_path = db_path
+        self.idle_seconds = idle_seconds
+        self.last_activity = time.monotonic()
+        self.done_for_idle = False
+        self.thread = None
+        for sequence in ("<KeyPress>", "<ButtonPress>"):
+            root.bind_all(sequence, self._on_activity, add="+")
+        self.check_id = root.after(IDLE_CHECK_MS, self._check)
+    
+    def _on_activity(self, event=None):
+        self.last_activity = time.monotonic()
+        self.done_for_idle = False
+    
+    def _check(self):
+        """Проверка простоя и запуск обслуживания"""
+        self.check_id = self.root.after(IDLE_CHECK_MS, self._check)
+        if self.done_for_idle or time.monotonic() - self.last_activity < self.idle_seconds:
+            return
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.done_for_idle = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+    
+    def _run(self):
+        try:
+            run_idle_maintenance(self.db_path)
+        except sqlite3.Error as e:
+            print(f" Ошибка обслуживания базы данных: {e}")
+    
+    def stop(self):
+        """Отмена проверок простоя и ожидание выполняющегося обслуживания"""
+        if self.check_id is not None:
+            self.root.after_cancel(self.check_id)
+            self.check_id = None
+        if self.thread is not None:
+            self.thread.join(timeout=5.0)
+
+
+def run_maintenance(db_path: str, drop_redundant: bool = True, vacuum: bool = False) -> Dict:
+    """Полное обслуживание с отчетом о состоянии базы до и после.
+    
+    При ошибках quick_check база не изменяется.
+    """
+    workload, skipped = capture_workload(db_path)
+    unchecked = unchecked_tables(workload, skipped)
+    conn = connect(db_path)
+    try:
+        report = {"quick_check": quick_check(conn), "skipped": skipped}
+        report["before"] = {
+            "storage": storage_stats(conn),
+            "plans": explain_workload(conn, workload),
+        }
+        report["before"]["indexes"] = index_usage(conn, report["before"]["plans"], unchecked)
+        report["redundant_indexes"] = find_redundant_indexes(conn)
+        if report["quick_check"] != ["ok"]:
+            return report
+        
+        if drop_redundant:
+            drop_redundant_indexes(conn)
+        analyze(conn)
+        if vacuum and report["before"]["storage"]["auto_vacuum"] != "incremental":
+            enable_incremental_vacuum(conn)
+        report["vacuumed_pages"] = incremental_vacuum(conn, None)
+        report["checkpoint"] = checkpoint(conn, "TRUNCATE")
+        
+        report["after"] = {
+            "storage": storage_stats(conn),
+            "plans": explain_workload(conn, workload),
+        }
+        report["after"]["indexes"] = index_usage(conn, report["after"]["plans"], unchecked)
+        return report
+    finally:
+        conn.close()
+
+
+def print_report(report: Dict):
+    """Вывод отчета об обслуживании"""
+    print(f"Проверка целостности: {'; '.join(report['quick_check'])}")
+    for index, table, replacement in report["redundant_indexes"]:
+        print(f"Избыточный индекс {index} ({table}) заменяется индексом {replacement}")
+    for name, (table, reason) in report["skipped"].items():
+        print(f"Операция {name} ({table}) не проверялась: {reason}")
+    
+    for stage in ("before", "after"):
+        if stage not in report:
+            continue
+        storage = report[stage]["storage"]
+        title = "До обслуживания" if stage == "before" else "После обслуживания"
+        print(
+            f"\n{title}: {storage['size_mb']} МБ, {storage['pages']} страниц, "
+            f"свободных {storage['free_pages']} ({storage['free_ratio']:.1%}), "
+            f"auto_vacuum = {storage['auto_vacuum']}"
+        )
+        for name, entry in sorted((storage["objects"] or {}).items(), key=lambda item: -item[1]["pages"])[:10]:
+            print(
+                f"  {name:36} {entry['pages']:>8} стр., не заполнено {entry['unused_ratio']:.1%}, "
+                f"фрагментация {entry['fragmentation']:.1%}"
+            )
+        indexes = report[stage]["indexes"]
+        print(f"  Неиспользуемые запросами приложения индексы: {', '.join(indexes['unused']) or 'нет'}")
+        if indexes["unchecked"]:
+            print(f"  Индексы таблиц, запросы к которым не проверялись: {', '.join(indexes['unchecked'])}")
+    
+    if "after" not in report:
+        if report["quick_check"] != ["ok"]:
+            print("\nОбнаружены ошибки целостности, обслуживание не выполнялось")
+        return
+    
+    print(f"\nОсвобождено страниц: {report['vacuumed_pages']}, "
+          f"контрольная точка WAL: {report['checkpoint']['checkpointed']} стр.")
+    if report["after"]["storage"]["free_ratio"] >= VACUUM_FREE_RATIO and report["after"]["storage"]["auto_vacuum"] == "none":
+        print("Свободных страниц много: запустите обслуживание с --vacuum")
+    
+    print("\nПланы запросов:")
+    before, after = report["before"]["plans"], report["after"]["plans"]
+    for name in before:
+        changed = before[name]["plan"] != after[name]["plan"]
+        print(f"  {name:26} {before[name]['ms']:>8} мс -> {after[name]['ms']:>8} мс"
+              f"{'  план изменен' if changed else ''}")
+        if changed:
+            for detail in before[name]["plan"]:
+                print(f"      - {detail}")
+            for detail in after[name]["plan"]:
+                print(f"      + {detail}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Обслуживание базы данных каталога")
+    # База указывается явно: обслуживание изменяет файл, и запуск
+    # без параметров не должен затрагивать базу приложения
+    parser.add_argument("--db", required=True, help="путь к базе данных")
+    parser.add_argument("--json", metavar="PATH", help="сохранить отчет в JSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    commands.add_parser("report", help="проверить базу и показать отчет без обслуживания")
+    run_parser = commands.add_parser("run", help="выполнить обслуживание")
+    run_parser.add_argument("--keep-indexes", action="store_true", help="не удалять избыточные индексы")
+    run_parser.add_argument("--vacuum", action="store_true",
+                            help="перестроить файл и включить auto_vacuum = INCREMENTAL")
+    commands.add_parser("idle", help="выполнить обслуживание, как в простое приложения")
+    args = parser.parse_args(argv)
+    
+    if args.command == "idle":
+        report = run_idle_maintenance(args.db)
+        print(json.dumps(report, ensure_ascii=False))
+    elif args.command == "report":
+        workload, skipped = capture_workload(args.db)
+        conn = connect(args.db, read_only=True)
+        try:
+            plans = explain_workload(conn, workload)
+            indexes = index_usage(conn, plans, unchecked_tables(workload, skipped))
+            report = {
+                "quick_check": quick_check(conn),
+                "skipped": skipped,
+                "redundant_indexes": find_redundant_indexes(conn),
+                "before": {"storage": storage_stats(conn), "plans": plans, "indexes": indexes},
+            }
+        finally:
+            conn.close()
+        print_report(report)
+    else:
+        report = run_maintenance(args.db, drop_redundant=not args.keep_indexes, vacuum=args.vacuum)
+        print_report(report)
+    
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+    return 0 if report.get("quick_check", ["ok"]) == ["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+from functools import lru_cache
+from typing import Dict, Optional, Sequence, Tuple
+
+# Столбцы таблицы books в порядке их объявления в схеме
+BOOK_COLUMNS = (
+    "article", "title", "author", "genre", "publisher", "year", "price",
+    "sale_price", "on_sale", "stock_quantity", "description", "cover_image",
+    "created_at", "updated_at",
+)
+
+# Столбцы, значения которых задаются при загрузке каталога;
+# отметки created_at и updated_at заполняет база данных
+DATA_COLUMNS = BOOK_COLUMNS[:-2]
+
+# Столбцы, отображаемые в карточке книги (описание не загружается)
+CARD_COLUMNS = (
+    "article", "title", "author", "genre", "publisher", "year",
+    "price", "sale_price", "on_sale", "stock_quantity", "cover_image",
+)
+
+# Столбцы, без которых невозможна постраничная выборка по ключу (title, article)
+KEY_COLUMNS = ("title", "article")
+
+
+class Book:
+    """Запись о книге с фиксированным набором полей.
+    
+    Поддерживает обращение как к атрибутам, так и по ключу (book['title']),
+    поэтому может использоваться там, где раньше передавались словари.
+    При выборке части столбцов отсутствующие поля не заполняются.
+    """
+    
+    __slots__ = BOOK_COLUMNS
+    
+    def __init__(self, **fields):
+        for column, value in fields.items():
+            setattr(self, column, value)
+    
+    def __getitem__(self, column):
+        try:
+            return getattr(self, column)
+        except AttributeError:
+            raise KeyError(column) from None
+    
+    def __contains__(self, column):
+        return hasattr(self, column)
+    
+    def get(self, column, default=None):
+        """Значение поля или default, если поле не было выбрано"""
+        return getattr(self, column, default)
+    
+    def keys(self):
+        """Имена заполненных полей"""
+        return [column for column in BOOK_COLUMNS if hasattr(self, column)]
+    
+    def to_dict(self) -> Dict:
+        """Преобразование записи в словарь"""
+        return {column: getattr(self, column) for column in self.keys()}
+    
+    def __eq__(self, other):
+        return isinstance(other, Book) and self.to_dict() == other.to_dict()
+    
+    def __repr__(self):
+        return f"Book({self.get('article')!r}, {self.get('title')!r})"
+
+
+@lru_cache(maxsize=64)
+def _slot_setters(description) -> Tuple:
+    """Дескрипторы полей Book для столбцов результата запроса"""
+    return tuple(Book.__dict__[column[0]].__set__ for column in description)
+
+
+def book_row_factory(cursor, row) -> Book:
+    """Фабрика строк sqlite3, создающая Book без промежуточного словаря"""
+    book = Book.__new__(Book)
+    for set_field, value in zip(_slot_setters(cursor.description), row):
+        set_field(book, value)
+    return book
+
+
+def projection(columns: Optional[Sequence[str]], table: str = "books") -> str:
+    """Список столбцов для SELECT с проверкой имен по схеме books"""
+    if columns is None:
+        return f"{table}.*"
+    unknown = set(columns) - set(BOOK_COLUMNS)
+    if unknown:
+        raise ValueError(f"Неизвестные столбцы книги: {', '.join(sorted(unknown))}")
+    return ", ".join(f"{table}.{column}" for column in columns)
@@ -0,0 +1,218 @@
+import tkinter as tk
+from tkinter import ttk
+from database import DatabaseManager
+
+# Число заказов, загружаемых за один запрос
+ORDERS_PAGE_SIZE = 50
+ORDER_STATUSES = ("Новый", "В обработке", "Доставлен", "Отменен")
+ALL_VALUES = "Все"
+
+
+class OrdersWindow:
+    """Окно просмотра заказов и сводки продаж для менеджеров и администраторов"""
+    
+    def __init__(self, parent, db: DatabaseManager, on_close=None):
+        self.db = db
+        self.on_close = on_close
+        self.last_order_id = None
+        
+        self.window = tk.Toplevel(parent)
+        self.window.title("Литературный Клуб - Заказы")
+        self.window.geometry("1000x650")
+        self.window.configure(bg="#f5f5f5")
+        self.window.protocol("WM_DELETE_WINDOW", self.destroy)
+        
+        self.pickup_points = {ALL_VALUES: None}
+        for point in self.db.get_pickup_points():
+            self.pickup_points[point['address']] = point['point_id']
+        
+        self._create_interface()
+        self._load_orders()
+        self._load_summary()
+    
+    def _create_interface(self):
+        """Создание фильтров, списка заказов и панели сводки"""
+        filters_frame = tk.Frame(self.window, bg="#f5f5f5")
+        filters_frame.pack(fill="x", padx=10, pady=10)
+        
+        tk.Label(filters_frame, text="Статус:", bg="#f5f5f5").pack(side="left")
+        self.status_var = tk.StringVar(value=ALL_VALUES)
+        ttk.Combobox(
+            filters_frame,
+            textvariable=self.status_var,
+            values=(ALL_VALUES,) + ORDER_STATUSES,
+            state="readonly",
+            width=14
+        ).pack(side="left", padx=(5, 15))
+        
+        tk.Label(filters_frame, text="Клиент:", bg="#f5f5f5").pack(side="left")
+        self.client_entry = tk.Entry(filters_frame, width=25)
+        self.client_entry.pack(side="left", padx=(5, 15))
+        self.client_entry.bind("<Return>", lambda event: self._load_orders())
+        
+        tk.Label(filters_frame, text="Пункт выдачи:", bg="#f5f5f5").pack(side="left")
+        self.pickup_point_var = tk.StringVar(value=ALL_VALUES)
+        ttk.Combobox(
+            filters_frame,
+            textvariable=self.pickup_point_var,
+            values=list(self.pickup_points),
+            state="readonly",
+            width=35
+        ).pack(side="left", padx=(5, 15))
+        
+        tk.Button(
+            filters_frame,
+            text="Применить",
+            command=self._load_orders,
+            bg="#2E86AB",
+            fg="white"
+        ).pack(side="left")
+        
+        content_frame = tk.Frame(self.window, bg="#f5f5f5")
+        content_frame.pack(fill="both", expand=True, padx=10)
+        
+        # Список заказов с позициями выбранного заказа под ним
+        orders_frame = tk.Frame(content_frame, bg="#f5f5f5")
+        orders_frame.pack(side="left", fill="both", expand=True)
+        
+        columns = ("number", "date", "status", "client", "pickup", "items", "amount")
+        headings = ("Номер", "Дата", "Статус", "Клиент", "Пункт выдачи", "Позиций", "Сумма")
+        widths = (70, 130, 90, 170, 200, 70, 90)
+        self.orders_tree = ttk.Treeview(orders_frame, columns=columns, show="headings", height=15)
+        for column, heading, width in zip(columns, headings, widths):
+            self.orders_tree.heading(column, text=heading)
+            self.orders_tree.column(column, width=width, anchor="w")
+        self.orders_tree.pack(fill="both", expand=True)
+        self.orders_tree.bind("<<TreeviewSelect>>", self._on_order_select)
+        
+        self.more_button = tk.Button(
+            orders_frame,
+            text="Показать еще",
+            command=self._load_next_page,
+            bg="#2E86AB",
+            fg="white"
+        )
+        self.more_button.pack(pady=5)
+        
+        self.items_tree = ttk.Treeview(
+            orders_frame,
+            columns=("article", "title", "quantity", "price", "amount"),
+            show="headings",
+            height=5
+        )
+        for column, heading in zip(
+            ("article", "title", "quantity", "price", "amount"),
+            ("Артикул", "Название", "Количество", "Цена", "Сумма")
+        ):
+            self.items_tree.heading(column, text=heading)
+        self.items_tree.pack(fill="x", pady=(0, 10))
+        
+        # Сводка продаж строится по таблицам, поддерживаемым триггерами
+        self.summary_frame = tk.Frame(content_frame, bg="white", relief="solid", bd=1, width=260)
+        self.summary_frame.pack(side="right", fill="y", padx=(10, 0), pady=(0, 10))
+        self.summary_frame.pack_propagate(False)
+    
+    def _filters(self):
+        """Текущие значения фильтров списка заказов"""
+        status = self.status_var.get()
+        return {
+            'status': None if status == ALL_VALUES else status,
+            'client_name': self.client_entry.get().strip() or None,
+            'pickup_point_id': self.pickup_points.get(self.pickup_point_var.get()),
+        }
+    
+    def _load_orders(self):
+        """Загрузка первой страницы заказов по текущим фильтрам"""
+        self.orders_tree.delete(*self.orders_tree.get_children())
+        self.items_tree.delete(*self.items_tree.get_children())
+        self.last_order_id = None
+        self._load_next_page()
+    
+    def _load_next_page(self):
+        """Догрузка следующей страницы заказов"""
+        orders = self.db.get_orders(before_id=self.last_order_id, limit=ORDERS_PAGE_SIZE, **self._filters())
+        for order in orders:
+            self.orders_tree.insert("", "end", iid=str(order['order_id']), values=(
+                order['order_number'],
+                order['order_date'],
+                order['status'],
+                order['client_name'],
+                order['pickup_address'],
+                order['items'],
+                f"{order['amount']:.2f}",
+            ))
+        if orders:
+            self.last_order_id = orders[-1]['order_id']
+        self.more_button.config(state="normal" if len(orders) == ORDERS_PAGE_SIZE else "disabled")
+    
+    def _on_order_select(self, event):
+        """Отображение позиций выбранного заказа"""
+        self.items_tree.delete(*self.items_tree.get_children())
+        selection = self.orders_tree.selection()
+        if not selection:
+            return
+        for item in self.db.get_order_items(int(selection[0])):
+            self.items_tree.insert("", "end", values=(
+                item['book_article'],
+                item['title'] or "",
+                item['quantity'],
+                item['unit_price'],
+                f"{item['amount']:.2f}",
+            ))
+    
+    def _load_summary(self):
+        """Заполнение панели сводки продаж"""
+        summary = self.db.get_sales_summary()
+        total = summary['total']
+        
+        tk.Label(
+            self.summary_frame,
+            text="Сводка продаж",
+            font=("Arial", 12, "bold"),
+            bg="white"
+        ).pack(anchor="w", padx=10, pady=(10, 5))
+        tk.Label(
+            self.summary_frame,
+            text=f"Заказов: {total['orders']}\nЭкземпляров: {total['quantity']}\nВыручка: {total['amount']:.2f} руб.",
+            font=("Arial", 10),
+            bg="white",
+            justify="left"
+        ).pack(anchor="w", padx=10)
+        
+        tk.Label(
+            self.summary_frame,
+            text="Лидеры продаж",
+            font=("Arial", 10, "bold"),
+            bg="white"
+        ).pack(anchor="w", padx=10, pady=(10, 0))
+        for book in summary['books']:
+            tk.Label(
+                self.summary_frame,
+                text=f"{book['title'] or book['book_article']}: {book['amount']:.2f} руб.",
+                font=("Arial", 9),
+                bg="white",
+                wraplength=240,
+                justify="left"
+            ).pack(anchor="w", padx=10)
+        
+        tk.Label(
+            self.summary_frame,
+            text="Пункты выдачи",
+            font=("Arial", 10, "bold"),
+            bg="white"
+        ).pack(anchor="w", padx=10, pady=(10, 0))
+        for point in summary['pickup_points'][:10]:
+            tk.Label(
+                self.summary_frame,
+                text=f"{point['address']}: {point['orders']} зак., {point['amount']:.2f} руб.",
+                font=("Arial", 9),
+                bg="white",
+                wraplength=240,
+                justify="left"
+            ).pack(anchor="w", padx=10)
+    
+    def destroy(self):
+        """Закрытие окна заказов"""
+        self.window.destroy()
+        if self.on_close:
+            self.on_close()
@@ -0,0 +1,457 @@
+import tkinter as tk
+from tkinter import ttk
+from catalog_facets import DEFAULT_SORT, YEAR_BUCKET, CatalogFilters
+from instrumentation import instrumentation
+
+# Геометрия карточки книги в сетке
+CARD_HEIGHT = 200
+CARD_PADX = 10
+ROW_SPACING = 20
+
+# Надписи пустой сетки: до получения первой страницы и при пустом результате
+LOADING_TEXT = "Загрузка каталога..."
+EMPTY_TEXT = "Книги по вашему запросу не найдены"
+
+# Порядки сортировки каталога в том виде, в котором они показываются пользователю
+SORT_LABELS = {
+    "title": "По названию",
+    "price": "Сначала дешевле",
+    "price_desc": "Сначала дороже",
+    "year_desc": "Сначала новые",
+    "year": "Сначала старые",
+}
+
+
+class BookCard:
+    """Карточка книги, создаваемая один раз и переиспользуемая для разных книг"""
+    
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.book = None
+        self.cover_image = None
+        
+        # Основной контейнер для карточки книги
+        self.frame = tk.Frame(canvas, relief="raised", bd=1, height=CARD_HEIGHT)
+        self.frame.pack_propagate(False)
+        self.item = canvas.create_window(0, 0, window=self.frame, anchor="nw", state="hidden")
+        
+        # Внутренний контейнер для содержимого карточки
+        self.content_frame = tk.Frame(self.frame)
+        self.content_frame.pack(fill="both", expand=True, padx=10, pady=10)
+        
+        # Блок с изображением обложки
+        self.cover_frame = tk.Frame(self.content_frame)
+        self.cover_frame.pack(side="left", padx=(0, 10))
+        self.cover_label = tk.Label(self.cover_frame, font=("Arial", 8))
+        self.cover_label.pack()
+        
+        # Блок с информацией о книге
+        self.info_frame = tk.Frame(self.content_frame)
+        self.info_frame.pack(side="left", fill="both", expand=True)
+        
+        # Название и автор произведения
+        self.title_label = tk.Label(
+            self.info_frame,
+            font=("Arial", 10, "bold"),
+            wraplength=180,
+            justify="left"
+        )
+        self.title_label.pack(anchor="w")
+        
+        self.genre_label = tk.Label(self.info_frame, font=("Arial", 8), justify="left")
+        self.genre_label.pack(anchor="w")
+        
+        self.publisher_label = tk.Label(self.info_frame, font=("Arial", 8), justify="left")
+        self.publisher_label.pack(anchor="w")
+        
+        self.year_label = tk.Label(self.info_frame, font=("Arial", 8), justify="left")
+        self.year_label.pack(anchor="w")
+        
+        # Блок с информацией о цене
+        self.price_frame = tk.Frame(self.info_frame)
+        self.price_frame.pack(anchor="w")
+        self.price_label = tk.Label(self.price_frame)
+        self.price_label.pack(side="left")
+        self.sale_price_label = tk.Label(self.price_frame, font=("Arial", 9, "bold"), fg="black")
+        
+        # Информация о наличии на складе
+        self.stock_label = tk.Label(self.info_frame, font=("Arial", 8), justify="left")
+        self.stock_label.pack(anchor="w")
+        
+        self.background_widgets = (
+            self.frame, self.content_frame, self.cover_frame, self.cover_label,
+            self.info_frame, self.title_label, self.genre_label, self.publisher_label,
+            self.year_label, self.price_frame, self.price_label, self.sale_price_label,
+            self.stock_label
+        )
+    
+    def bind(self, book, book_image):
+        """Заполнение карточки данными книги без пересоздания виджетов"""
+        self.book = book
+        book_bg_color = "#ADD8E6" if book['stock_quantity'] == 0 else "white"
+        for widget in self.background_widgets:
+            widget.configure(bg=book_bg_color)
+        
+        self.set_cover(book_image)
+        
+        self.title_label.configure(text=f"{book['title']} | {book['author']}")
+        self.genre_label.configure(text=f"Жанр: {book['genre']}")
+        self.publisher_label.configure(text=f"Издательство: {book['publisher']}")
+        self.year_label.configure(text=f"Год издания: {book['year']}")
+        
+        if book['on_sale'] and book['sale_price']:
+            # Отображение акционной цены
+            self.price_label.configure(
+                text=f"{book['price']} руб.",
+                font=("Arial", 8, "overstrike"),
+                fg="red"
+            )
+            self.sale_price_label.configure(text=f" {book['sale_price']} руб.")
+            self.sale_price_label.pack(side="left")
+        else:
+            # Отображение стандартной цены
+            self.price_label.configure(text=f"Цена: {book['price']} руб.", font=("Arial", 8), fg="black")
+            self.sale_price_label.pack_forget()
+        
+        stock_color = "red" if book['stock_quantity'] == 0 else "black"
+        self.stock_label.configure(text=f"В наличии: {book['stock_quantity']} шт.", fg=stock_color)
+    
+    def set_cover(self, book_image):
+        """Отображение обложки или текстовой заглушки"""
+        # Ссылка на изображение хранится в карточке, пока обложка на экране
+        self.cover_image = book_image
+        if book_image:
+            self.cover_label.configure(image=book_image, text="", width=0, height=0)
+        else:
+            self.cover_label.configure(image="", text="Обложка\nотсутствует", width=12, height=8)
+    
+    def place(self, x, y, width):
+        """Размещение карточки на холсте"""
+        self.canvas.coords(self.item, x, y)
+        self.canvas.itemconfigure(self.item, width=width, state="normal")
+    
+    def hide(self):
+        """Скрытие карточки, возвращенной в пул"""
+        self.canvas.itemconfigure(self.item, state="hidden")
+        self.book = None
+        self.cover_image = None
+
+
+class BookGrid:
+    """Виртуализированная сетка книг на Canvas.
+    
+    Создаются только карточки видимых строк и небольшого запаса сверху и
+    снизу; при прокрутке карточки переиспользуются для новых книг.
+    """
+    
+    def __init__(self, canvas, scrollbar, image_provider, on_need_more=None,
+                 columns: int = 3, overscan_rows: int = 1):
+        self.canvas = canvas
+        self.scrollbar = scrollbar
+        self.image_provider = image_provider
+        self.on_need_more = on_need_more
+        self.columns = columns
+        self.overscan_rows = overscan_rows
+        self.row_height = CARD_HEIGHT + ROW_SPACING
+        
+        self.books = []
+        self.has_more = False
+        self.scrollregion = None
+        self.active_cards = {}
+        self.free_cards = []
+        
+        self.empty_text = canvas.create_text(
+            0, 50,
+            text=EMPTY_TEXT,
+            font=("Arial", 14),
+            fill="gray",
+            anchor="n",
+            state="hidden"
+        )
+        
+        canvas.configure(yscrollcommand=self._on_scroll)
+        canvas.bind("<Configure>", lambda e: self.refresh(relayout=True))
+    
+    def show_loading(self):
+        """Отображение надписи о загрузке до получения первой страницы"""
+        self.canvas.itemconfigure(self.empty_text, text=LOADING_TEXT)
+        self.refresh()
+    
+    def set_books(self, books, has_more: bool = False):
+        """Замена содержимого сетки новым набором книг"""
+        self.canvas.itemconfigure(self.empty_text, text=EMPTY_TEXT)
+        self.books = list(books)
+        self.has_more = has_more
+        self._release_all()
+        self.canvas.yview_moveto(0)
+        self.refresh()
+    
+    def append_books(self, books, has_more: bool = False):
+        """Добавление очередной страницы книг в конец сетки"""
+        self.books.extend(books)
+        self.has_more = has_more
+        self.refresh()
+    
+    def replace_books(self, books):
+        """Замена книг с сохранением позиции прокрутки.
+        
+        Заново привязываются только карточки области просмотра, поэтому
+        удаление или вставка нескольких книг не перестраивает всю сетку.
+        """
+        self.books = list(books)
+        self._release_all()
+        self.refresh()
+    
+    def update_book(self, index: int, book):
+        """Замена одной книги; на экране обновляется только ее карточка"""
+        self.books[index] = book
+        card = self.active_cards.get(index)
+        if card is not None:
+            self._bind_card(card, book)
+    
+    def clear(self):
+        """Удаление всех книг из сетки"""
+        self.books = []
+        self.has_more = False
+        self._release_all()
+    
+    def _release_all(self):
+        """Возврат всех карточек в пул"""
+        for card in self.active_cards.values():
+            card.hide()
+            self.free_cards.append(card)
+        self.active_cards.clear()
+    
+    def _on_scroll(self, first, last):
+        """Обновление видимых карточек при прокрутке холста"""
+        self.scrollbar.set(first, last)
+        self.refresh()
+    
+    def refresh(self, relayout: bool = False):
+        """Привязка карточек к книгам, попадающим в область просмотра"""
+        with instrumentation.span("ui.grid_layout"):
+            self._refresh(relayout)
+    
+    def _refresh(self, relayout: bool):
+        width = max(self.canvas.winfo_width(), 1)
+        height = max(self.canvas.winfo_height(), 1)
+        total_rows = (len(self.books) + self.columns - 1) // self.columns
+        
+        # Область прокрутки меняется только при изменении размеров, иначе
+        # холст повторно вызывает yscrollcommand и обновление зацикливается
+        scrollregion = (0, 0, width, max(total_rows * self.row_height, height))
+        if scrollregion != self.scrollregion:
+            self.scrollregion = scrollregion
+            self.canvas.configure(scrollregion=scrollregion)
+        self.canvas.coords(self.empty_text, width / 2, 50)
+        self.canvas.itemconfigure(self.empty_text, state="hidden" if self.books else "normal")
+        
+        top = self.canvas.canvasy(0)
+        first_row = max(int(top // self.row_height) - self.overscan_rows, 0)
+        last_row = min(int((top + height) // self.row_height) + self.overscan_rows, total_rows - 1)
+        visible = set(range(first_row * self.columns, min((last_row + 1) * self.columns, len(self.books))))
+        
+        # Карточки, вышедшие за пределы области просмотра, возвращаются в пул
+        for index in [index for index in self.active_cards if index not in visible]:
+            card = self.active_cards.pop(index)
+            card.hide()
+            self.free_cards.append(card)
+        
+        card_width = width // self.columns - 2 * CARD_PADX
+        for index in sorted(visible):
+            card = self.active_cards.get(index)
+            is_new = card is None
+            if is_new:
+                if self.free_cards:
+                    card = self.free_cards.pop()
+                else:
+                    with instrumentation.span("ui.card_create"):
+                        card = BookCard(self.canvas)
+                self.active_cards[index] = card
+                self._bind_card(card, self.books[index])
+            if is_new or relayout:
+                row, column = divmod(index, self.columns)
+                card.place(
+                    column * (width // self.columns) + CARD_PADX,
+                    row * self.row_height + ROW_SPACING // 2,
+                    card_width
+                )
+        
+        if self.has_more and self.on_need_more and last_row >= total_rows - 1 - self.overscan_rows:
+            self.on_need_more()
+    
+    def _bind_card(self, card, book):
+        """Заполнение карточки книгой с запросом ее обложки"""
+        on_cover_ready = lambda image: self._on_cover_ready(card, book, image)
+        with instrumentation.span("ui.card_bind"):
+            card.bind(book, self.image_provider(book, on_cover_ready))
+    
+    def _on_cover_ready(self, card, book, image):
+        """Подстановка загруженной обложки, если карточка все еще показывает эту книгу"""
+        if card.book is book and image is not None:
+            card.set_cover(image)
+
+
+class FilterPanel:
+    """Боковая панель фильтров и сортировки каталога со счетчиками книг.
+    
+    Изменение любого фильтра передается в on_change; счетчики обновляются
+    вызовом set_facets после выполнения запроса.
+    """
+    
+    def __init__(self, parent, on_change):
+        self.on_change = on_change
+        self.genre_values = []
+        self.publisher_values = []
+        self.decade_values = []
+        
+        self.frame = tk.Frame(parent, bg="#f5f5f5", width=220)
+        
+        tk.Label(self.frame, text="Сортировка:", font=("Arial", 9, "bold"), bg="#f5f5f5").pack(anchor="w")
+        self.sort_var = tk.StringVar(value=SORT_LABELS[DEFAULT_SORT])
+        sort_box = ttk.Combobox(
+            self.frame,
+            textvariable=self.sort_var,
+            values=list(SORT_LABELS.values()),
+            state="readonly",
+            width=24
+        )
+        sort_box.pack(anchor="w", pady=(0, 8))
+        sort_box.bind("<<ComboboxSelected>>", lambda e: self.on_change())
+        
+        self.total_label = tk.Label(self.frame, font=("Arial", 8), fg="gray", bg="#f5f5f5")
+        self.total_label.pack(anchor="w")
+        
+        self.genre_list = self._create_list("Жанр:", selectmode="multiple")
+        self.publisher_list = self._create_list("Издательство:", selectmode="multiple")
+        
+        # Диапазон лет издания; выбор десятилетия заполняет обе границы
+        tk.Label(self.frame, text="Год издания:", font=("Arial", 9, "bold"), bg="#f5f5f5").pack(anchor="w")
+        year_frame = tk.Frame(self.frame, bg="#f5f5f5")
+        year_frame.pack(anchor="w")
+        tk.Label(year_frame, text="с", font=("Arial", 8), bg="#f5f5f5").pack(side="left")
+        self.year_from_entry = tk.Entry(year_frame, width=6)
+        self.year_from_entry.pack(side="left", padx=(2, 6))
+        tk.Label(year_frame, text="по", font=("Arial", 8), bg="#f5f5f5").pack(side="left")
+        self.year_to_entry = tk.Entry(year_frame, width=6)
+        self.year_to_entry.pack(side="left", padx=2)
+        for entry in (self.year_from_entry, self.year_to_entry):
+            entry.bind("<Return>", lambda e: self.on_change())
+            entry.bind("<FocusOut>", lambda e: self.on_change())
+        self.decade_list = self._create_list(None, selectmode="browse", height=4)
+        self.decade_list.bind("<<ListboxSelect>>", self._on_decade_select)
+        
+        self.on_sale_var = tk.BooleanVar(value=False)
+        self.on_sale_check = tk.Checkbutton(
+            self.frame, text="Со скидкой", variable=self.on_sale_var,
+            command=self.on_change, bg="#f5f5f5", font=("Arial", 9)
+        )
+        self.on_sale_check.pack(anchor="w", pady=(8, 0))
+        
+        self.in_stock_var = tk.BooleanVar(value=False)
+        self.in_stock_check = tk.Checkbutton(
+            self.frame, text="В наличии", variable=self.in_stock_var,
+            command=self.on_change, bg="#f5f5f5", font=("Arial", 9)
+        )
+        self.in_stock_check.pack(anchor="w")
+        
+        tk.Button(
+            self.frame,
+            text="Сбросить фильтры",
+            command=self.reset,
+            bg="#2E86AB",
+            fg="white",
+            font=("Arial", 8)
+        ).pack(anchor="w", pady=(8, 0))
+    
+    def _create_list(self, title, selectmode: str, height: int = 6):
+        """Список значений фасета с полосой прокрутки"""
+        if title:
+            tk.Label(self.frame, text=title, font=("Arial", 9, "bold"), bg="#f5f5f5").pack(anchor="w", pady=(8, 0))
+        list_frame = tk.Frame(self.frame, bg="#f5f5f5")
+        list_frame.pack(fill="x")
+        listbox = tk.Listbox(list_frame, selectmode=selectmode, exportselection=False,
+                             height=height, width=28, font=("Arial", 8))
+        scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=listbox.yview)
+        listbox.configure(yscrollcommand=scrollbar.set)
+        listbox.pack(side="left", fill="x", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        if selectmode == "multiple":
+            listbox.bind("<<ListboxSelect>>", lambda e: self.on_change())
+        return listbox
+    
+    def _on_decade_select(self, event):
+        """Заполнение диапазона лет выбранным десятилетием"""
+        selection = self.decade_list.curselection()
+        if not selection:
+            return
+        decade = self.decade_values[selection[0]]
+        for entry, value in ((self.year_from_entry, decade), (self.year_to_entry, decade + YEAR_BUCKET - 1)):
+            entry.delete(0, tk.END)
+            entry.insert(0, str(value))
+        self.on_change()
+    
+    @staticmethod
+    def _year(entry):
+        """Год из поля ввода; некорректное значение не ограничивает выборку"""
+        text = entry.get().strip()
+        return int(text) if text.isdigit() else None
+    
+    @staticmethod
+    def _selected(listbox, values):
+        """Значения, выбранные в списке фасета"""
+        return [values[index] for index in listbox.curselection() if index < len(values)]
+    
+    def sort(self) -> str:
+        """Выбранный порядок сортировки"""
+        label = self.sort_var.get()
+        return next((sort for sort, text in SORT_LABELS.items() if text == label), DEFAULT_SORT)
+    
+    def filters(self) -> CatalogFilters:
+        """Фильтры, выбранные на панели"""
+        return CatalogFilters(
+            genres=self._selected(self.genre_list, self.genre_values),
+            publishers=self._selected(self.publisher_list, self.publisher_values),
+            year_from=self._year(self.year_from_entry),
+            year_to=self._year(self.year_to_entry),
+            on_sale=self.on_sale_var.get(),
+            in_stock=self.in_stock_var.get()
+        )
+    
+    def set_facets(self, facets):
+        """Обновление списков значений и счетчиков с сохранением выбора"""
+        self.total_label.config(text=f"Найдено книг: {facets['total']}")
+        self.genre_values = self._fill_list(self.genre_list, self.genre_values, facets["genre"])
+        self.publisher_values = self._fill_list(self.publisher_list, self.publisher_values, facets["publisher"])
+        
+        self.decade_values = sorted(facets["year"])
+        self.decade_list.delete(0, tk.END)
+        for decade in self.decade_values:
+            self.decade_list.insert(tk.END, f"{decade}-е ({facets['year'][decade]})")
+        
+        self.on_sale_check.config(text=f"Со скидкой ({facets['on_sale']})")
+        self.in_stock_check.config(text=f"В наличии ({facets['in_stock']})")
+    
+    def _fill_list(self, listbox, values, counts):
+        """Заполнение списка фасета; выбранные значения остаются в списке и при нулевом счетчике"""
+        selected = set(self._selected(listbox, values))
+        values = sorted(set(counts) | selected, key=lambda value: (-counts.get(value, 0), value))
+        top = listbox.yview()[0]
+        listbox.delete(0, tk.END)
+        for index, value in enumerate(values):
+            listbox.insert(tk.END, f"{value} ({counts.get(value, 0)})")
+            if value in selected:
+                listbox.selection_set(index)
+        listbox.yview_moveto(top)
+        return values
+    
+    def reset(self):
+        """Сброс всех фильтров и сортировки"""
+        for listbox in (self.genre_list, self.publisher_list, self.decade_list):
+            listbox.selection_clear(0, tk.END)
+        for entry in (self.year_from_entry, self.year_to_entry):
+            entry.delete(0, tk.END)
+        self.on_sale_var.set(False)
+        self.in_stock_var.set(False)
+        self.sort_var.set(SORT_LABELS[DEFAULT_SORT])
+        self.on_change()